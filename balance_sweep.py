@@ -0,0 +1,226 @@
+"""
+Headless balancing sweeps for Red Light, Green Light.
+
+Plays many bot-only matches of GameSimulation over a grid of tuning values on a process
+pool and prints one row of outcome statistics per grid point. Players are driven by the
+simulation's bots and by synthetic alpha/beta ratio traces, so no pygame display, EEG
+board or keyboard is involved.
+
+Usage:
+    python balance_sweep.py --matches 200 --grid LATERAL_DRAG=4,6,8 --grid GREEN_MS=3000:6000,4000:8000
+    python balance_sweep.py --grid RATIO_TO_MULT=0.4,0.5,0.6 --players 6 --out sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_sim import DEFAULT_TUNING, GameSimulation
+
+RESULT_COLUMNS = (
+    "matches", "mean_match_s", "mean_survival_s", "timeouts", "collisions_per_min",
+    "offscreen_per_min", "top_ratio_win_share", "slot_balance",
+)
+
+
+class SyntheticRatios:
+    """
+    Alpha/beta ratio traces for simulated players.
+
+    Each player's log ratio follows a mean-reverting random walk (Ornstein-Uhlenbeck)
+    around its own baseline, so some players are consistently calmer than others while
+    every trace still wanders like a real band-power ratio does.
+
+    Attributes:
+        baseline (numpy.ndarray): Per-player long-run mean ratio.
+        ratios (numpy.ndarray): Current ratio per player.
+    """
+
+    def __init__(self, count, rng, mean=1.2, spread=0.35, volatility=0.6, reversion_s=3.0):
+        """
+        Args:
+            count (int): Number of players.
+            rng (numpy.random.Generator): Random source.
+            mean (float): Median baseline ratio across players.
+            spread (float): Standard deviation of the log baselines across players.
+            volatility (float): Standard deviation of the log ratio around its baseline.
+            reversion_s (float): Time constant of the pull back to the baseline.
+        """
+        self.rng = rng
+        self._log_base = np.log(mean) + rng.normal(0.0, spread, size=count)
+        self.baseline = np.exp(self._log_base)
+        self.volatility = volatility
+        self.reversion_s = reversion_s
+        self._log_ratio = self._log_base + rng.normal(0.0, volatility, size=count)
+        self._noise = np.empty(count)
+        self.ratios = np.exp(self._log_ratio)
+
+    def update(self, dt_ms):
+        dt = dt_ms / 1000.0
+        theta = dt / self.reversion_s
+        self.rng.standard_normal(out=self._noise)
+        self._noise *= self.volatility * np.sqrt(2.0 * theta)
+        self._log_ratio += theta * (self._log_base - self._log_ratio) + self._noise
+        np.exp(self._log_ratio, out=self.ratios)
+        return self.ratios
+
+
+def play_match(tuning, seed, num_players=4, hazard=1.0, dt_ms=16, max_s=180.0):
+    """
+    Plays one bot-only match to the end (or to max_s).
+
+    Returns:
+        tuple: (match_ms, winner_id, timed_out, survival_ms per player, collisions,
+        offscreen eliminations, id of the player with the highest baseline ratio).
+    """
+    sim = GameSimulation(num_players, seed=seed, hazard=hazard, tuning=tuning, num_humans=0)
+    ratios = SyntheticRatios(num_players, np.random.default_rng([seed, 2]))
+    steer = np.zeros(num_players, dtype=np.int8)
+    survival_ms = np.zeros(num_players)
+    collisions = 0
+    max_ms = max_s * 1000.0
+    while not sim.game_over and sim.elapsed_ms < max_ms:
+        sim.step(dt_ms, steer, ratios.update(dt_ms))
+        for _, name, value in sim.events:
+            if name == "collision":
+                collisions += 1
+            elif name == "eliminated":
+                survival_ms[value] = sim.elapsed_ms
+    offscreen = num_players - sim.players.alive_count() - collisions
+    survival_ms[sim.players.alive] = sim.elapsed_ms
+    return (sim.elapsed_ms, sim.winner_id, not sim.game_over, survival_ms, collisions, offscreen,
+            int(np.argmax(ratios.baseline)))
+
+
+def _play_batch(args):
+    tuning, seeds, num_players, hazard, dt_ms, max_s = args
+    return [play_match(tuning, seed, num_players, hazard, dt_ms, max_s) for seed in seeds]
+
+
+def summarize(results, num_players):
+    """Aggregates play_match results of one grid point into a RESULT_COLUMNS dict."""
+    match_ms = np.array([r[0] for r in results], dtype=float)
+    winners = np.array([r[1] for r in results])
+    timeouts = int(sum(r[2] for r in results))
+    survival = np.stack([r[3] for r in results])
+    collisions = sum(r[4] for r in results)
+    offscreen = sum(r[5] for r in results)
+    top_ratio = np.array([r[6] for r in results])
+    player_minutes = max(survival.sum() / 60000.0, 1e-9)
+
+    decided = winners >= 0
+    # Normalized entropy of the winning slot: 1.0 means every starting slot wins equally often
+    wins = np.bincount(winners[decided], minlength=num_players).astype(float)
+    if wins.sum() > 0 and num_players > 1:
+        share = wins[wins > 0] / wins.sum()
+        slot_balance = float(-(share * np.log(share)).sum() / np.log(num_players))
+    else:
+        slot_balance = 0.0
+    return {
+        "matches": len(results),
+        "mean_match_s": float(match_ms.mean() / 1000.0),
+        "mean_survival_s": float(survival.mean() / 1000.0),
+        "timeouts": timeouts,
+        "collisions_per_min": collisions / player_minutes,
+        "offscreen_per_min": offscreen / player_minutes,
+        "top_ratio_win_share": float((winners[decided] == top_ratio[decided]).mean()) if decided.any() else 0.0,
+        "slot_balance": slot_balance,
+    }
+
+
+def parse_grid(specs):
+    """
+    Turns ["NAME=v1,v2", ...] into {NAME: [v1, v2]}. Values are numbers, "none", or
+    "low:high" ranges for the *_MS interval tunables.
+    """
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip().upper()
+        if name not in DEFAULT_TUNING:
+            raise ValueError(f"Unknown tunable {name!r}; choose from {', '.join(DEFAULT_TUNING)}")
+        parsed = []
+        for value in values.split(","):
+            value = value.strip()
+            if value.lower() == "none":
+                parsed.append(None)
+            elif ":" in value:
+                parsed.append(tuple(int(float(v)) for v in value.split(":")))
+            else:
+                number = float(value)
+                parsed.append(int(number) if number.is_integer() and isinstance(DEFAULT_TUNING[name], int) else number)
+        grid[name] = parsed
+    return grid
+
+
+def run_sweep(grid, matches=100, num_players=4, hazard=1.0, dt_ms=16, max_s=180.0, seed=0, workers=None, batch=10):
+    """
+    Plays `matches` matches for every combination in grid on a process pool.
+
+    Every grid point uses the same match seeds, so differences between rows come from the
+    tuning rather than from luck of the draw.
+
+    Returns:
+        list: (tuning overrides, summary dict) per grid point, in grid order.
+    """
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    seeds = [seed + i for i in range(matches)]
+    jobs = []
+    for idx, tuning in enumerate(combos):
+        for lo in range(0, matches, batch):
+            jobs.append((idx, (tuning, seeds[lo:lo + batch], num_players, hazard, dt_ms, max_s)))
+
+    results = [[] for _ in combos]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (idx, _), batch_results in zip(jobs, pool.map(_play_batch, [job for _, job in jobs])):
+            results[idx].extend(batch_results)
+    return [(tuning, summarize(res, num_players)) for tuning, res in zip(combos, results)]
+
+
+def format_table(rows):
+    names = list(rows[0][0]) if rows else []
+    header = names + list(RESULT_COLUMNS)
+    lines = [header]
+    for tuning, summary in rows:
+        cells = [str(tuning[n]) for n in names]
+        cells += [f"{summary[c]:.3f}" if isinstance(summary[c], float) else str(summary[c]) for c in RESULT_COLUMNS]
+        lines.append(cells)
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(w) for cell, w in zip(line, widths)) for line in lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel headless balancing sweeps over game tunables")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="Tunable values to sweep (repeatable), e.g. LATERAL_DRAG=4,6 or RED_MS=1500:3000,2000:4000")
+    parser.add_argument("--matches", type=int, default=100, help="Matches per grid point")
+    parser.add_argument("--players", type=int, default=4, help="Bots per match")
+    parser.add_argument("--hazard", type=float, default=1.0, help="Car traffic density")
+    parser.add_argument("--max-seconds", type=float, default=180.0, help="Stop a match after this much play time")
+    parser.add_argument("--seed", type=int, default=0, help="First match seed")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--out", type=str, default=None, help="Also write the table as CSV")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    t0 = time.perf_counter()
+    rows = run_sweep(grid, matches=args.matches, num_players=args.players, hazard=args.hazard,
+                     max_s=args.max_seconds, seed=args.seed, workers=args.workers)
+    wall_s = time.perf_counter() - t0
+    print(format_table(rows))
+    total = sum(summary["matches"] for _, summary in rows)
+    played_s = sum(summary["matches"] * summary["mean_match_s"] for _, summary in rows)
+    print(f"{total} matches ({played_s / 3600.0:.1f} h of play) in {wall_s:.1f} s "
+          f"on {args.workers or os.cpu_count()} workers")
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(grid) + list(RESULT_COLUMNS))
+            for tuning, summary in rows:
+                writer.writerow([tuning[n] for n in grid] + [summary[c] for c in RESULT_COLUMNS])
+        print(f"Wrote {args.out}")
@@ -0,0 +1,380 @@
+"""
+Background connection management for BrainFlow boards.
+
+BoardConnectionManager wraps BrainFlowBoardSetup in a small state machine that runs on its
+own thread: it connects, watches the stream for progress, and tears the session down and
+reconnects with exponential backoff when the dongle goes quiet or disappears. The game
+loop never blocks on any of this; it asks the manager for data and for its state.
+
+While a session is open the manager thread drains the board every poll into a
+StreamIngest, which checks package numbers and timestamps for loss and gaps and keeps the
+recent window the game reads from. With spill_dir set, every drained chunk is also
+appended to rotating compressed files on disk (eeg_spill.SpillWriter), so all-day sessions
+keep their full recording while memory stays flat.
+
+Game events go through mark(), which only queues them; the worker writes them into the
+board's marker channel and into a host-side EventIndex aligned to stream sample numbers.
+
+States:
+    connecting    first connection attempt (including port auto-detection)
+    streaming     new samples keep arriving
+    stalled       no new samples for stall_timeout_s; the session is still open
+    reconnecting  waiting out the backoff or re-running setup after a failure or long stall
+    stopped       stop() was called
+"""
+import collections
+import functools
+import threading
+import time
+
+from eeg_ingest import PACKAGE_STEP, StreamIngest
+from eeg_markers import MARKER_CODES, EventIndex, default_index_path
+from eeg_spill import SpillWriter
+
+CONNECTING = "connecting"
+STREAMING = "streaming"
+STALLED = "stalled"
+RECONNECTING = "reconnecting"
+STOPPED = "stopped"
+
+
+def _default_setup_factory(board_id, serial_port, name, buffer_size=450000):
+    from brainflow_stream import BrainFlowBoardSetup
+    return BrainFlowBoardSetup(board_id=board_id, serial_port=serial_port, name=name, buffer_size=buffer_size)
+
+
+class BoardConnectionManager:
+    """
+    Keeps one board streaming for the lifetime of the app, reconnecting as needed.
+
+    Attributes:
+        state (str): One of CONNECTING, STREAMING, STALLED, RECONNECTING, STOPPED.
+        sampling_rate (int): Sampling rate of the board (0 until known).
+        eeg_channels (list): EEG rows of the board data.
+        setup (BrainFlowBoardSetup): Current board session, or None between attempts.
+        reconnects (int): Number of reconnect attempts made so far.
+        last_error (str): Why the last attempt failed or the last session was dropped.
+        retry_at (float): time.monotonic() of the next connection attempt while reconnecting.
+        ingest (StreamIngest): Recent window and loss/jitter counters, or None before the
+            first successful connection.
+        spill (SpillWriter): On-disk recording, or None without spill_dir.
+        events (EventIndex): Game events with the stream sample index they line up with.
+    """
+
+    def __init__(self, board_id, serial_port=None, name="Cyton", poll_interval_s=0.05, connect_timeout_s=5.0,
+                 stall_timeout_s=1.0, reconnect_after_s=3.0, backoff_initial_s=1.0, backoff_max_s=30.0,
+                 window_s=10.0, buffer_size=450000, drain_max_s=2.0, spill_dir=None, spill_options=None,
+                 event_index_path=None, setup_factory=None, eeg_dtype="float64", max_queued_markers=1000):
+        """
+        Args:
+            board_id (int): BrainFlow board id.
+            serial_port (str, optional): Serial port; auto-detected on every attempt if None.
+            name (str): Board name for log messages.
+            poll_interval_s (float): How often the board is drained and checked for progress.
+            connect_timeout_s (float): Time a fresh session gets to deliver its first samples.
+            stall_timeout_s (float): Time without new samples before the stream counts as stalled.
+            reconnect_after_s (float): Time spent stalled before the session is torn down.
+            backoff_initial_s (float): Delay before the first reconnect; doubles per failure.
+            backoff_max_s (float): Upper bound of the reconnect delay.
+            window_s (float): Seconds of recent data kept for get_current_board_data().
+            buffer_size (int): BrainFlow ring buffer size in samples (default factory only).
+            drain_max_s (float): Most data taken from the board per drain, bounding each allocation.
+            spill_dir (str, optional): Record every drained sample to rotating files here.
+            spill_options (dict, optional): Extra SpillWriter arguments (max_bytes, max_seconds, keep_files, ...).
+            event_index_path (str, optional): CSV for the event index; defaults to a file in
+                spill_dir when spilling, otherwise events are kept in memory only.
+            setup_factory (callable, optional): (board_id, serial_port, name) -> object with the
+                BrainFlowBoardSetup interface; defaults to BrainFlowBoardSetup.
+            eeg_dtype (str): dtype of the EEG-only window served by get_current_eeg()
+                ("float32" halves the memory kept and copied per read).
+            max_queued_markers (int): Markers kept while the board cannot take them
+                (connecting, reconnecting); the oldest are dropped beyond that.
+        """
+        self.board_id = board_id
+        self.serial_port = serial_port
+        self.name = name
+        self.poll_interval_s = poll_interval_s
+        self.connect_timeout_s = connect_timeout_s
+        self.stall_timeout_s = stall_timeout_s
+        self.reconnect_after_s = reconnect_after_s
+        self.backoff_initial_s = backoff_initial_s
+        self.backoff_max_s = backoff_max_s
+        self.window_s = window_s
+        self.drain_max_s = drain_max_s
+        self.spill_dir = spill_dir
+        self.spill_options = dict(spill_options or {})
+        self.eeg_dtype = eeg_dtype
+        self.setup_factory = setup_factory or functools.partial(_default_setup_factory, buffer_size=buffer_size)
+
+        self.state = CONNECTING
+        self.sampling_rate = 0
+        self.eeg_channels = []
+        self.setup = None
+        self.reconnects = 0
+        self.last_error = ""
+        self.retry_at = 0.0
+        self.ingest = None
+        self.spill = None
+        if event_index_path is None and spill_dir:
+            event_index_path = default_index_path(spill_dir)
+        self.events = EventIndex(event_index_path)
+        self._markers = collections.deque(maxlen=max_queued_markers)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()  # set by mark() so markers go in without waiting out the poll
+        self._thread = threading.Thread(target=self._run, name=f"{name}-connection", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stops the manager thread and releases the board session."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self._close("stopped")
+        if self.spill is not None:
+            self.spill.close()
+        self.events.close()
+        self.state = STOPPED
+
+    @property
+    def streaming(self):
+        return self.state == STREAMING
+
+    def status_text(self):
+        """Short human-readable state for HUDs and logs."""
+        if self.state == RECONNECTING:
+            wait = self.retry_at - time.monotonic()
+            return f"reconnecting (retry in {wait:.0f}s)" if wait > 0.5 else "reconnecting"
+        return self.state
+
+    def get_current_board_data(self, num_samples):
+        """
+        Latest num_samples of board data while streaming, with short dropouts interpolated.
+        Fewer samples come back right after a reconnect or a long dropout.
+
+        Returns:
+            numpy.ndarray: Board data, or None while not streaming (callers fall back to test values).
+        """
+        if self.state != STREAMING:
+            return None
+        with self._lock:
+            if self.ingest is None:
+                return None
+            return self.ingest.latest(num_samples)
+
+    def get_current_eeg(self, num_samples, out=None):
+        """
+        Latest num_samples of the EEG rows only, as one contiguous (channels, k) array in
+        eeg_dtype. The rows were extracted once at ingest, so this is a single copy.
+
+        Args:
+            num_samples (int): Samples wanted.
+            out (numpy.ndarray, optional): Reusable (channels, >= num_samples) buffer; the
+                result is a view of it, safe to modify in place.
+
+        Returns:
+            numpy.ndarray: EEG window, or None while not streaming.
+        """
+        if self.state != STREAMING:
+            return None
+        with self._lock:
+            if self.ingest is None:
+                return None
+            return self.ingest.latest_eeg(num_samples, out)
+
+    def stats(self):
+        """Loss/jitter counters of the ingest layer (empty before the first connection)."""
+        with self._lock:
+            if self.ingest is None:
+                return {}
+            stats = self.ingest.stats()
+            if self.spill is not None:
+                stats.update(spill_samples=self.spill.samples_written, spill_bytes=self.spill.bytes_written,
+                             spill_files=len(self.spill.files), spill_dropped_blocks=self.spill.dropped_blocks)
+            return stats
+
+    def mark(self, name, value=None, host_time=None):
+        """
+        Queues a game event for the marker channel and the event index. Safe to call from
+        the render loop: it never touches the board or the disk.
+
+        Args:
+            name (str): Key of eeg_markers.MARKER_CODES, e.g. "light_red" or "collision".
+            value: Optional detail stored in the event index (e.g. the player id).
+            host_time (float, optional): time.time() of the event if it happened elsewhere
+                (e.g. in a spectral bus reader); now by default.
+        """
+        self._markers.append((time.time() if host_time is None else host_time, name, value))
+        self._wake.set()
+
+    def _connect(self):
+        """One connection attempt. Returns True if the session is open and streaming."""
+        try:
+            setup = self.setup_factory(self.board_id, self.serial_port, self.name)
+            setup.setup()
+        except Exception as e:
+            self.last_error = f"setup failed: {e}"
+            return False
+        if getattr(setup, "board", None) is None or not setup.is_streaming():
+            self.last_error = "no device found" if getattr(setup, "board", None) is None else "stream did not start"
+            try:
+                setup.stop()
+            except Exception:
+                pass
+            return False
+        board = setup.board
+        try:
+            num_rows = board.get_num_rows(self.board_id)
+            package_row = board.get_package_num_channel(self.board_id)
+        except Exception:
+            num_rows, package_row = None, None
+        try:
+            timestamp_row = board.get_timestamp_channel(self.board_id)
+        except Exception:
+            timestamp_row = None
+        with self._lock:
+            self.setup = setup
+            self.sampling_rate = setup.get_sampling_rate() or 0
+            self.eeg_channels = list(getattr(setup, "eeg_channels", []) or range(1, 9))
+            if num_rows is None:
+                num_rows = max(self.eeg_channels) + 1
+            if (self.ingest is None or self.ingest.num_rows != num_rows
+                    or self.ingest.eeg_rows != self.eeg_channels):
+                self.ingest = StreamIngest(num_rows, self.sampling_rate or 250, package_row=package_row,
+                                           timestamp_row=timestamp_row, window_s=self.window_s,
+                                           package_step=PACKAGE_STEP.get(self.board_id, 1),
+                                           eeg_rows=self.eeg_channels, eeg_dtype=self.eeg_dtype)
+            else:
+                self.ingest.restart()
+            if self.spill_dir and self.spill is None:
+                self.spill = SpillWriter(self.spill_dir, num_rows, self.sampling_rate or 250,
+                                         meta={"board_id": self.board_id, "name": self.name,
+                                               "eeg_channels": self.eeg_channels}, **self.spill_options)
+        return True
+
+    def _close(self, reason):
+        with self._lock:
+            setup, self.setup = self.setup, None
+        if setup is not None:
+            self.last_error = reason
+            try:
+                setup.stop()
+            except Exception:
+                pass
+
+    def _flush_markers(self, setup):
+        while self._markers:
+            host_time, name, value = self._markers.popleft()
+            self.events.add(host_time, name, value)
+            code = MARKER_CODES.get(name)
+            if setup is not None and code:
+                try:
+                    setup.board.insert_marker(code)
+                except Exception:
+                    pass  # the event index still has it
+
+    def _drain(self):
+        """
+        Moves everything the board has buffered into the ingest; returns total samples received.
+
+        Only the ingest update holds the lock: markers, the board read, the spill write and
+        event resolution run outside it, so readers are never blocked on board or disk I/O.
+        The session and ingest are only replaced by this thread, so they cannot change here.
+        """
+        with self._lock:
+            setup, ingest = self.setup, self.ingest
+        self._flush_markers(setup)
+        if setup is None or ingest is None:
+            return None
+        try:
+            data = setup.get_board_data(max(1, int(self.drain_max_s * ingest.sampling_rate)))
+            with self._lock:
+                base_index = ingest.samples_received
+                ingest.push(data)
+                received = ingest.samples_received
+        except Exception as e:
+            self.last_error = str(e)
+            return None
+        if data is None or not data.size:
+            return received
+        try:
+            if self.spill is not None:
+                self.spill.write(data)
+            if ingest.timestamp_row is not None:
+                self.events.resolve(data[ingest.timestamp_row], base_index)
+            else:
+                self.events.resolve_by_count(received, time.time(), ingest.sampling_rate)
+        except Exception as e:
+            self.last_error = str(e)
+        return received
+
+    def _wait(self, seconds):
+        """Sleeps up to seconds; returns True if stop() was called meanwhile."""
+        return self._stop_event.wait(seconds)
+
+    def _wait_poll(self):
+        """Sleeps until the next poll or a queued marker; returns True if stop() was called."""
+        self._wake.wait(self.poll_interval_s)
+        self._wake.clear()
+        return self._stop_event.is_set()
+
+    def _run(self):
+        backoff = self.backoff_initial_s
+        while not self._stop_event.is_set():
+            if not self._connect():
+                self.state = RECONNECTING
+                self.retry_at = time.monotonic() + backoff
+                print(f"[{self.name}] EEG connection failed ({self.last_error}); retrying in {backoff:.0f}s")
+                if self._wait(backoff):
+                    return
+                backoff = min(backoff * 2.0, self.backoff_max_s)
+                self.reconnects += 1
+                self.state = RECONNECTING
+                continue
+
+            # Session open: watch sample progress until it stalls for too long
+            opened = time.monotonic()
+            last_count = self._drain()
+            last_progress = None
+            while not self._stop_event.is_set():
+                if self._wait_poll():
+                    return
+                now = time.monotonic()
+                count = self._drain()
+                if count is not None and count != last_count:
+                    last_count = count
+                    last_progress = now
+                    if self.state != STREAMING:
+                        print(f"[{self.name}] EEG streaming")
+                    self.state = STREAMING
+                    backoff = self.backoff_initial_s
+                    continue
+                if last_progress is None:
+                    if now - opened > self.connect_timeout_s:
+                        self.last_error = "no samples after connecting"
+                        break
+                    continue
+                quiet = now - last_progress
+                if quiet > self.stall_timeout_s and self.state == STREAMING:
+                    self.state = STALLED
+                    print(f"[{self.name}] EEG stream stalled")
+                if quiet > self.stall_timeout_s + self.reconnect_after_s:
+                    self.last_error = f"no samples for {quiet:.1f}s"
+                    break
+
+            if self._stop_event.is_set():
+                return
+            reason = self.last_error
+            self._close(reason)
+            self.last_error = reason
+            self.state = RECONNECTING
+            self.retry_at = time.monotonic() + backoff
+            print(f"[{self.name}] EEG session dropped ({reason}); reconnecting in {backoff:.0f}s")
+            if self._wait(backoff):
+                return
+            backoff = min(backoff * 2.0, self.backoff_max_s)
+            self.reconnects += 1
@@ -0,0 +1,439 @@
+"""
+Several boards recording together on one host timeline.
+
+Every board samples on its own crystal, so its real rate is a little off nominal (tens to
+hundreds of ppm) and differs from board to board. Boards also start streaming at different
+moments, and the host timestamps BrainFlow attaches arrive late by however long the
+serial/USB path buffered them. Draining each board in turn and stacking the arrays by
+sample number (as the two-board example in brainflow_stream.py does) therefore starts the
+boards tens of milliseconds apart and lets them slide further apart by a few ms a minute.
+
+BoardPool owns the setups and drains them all from one thread. Package counters are
+unwrapped into running sample indices, so packets lost on the radio keep their place.
+BoardClock fits host_time = offset + n * period per board. The fit uses the lower envelope
+of the timestamps, meaning the least delayed sample of every drain. That separates clock
+offset and drift from transport jitter. aligned() then resamples every board onto one
+common time grid by linear interpolation. It costs one searchsorted and a few array
+operations per board, with no per-sample Python loop:
+
+    pool = BoardPool([BrainFlowBoardSetup(0, "/dev/ttyUSB0"), BrainFlowBoardSetup(0, "/dev/ttyUSB1")]).start()
+    times, data = pool.aligned(seconds=2.0)   # data: (boards, channels, samples), NaN where a board has none
+    pool.clocks()                             # fitted rate, drift and start offset per board
+
+Usage:
+    python board_pool.py --boards 3 --drift-ppm 0,200,-150 --jitter-ms 3   # synthetic self-check
+"""
+import threading
+import time
+
+import numpy as np
+
+from eeg_ingest import PACKAGE_MODULUS, PACKAGE_STEP
+
+
+class BoardClock:
+    """
+    Linear model of one board's sample clock in host time: time(n) = offset + n * period.
+
+    Each drain contributes one anchor, the sample whose timestamp is least delayed relative
+    to the nominal rate. A least-squares line through the recent anchors gives the period
+    (and so the real sampling rate). Until the anchors span min_span_s, only the offset is
+    fitted and the nominal period is used, because a slope over a few drains is mostly jitter.
+
+    Attributes:
+        nominal_period (float): 1 / nominal sampling rate.
+        period (float): Fitted seconds per sample.
+        offset (float): Fitted host time (unix seconds) of sample index 0.
+        residual_ms (float): RMS distance of the anchors from the fitted line.
+        span_s (float): Host time covered by the anchors in the fit.
+    """
+
+    def __init__(self, sampling_rate, max_anchors=1200, min_span_s=2.0):
+        self.nominal_period = 1.0 / float(sampling_rate)
+        self.min_span_s = min_span_s
+        self._n = np.zeros(max_anchors)
+        self._t = np.zeros(max_anchors)
+        self._count = 0
+        self._t_ref = None  # anchors are kept relative to the first timestamp for precision
+        self.period = self.nominal_period
+        self.offset = 0.0
+        self.residual_ms = 0.0
+        self.span_s = 0.0
+
+    @property
+    def rate_hz(self):
+        return 1.0 / self.period
+
+    @property
+    def drift_ppm(self):
+        return (self.nominal_period / self.period - 1.0) * 1e6
+
+    def add(self, n, t):
+        """
+        Adds one drain's worth of samples and refits.
+
+        Args:
+            n (numpy.ndarray): Running sample indices of the chunk.
+            t (numpy.ndarray): Their host timestamps (unix seconds).
+        """
+        if n.size == 0:
+            return
+        if self._t_ref is None:
+            self._t_ref = float(t[0])
+        i = int(np.argmin(t - n * self.nominal_period))
+        slot = self._count % self._n.size
+        self._n[slot] = n[i]
+        self._t[slot] = t[i] - self._t_ref
+        self._count += 1
+        self._fit()
+
+    def _fit(self):
+        k = min(self._count, self._n.size)
+        n, t = self._n[:k], self._t[:k]
+        self.span_s = float(np.ptp(n)) * self.nominal_period
+        if self.span_s < self.min_span_s:
+            period = self.nominal_period
+            intercept = float(np.mean(t - n * period))
+        else:
+            n_mean, t_mean = n.mean(), t.mean()
+            dn = n - n_mean
+            period = float(np.dot(dn, t - t_mean) / np.dot(dn, dn))
+            intercept = float(t_mean - period * n_mean)
+        residual = t - (intercept + n * period)
+        self.residual_ms = float(np.sqrt(np.mean(residual * residual))) * 1000.0
+        self.period = period
+        self.offset = self._t_ref + intercept
+
+    def times(self, n):
+        """Fitted host times of the sample indices n."""
+        return self.offset + n * self.period
+
+
+class _BoardStream:
+    """One pooled board: its setup, clock and a ring of the selected rows with their sample indices."""
+
+    def __init__(self, setup, rows, window_s, max_anchors, min_span_s):
+        self.setup = setup
+        self.name = getattr(setup, "name", None) or "board"
+        self.board_id = getattr(setup, "board_id", None)
+        self.sampling_rate = float(setup.get_sampling_rate() or 250)
+        self.rows = list(rows if rows is not None else getattr(setup, "eeg_channels", None) or range(1, 9))
+        board = setup.board
+        try:
+            self.package_row = board.get_package_num_channel(self.board_id)
+        except Exception:
+            self.package_row = None
+        try:
+            self.timestamp_row = board.get_timestamp_channel(self.board_id)
+        except Exception:
+            self.timestamp_row = None
+        self.package_step = PACKAGE_STEP.get(self.board_id, 1)
+        self.clock = BoardClock(self.sampling_rate, max_anchors=max_anchors, min_span_s=min_span_s)
+
+        # Double-written ring: every sample goes to slot i and i + capacity, so the newest
+        # `count` samples are always one contiguous slice
+        self.capacity = max(2, int(window_s * self.sampling_rate))
+        self.data = np.zeros((len(self.rows), 2 * self.capacity))
+        self.index = np.zeros(2 * self.capacity, dtype=np.int64)
+        self.pos = 0
+        self.count = 0
+        self.next_index = 0
+        self._last_package = None
+        self.samples_received = 0
+        self.packets_lost = 0
+        self.latency_ms = 0.0
+        self.last_arrival = None
+        self.last_error = ""
+
+    def push(self, chunk, now):
+        """Adds one drained chunk (num_rows x k)."""
+        if chunk is None or chunk.ndim != 2 or chunk.shape[1] == 0:
+            return 0
+        k = chunk.shape[1]
+        if self.package_row is not None:
+            packages = chunk[self.package_row]
+            previous = self._last_package if self._last_package is not None else packages[0] - self.package_step
+            steps = np.diff(packages, prepend=previous) % PACKAGE_MODULUS
+            increments = np.maximum(np.rint(steps / self.package_step).astype(np.int64), 1)
+            self._last_package = packages[-1]
+        else:
+            increments = np.ones(k, dtype=np.int64)
+        n = self.next_index - 1 + np.cumsum(increments)
+        self.packets_lost += int(n[-1] - self.next_index + 1 - k)
+        self.next_index = int(n[-1]) + 1
+        self.samples_received += k
+
+        if self.timestamp_row is not None:
+            t = chunk[self.timestamp_row]
+            self.latency_ms = (now - float(t[-1])) * 1000.0
+        else:  # no timestamps: the newest sample counts as arriving now
+            t = now - (n[-1] - n) * self.clock.nominal_period
+        self.clock.add(n, t)
+        self.last_arrival = time.monotonic()
+
+        if k > self.capacity:
+            chunk, n, k = chunk[:, -self.capacity:], n[-self.capacity:], self.capacity
+        slots = (self.pos + np.arange(k)) % self.capacity
+        values = chunk[self.rows]
+        self.data[:, slots] = values
+        self.data[:, slots + self.capacity] = values
+        self.index[slots] = n
+        self.index[slots + self.capacity] = n
+        self.pos = (self.pos + k) % self.capacity
+        self.count = min(self.capacity, self.count + k)
+        return k
+
+    def window(self):
+        """(rows x count, sample indices) of the buffered samples, oldest first (views)."""
+        end = self.pos + self.capacity
+        return self.data[:, end - self.count:end], self.index[end - self.count:end]
+
+
+class BoardPool:
+    """
+    Drains several boards together and serves their data aligned on one host timeline.
+
+    Attributes:
+        names (list): Board names, in pool order.
+        sampling_rate (float): Default rate of the aligned grid (the fastest board's).
+        num_channels (int): Channel axis of aligned() (the widest board's row count).
+    """
+
+    def __init__(self, setups, rows=None, window_s=30.0, fit_window_s=60.0, min_fit_s=2.0, poll_interval_s=0.05,
+                 drain_max_s=2.0, max_gap_s=0.25, stale_after_s=1.0):
+        """
+        Args:
+            setups (list): Objects with the BrainFlowBoardSetup interface (BrainFlowBoardSetup,
+                synthetic_eeg.SyntheticBoardSetup). Any that are not set up yet are set up by start().
+            rows (list, optional): Rows to keep, either one list for every board or one list
+                per board; each board's eeg_channels by default.
+            window_s (float): Seconds of data kept per board.
+            fit_window_s (float): Seconds of drains the clock fit looks back over.
+            min_fit_s (float): Anchor span needed before the clock rate is fitted at all.
+            poll_interval_s (float): How often the drain thread empties the boards.
+            drain_max_s (float): Most data taken from one board per drain.
+            max_gap_s (float): Longer gaps between a board's samples come out as NaN
+                instead of being interpolated across.
+            stale_after_s (float): A board that delivered nothing for this long no longer
+                holds back the end of the aligned window.
+        """
+        self.setups = list(setups)
+        if rows is not None and rows and not isinstance(rows[0], (list, tuple)):
+            rows = [rows] * len(self.setups)
+        self._rows = rows
+        self.window_s = window_s
+        self.max_anchors = max(2, int(fit_window_s / poll_interval_s))
+        self.min_fit_s = min_fit_s
+        self.poll_interval_s = poll_interval_s
+        self.drain_max_s = drain_max_s
+        self.max_gap_s = max_gap_s
+        self.stale_after_s = stale_after_s
+        self.streams = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def names(self):
+        return [stream.name for stream in self.streams]
+
+    @property
+    def sampling_rate(self):
+        return max(stream.sampling_rate for stream in self.streams)
+
+    @property
+    def num_channels(self):
+        return max(len(stream.rows) for stream in self.streams)
+
+    def start(self, thread=True):
+        """
+        Sets up any boards that are not streaming yet and starts draining them.
+
+        Args:
+            thread (bool): Drain from a background thread; with False, call poll() yourself.
+
+        Raises:
+            RuntimeError: If a board did not come up.
+        """
+        for setup in self.setups:
+            if getattr(setup, "board", None) is None:
+                setup.setup()
+            if getattr(setup, "board", None) is None or not setup.is_streaming():
+                self.stop()
+                raise RuntimeError(f"[{getattr(setup, 'name', 'board')}] board did not start streaming")
+        self.streams = [_BoardStream(setup, self._rows[i] if self._rows else None, self.window_s,
+                                     self.max_anchors, self.min_fit_s)
+                        for i, setup in enumerate(self.setups)]
+        if thread:
+            self._thread = threading.Thread(target=self._run, name="board-pool", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stops draining and releases every board."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for setup in self.setups:
+            try:
+                setup.stop()
+            except Exception:
+                pass
+
+    def poll(self):
+        """
+        Drains every board once; returns the number of samples taken.
+
+        Boards are read outside the lock, which is held only while each chunk goes into its
+        stream, so aligned() and clocks() never wait on a slow board.
+        """
+        total = 0
+        for stream in self.streams:
+            try:
+                data = stream.setup.get_board_data(max(1, int(self.drain_max_s * stream.sampling_rate)))
+                now = time.time()
+                with self._lock:
+                    total += stream.push(data, now)
+            except Exception as e:
+                stream.last_error = str(e)
+        return total
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.poll_interval_s)
+
+    def aligned(self, seconds=2.0, rate=None, end_time=None, out=None):
+        """
+        The last `seconds` of every board resampled onto one common time grid.
+
+        By default the grid ends at the newest moment every live board has reached, so the
+        latest column is complete for all boards that are still streaming.
+
+        Args:
+            seconds (float): Length of the window.
+            rate (float, optional): Grid rate in Hz; the fastest board's rate by default.
+            end_time (float, optional): Host time (unix seconds) of the last grid point.
+            out (numpy.ndarray, optional): (boards, num_channels, samples) buffer to fill.
+
+        Returns:
+            tuple: (times, data), with the grid's host times and a (boards, channels, samples)
+            array. Channels a board does not have and times it has no data for are NaN.
+            None before every board has delivered samples.
+        """
+        with self._lock:
+            if not self.streams or any(stream.count < 2 for stream in self.streams):
+                return None
+            rate = float(rate or self.sampling_rate)
+            num = max(1, int(round(seconds * rate)))
+            if end_time is None:
+                now = time.monotonic()
+                live = [s for s in self.streams if now - s.last_arrival <= self.stale_after_s] or self.streams
+                end_time = min(s.clock.times(s.next_index - 1) for s in live)
+            times = end_time - (num - 1 - np.arange(num)) / rate
+            if out is None:
+                out = np.empty((len(self.streams), self.num_channels, num))
+            for b, stream in enumerate(self.streams):
+                values, index = stream.window()
+                t = stream.clock.times(index)
+                after = np.clip(np.searchsorted(t, times), 1, t.size - 1)
+                t0, t1 = t[after - 1], t[after]
+                frac = (times - t0) / (t1 - t0)
+                valid = (frac >= 0.0) & (frac <= 1.0) & (t1 - t0 <= self.max_gap_s)
+                before = values[:, after - 1]
+                dest = out[b, :values.shape[0]]
+                np.subtract(values[:, after], before, out=dest)
+                dest *= frac
+                dest += before
+                dest[:, ~valid] = np.nan
+                out[b, values.shape[0]:] = np.nan
+        return times, out
+
+    def clocks(self):
+        """Per-board clock fit and stream counters (for HUDs, logs and benchmarks)."""
+        with self._lock:
+            first = self.streams[0].clock.offset if self.streams else 0.0
+            return [{
+                "name": stream.name,
+                "nominal_hz": stream.sampling_rate,
+                "rate_hz": stream.clock.rate_hz,
+                "drift_ppm": stream.clock.drift_ppm,
+                "start_offset_ms": (stream.clock.offset - first) * 1000.0,
+                "residual_ms": stream.clock.residual_ms,
+                "fit_span_s": stream.clock.span_s,
+                "latency_ms": stream.latency_ms,
+                "samples_received": stream.samples_received,
+                "packets_lost": stream.packets_lost,
+                "last_error": stream.last_error,
+            } for stream in self.streams]
+
+
+def _sync_delay_ms(signal, times, hz):
+    """Delay (ms) of a sin(2 pi hz t) reference in signal sampled at times, by least squares."""
+    keep = np.isfinite(signal)
+    w = 2.0 * np.pi * hz * (times[keep] - times[0])
+    design = np.column_stack((np.sin(w), np.cos(w)))
+    (a, b), *_ = np.linalg.lstsq(design, signal[keep], rcond=None)
+    return np.arctan2(b, a) / (2.0 * np.pi * hz) * 1000.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from synthetic_eeg import SyntheticBoardSetup
+
+    parser = argparse.ArgumentParser(description="Multi-board clock alignment self-check with synthetic boards")
+    parser.add_argument("--boards", type=int, default=3, help="Synthetic boards in the pool")
+    parser.add_argument("--fs", type=float, default=250.0, help="Nominal sampling rate")
+    parser.add_argument("--drift-ppm", default="0,200,-150", help="Comma-separated clock error per board (cycled)")
+    parser.add_argument("--jitter-ms", type=float, default=3.0, help="Mean host timestamp delay")
+    parser.add_argument("--stagger-ms", type=float, default=40.0, help="Delay between starting consecutive boards")
+    parser.add_argument("--seconds", type=float, default=20.0, help="How long to record")
+    parser.add_argument("--window-s", type=float, default=2.0, help="Aligned window checked every second")
+    args = parser.parse_args()
+
+    drifts = [float(x) for x in args.drift_ppm.split(",")]
+    sync_hz = 1.0  # shared reference; one period spans +-500 ms of misalignment
+    setups = [SyntheticBoardSetup(name=f"Synthetic-{i}", seed=i, num_channels=4, sampling_rate=args.fs,
+                                  clock_drift_ppm=drifts[i % len(drifts)], timestamp_jitter_ms=args.jitter_ms,
+                                  sync_hz=sync_hz) for i in range(args.boards)]
+    for setup in setups:
+        setup.setup()
+        time.sleep(args.stagger_ms / 1000.0)
+    pool = BoardPool(setups, rows=[setup.eeg_channels + [setup.sync_row] for setup in setups]).start()
+
+    num = int(args.window_s * args.fs)
+    aligned_err, naive_err, align_ms = [], [], []
+    try:
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            time.sleep(1.0)
+            t0 = time.perf_counter()
+            result = pool.aligned(args.window_s)
+            align_ms.append((time.perf_counter() - t0) * 1000.0)
+            if result is None:
+                continue
+            times, data = result
+            delays = np.array([_sync_delay_ms(data[b, -1], times, sync_hz) for b in range(args.boards)])
+            aligned_err.append(np.abs(delays - delays[0]).max())
+            # What stacking by sample number gives: the same sample indices of every board,
+            # taken as simultaneous
+            with pool._lock:
+                last = min(stream.next_index for stream in pool.streams)
+                naive = [values[-1, (index >= last - num) & (index < last)].copy()
+                         for values, index in (stream.window() for stream in pool.streams)]
+            grid = np.arange(num) / args.fs
+            delays = np.array([_sync_delay_ms(x, grid[:x.size], sync_hz) for x in naive])
+            naive_err.append(np.abs(delays - delays[0]).max())
+    finally:
+        pool.stop()
+
+    for clock, drift in zip(pool.clocks(), (drifts[i % len(drifts)] for i in range(args.boards))):
+        print(f"{clock['name']}: drift {clock['drift_ppm']:+7.1f} ppm (true {drift:+.1f}), "
+              f"start {clock['start_offset_ms']:+6.1f} ms, fit residual {clock['residual_ms']:.2f} ms, "
+              f"latency {clock['latency_ms']:.1f} ms")
+    print(f"misalignment between boards, last check: aligned {aligned_err[-1]:.2f} ms, "
+          f"stacked by sample number {naive_err[-1]:.2f} ms")
+    print(f"worst over the run: aligned {max(aligned_err):.2f} ms, stacked {max(naive_err):.2f} ms; "
+          f"aligned() {np.mean(align_ms):.2f} ms per {args.window_s:g} s window "
+          f"({args.boards} boards x {pool.num_channels} ch)")
@@ -1,6 +1,5 @@
 import brainflow
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BrainFlowError, BoardIds
-import serial.tools.list_ports
 
 class BrainFlowBoardSetup:
     """
@@ -19,11 +18,12 @@ class BrainFlowBoardSetup:
         streaming (bool): Flag indicating if the board is actively streaming data.
         eeg_channels (list): List of EEG channel indices for the board (empty if not applicable).
         sampling_rate (int): Sampling rate of the board.
+        buffer_size (int): Size of BrainFlow's ring buffer in samples.
     """
 
     _id_counter = 0  # Class-level variable to assign default IDs
 
-    def __init__(self, board_id, serial_port=None, master_board=None, name=None, **kwargs):
+    def __init__(self, board_id, serial_port=None, master_board=None, name=None, buffer_size=450000, **kwargs):
         """
         Initializes the BrainFlowBoardSetup class with the given board ID, serial port, master board, and additional parameters.
 
@@ -32,6 +32,7 @@ class BrainFlowBoardSetup:
             serial_port (str, optional): The serial port to which the BrainFlow board is connected.
             master_board (int, optional): The master board ID, used for playback or synthetic boards.
             name (str, optional): A user-friendly name or identifier for this instance. Defaults to 'Board X'.
+            buffer_size (int, optional): Samples BrainFlow keeps before overwriting the oldest. Defaults to 450000.
             **kwargs: Additional keyword arguments to be set as attributes on the BrainFlowInputParams instance.
         """
         self.instance_id = BrainFlowBoardSetup._id_counter  # Unique identifier for each instance
@@ -40,6 +41,7 @@ class BrainFlowBoardSetup:
         self.board_id = board_id
         self.serial_port = serial_port
         self.master_board = master_board
+        self.buffer_size = int(buffer_size)
 
         # Assign default name if not provided, based on the class-level ID counter
         self.name = name or f"Board {BrainFlowBoardSetup._id_counter}"
@@ -124,6 +126,8 @@ class BrainFlowBoardSetup:
             list: A list of dictionaries containing 'port', 'serial_number', and 'description' for each compatible device.
                     Returns an empty list if no devices are found.
         """
+        import serial.tools.list_ports  # only needed for auto-detection, keeps pyserial off the import path
+
         BoardShim.disable_board_logger()
         ports = serial.tools.list_ports.comports()
         compatible_ports = []
@@ -176,7 +180,7 @@ class BrainFlowBoardSetup:
         try:
             self.board.prepare_session()
             self.session_prepared = True
-            self.board.start_stream(450000)
+            self.board.start_stream(self.buffer_size)
             self.streaming = True
             print(f"[{self.name}, {self.serial_port}] Board setup and streaming started successfully.")
         except BrainFlowError as e:
@@ -220,16 +224,20 @@ class BrainFlowBoardSetup:
         """
         return self.name
     
-    def get_board_data(self):
+    def get_board_data(self, num_samples=None):
         """
-        Retrieves all accumulated data from the BrainFlow board and clears it from the buffer.
+        Retrieves accumulated data from the BrainFlow board and clears it from the buffer.
+
+        Args:
+            num_samples (int, optional): Oldest samples to take at most; everything if None.
+                Draining in bounded pieces keeps each allocation small.
 
         Returns:
             numpy.ndarray: The current data from the BrainFlow board if the board is set up.
             None: If the board is not set up.
         """
         if self.board is not None:
-            return self.board.get_board_data()
+            return self.board.get_board_data(num_samples)
         else:
             print("Board is not set up.")
             return None
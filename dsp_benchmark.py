@@ -0,0 +1,230 @@
+"""
+Micro-benchmarks of the EEG DSP functions.
+
+Times every DSP backend over a matrix of channel counts, sampling rates, window lengths
+and Welch segment lengths on synthetic EEG, and records per cell:
+
+    throughput     channel-seconds of EEG processed per CPU-second
+    us_per_call    CPU microseconds of one call (one game tick)
+    peak_kb        peak Python/NumPy memory of one call above what was live before it
+    retained_kb    memory still held once the call and its result are gone (should stay ~0)
+
+Results are written as JSON. With --compare, each cell is checked against a stored
+baseline run and regressions beyond the tolerance are listed (exit status 1), so DSP
+changes can be measured before they ship.
+
+Usage:
+    python dsp_benchmark.py --out baseline.json
+    python dsp_benchmark.py --compare baseline.json --tolerance 0.15
+    python dsp_benchmark.py --backends game_welch,numpy_welch --channels 32 --rates 1000
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic_eeg import SyntheticEEG
+
+
+def _game_welch(eeg, fs, nperseg):
+    from redlight_greenlight import _band_power_ratio_fft
+    return _band_power_ratio_fft(eeg, fs, nperseg=nperseg)
+
+
+def _plot_welch(eeg, fs, nperseg):
+    from realtime_bandpower_plot import compute_band_powers
+    return compute_band_powers(eeg, fs, nperseg=nperseg)
+
+
+def _numpy_welch(eeg, fs, nperseg):
+    from offline_bandpower import DEFAULT_BANDS, band_weights, welch_windows
+    freqs, psd = welch_windows(eeg, fs, nperseg)
+    return psd @ band_weights(freqs, DEFAULT_BANDS)
+
+
+def _multitaper(eeg, fs, nperseg):
+    from dsp_sweep import multitaper_windows
+    from offline_bandpower import DEFAULT_BANDS, band_weights
+    freqs, psd = multitaper_windows(eeg, fs, nperseg)
+    return psd @ band_weights(freqs, DEFAULT_BANDS)
+
+
+def _dc_offset(eeg, fs, nperseg):
+    from redlight_greenlight import _remove_dc_offset
+    return _remove_dc_offset(eeg)
+
+
+# name -> (function(eeg, fs, nperseg), whether nperseg changes what it computes, input dtype)
+BACKENDS = {
+    "game_welch": (_game_welch, True, np.float64),
+    "game_tick_f32": (_game_welch, True, np.float32),
+    "plot_welch": (_plot_welch, True, np.float64),
+    "numpy_welch": (_numpy_welch, True, np.float64),
+    "numpy_welch_f32": (_numpy_welch, True, np.float32),
+    "multitaper": (_multitaper, False, np.float64),
+    "dc_offset": (_dc_offset, False, np.float64),
+    "dc_offset_f32": (_dc_offset, False, np.float32),
+}
+KEY_FIELDS = ("backend", "channels", "fs", "window_s", "nperseg")
+
+
+def time_call(fn, args, min_cpu_s=0.2, min_calls=3):
+    """
+    Repeats fn(*args) until it has used min_cpu_s of CPU time.
+
+    Returns:
+        dict: calls, cpu_s, wall_s, peak_kb, retained_kb.
+    """
+    fn(*args)  # warm-up: lazy imports, FFT plan caches
+    calls = 0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    while calls < min_calls or time.process_time() - cpu0 < min_cpu_s:
+        fn(*args)
+        calls += 1
+    cpu_s, wall_s = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = fn(*args)
+    del result
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"calls": calls, "cpu_s": cpu_s, "wall_s": wall_s,
+            "peak_kb": (peak - before) / 1024.0, "retained_kb": max(0, after - before) / 1024.0}
+
+
+def run_benchmarks(backends, channels, rates, windows, npersegs, min_cpu_s=0.2, seed=0, progress=None):
+    """
+    Benchmarks every backend on every cell of the matrix.
+
+    Returns:
+        list: One result dict per (backend, channels, fs, window_s, nperseg) cell; nperseg is
+        None for backends that do not use it.
+    """
+    results = []
+    for fs in rates:
+        for n_ch in channels:
+            gen = SyntheticEEG(n_ch, fs, seed=seed, table_s=max(windows) * 2)
+            signal, _ = gen.generate(int(max(windows) * fs), ratio=1.2)
+            for window_s in windows:
+                window = signal[:, -int(window_s * fs):]
+                for name in backends:
+                    fn, uses_nperseg, dtype = BACKENDS[name]
+                    eeg = np.ascontiguousarray(window, dtype=dtype)
+                    for nperseg in (npersegs if uses_nperseg else [None]):
+                        row = {"backend": name, "channels": n_ch, "fs": fs, "window_s": window_s, "nperseg": nperseg}
+                        row.update(time_call(fn, (eeg, float(fs), nperseg or eeg.shape[1]), min_cpu_s))
+                        cpu_per_call = row["cpu_s"] / row["calls"]
+                        row["us_per_call"] = cpu_per_call * 1e6
+                        row["throughput"] = n_ch * window_s / max(cpu_per_call, 1e-12)
+                        results.append(row)
+                        if progress:
+                            progress(row)
+    return results
+
+
+def environment():
+    info = {"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    try:
+        import scipy
+        info["scipy"] = scipy.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def _key(row):
+    return tuple(row[f] for f in KEY_FIELDS)
+
+
+def compare(results, baseline, tolerance=0.15, memory_slack_kb=64.0):
+    """
+    Cells that got slower or hungrier than the baseline.
+
+    A cell regresses when its throughput drops by more than `tolerance` (relative) or its
+    peak memory grows by more than `tolerance` plus memory_slack_kb.
+
+    Returns:
+        tuple: (regressions, improvements, missing) lists of (key, metric, baseline, current).
+    """
+    base = {_key(row): row for row in baseline}
+    regressions, improvements, missing = [], [], []
+    for row in results:
+        old = base.pop(_key(row), None)
+        if old is None:
+            continue
+        if row["throughput"] < old["throughput"] * (1.0 - tolerance):
+            regressions.append((_key(row), "throughput", old["throughput"], row["throughput"]))
+        elif row["throughput"] > old["throughput"] * (1.0 + tolerance):
+            improvements.append((_key(row), "throughput", old["throughput"], row["throughput"]))
+        if row["peak_kb"] > old["peak_kb"] * (1.0 + tolerance) + memory_slack_kb:
+            regressions.append((_key(row), "peak_kb", old["peak_kb"], row["peak_kb"]))
+    missing = [(key, "missing", None, None) for key in base]
+    return regressions, improvements, missing
+
+
+def format_row(row):
+    nperseg = "-" if row["nperseg"] is None else row["nperseg"]
+    return (f"{row['backend']:<12} {row['channels']:>3} ch {row['fs']:>5} Hz {row['window_s']:>4} s "
+            f"nperseg {nperseg!s:>5} | {row['throughput']:>12,.0f} ch-s/cpu-s  {row['us_per_call']:>9.1f} us  "
+            f"peak {row['peak_kb']:>8.1f} KB  retained {row['retained_kb']:>6.1f} KB")
+
+
+def _format_change(key, metric, old, new):
+    label = " ".join(f"{f}={v}" for f, v in zip(KEY_FIELDS, key))
+    return f"  {label}: {metric} {old:,.1f} -> {new:,.1f} ({(new / old - 1.0) * 100.0 if old else 0.0:+.0f}%)"
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # the game module imports pygame
+    parser = argparse.ArgumentParser(description="Benchmark the EEG DSP backends over channels, rates and windows")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS),
+                        help=f"Comma-separated backends ({', '.join(BACKENDS)})")
+    parser.add_argument("--channels", type=str, default="8,16,32", help="Channel counts")
+    parser.add_argument("--rates", type=str, default="125,250,1000", help="Sampling rates in Hz")
+    parser.add_argument("--windows", type=str, default="1,2,4", help="Window lengths in seconds")
+    parser.add_argument("--nperseg", type=str, default="256,1024", help="Welch segment lengths")
+    parser.add_argument("--min-cpu", type=float, default=0.2, help="CPU seconds spent timing each cell")
+    parser.add_argument("--out", type=str, default="dsp_benchmark.json", help="Where to write the results")
+    parser.add_argument("--compare", type=str, default=None, metavar="BASELINE",
+                        help="Baseline JSON to check for regressions (exit status 1 if any)")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown / memory growth")
+    parser.add_argument("--quiet", action="store_true", help="Do not print each cell")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s) {', '.join(unknown)}; choose from {', '.join(BACKENDS)}")
+    results = run_benchmarks(backends, [int(c) for c in args.channels.split(",")],
+                             [int(r) for r in args.rates.split(",")], [float(w) for w in args.windows.split(",")],
+                             [int(n) for n in args.nperseg.split(",")], min_cpu_s=args.min_cpu,
+                             progress=None if args.quiet else lambda row: print(format_row(row), flush=True))
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=1)
+    print(f"Wrote {len(results)} cells to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("platform") != platform.platform():
+            print("Note: baseline was recorded on a different platform; absolute numbers may not be comparable")
+        regressions, improvements, missing = compare(results, baseline["results"], args.tolerance)
+        if improvements:
+            print(f"{len(improvements)} improvement(s):")
+            print("\n".join(_format_change(*item) for item in improvements))
+        if missing:
+            print(f"{len(missing)} baseline cell(s) not measured in this run")
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}%:")
+            print("\n".join(_format_change(*item) for item in regressions))
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance * 100:.0f}% against {args.compare}")
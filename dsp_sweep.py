@@ -0,0 +1,276 @@
+"""
+DSP parameter sweeps over recorded EEG sessions.
+
+Replays recordings through the game's P1 pipeline (window -> DC removal -> PSD -> alpha
+and beta band power -> per-channel ratio averaged across channels -> speed multiplier) for
+every combination of window length, Welch segment length, refresh hop, PSD estimator and
+band edges, on a process pool, and prints one row per setting:
+
+    cost_ms        median compute time of one tick (one window, all channels)
+    latency_ms     window/2 (centre of the data the tick averages over) + hop/2 (mean wait
+                   for the next tick) + cost_ms
+    mult_std       standard deviation of the speed multiplier over the session
+    mult_step      mean absolute multiplier change between consecutive ticks (jitter)
+    fallback       share of ticks where the game would discard the ratio as too low
+
+Usage:
+    python dsp_sweep.py "spill/*.eegz" --grid WINDOW=1,1.5,2 --grid NPERSEG=128,256,1024
+    python dsp_sweep.py s1.csv s2.csv --board-id 0 --grid HOP=0.1,0.2 --grid ESTIMATOR=welch,multitaper
+"""
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from game_physics import MAX_MULT, RATIO_TO_MULT
+from offline_bandpower import DEFAULT_BANDS, band_weights, load_recording, recording_meta, welch_windows
+
+# The settings the game ships with
+DEFAULT_SETTING = {
+    "WINDOW": 2.0,
+    "NPERSEG": 1024,
+    "HOP": 0.2,
+    "ESTIMATOR": "welch",
+    "ALPHA": DEFAULT_BANDS["alpha"],
+    "BETA": DEFAULT_BANDS["beta"],
+}
+RESULT_COLUMNS = ("ticks", "cost_ms", "latency_ms", "mult_mean", "mult_std", "mult_step", "fallback")
+_EPSILON = 1e-12
+_CHUNK_BUDGET = 32 * 1024 * 1024
+
+
+def periodogram_windows(windows, fs, nperseg):
+    """Single Hann-tapered segment over the whole window (Welch with nperseg = window)."""
+    return welch_windows(windows, fs, windows.shape[-1])
+
+
+def multitaper_windows(windows, fs, nperseg, half_bandwidth=2.5, tapers=4):
+    """DPSS multitaper PSD over the whole window (lower variance than one Hann segment)."""
+    from scipy.signal.windows import dpss
+
+    n = windows.shape[-1]
+    tapers = dpss(n, half_bandwidth, Kmax=tapers)  # (K, n)
+    x = windows - windows.mean(axis=-1, keepdims=True)
+    spec = np.fft.rfft(x[..., None, :] * tapers, axis=-1)
+    psd = (spec.real ** 2 + spec.imag ** 2).mean(axis=-2) / fs
+    if n % 2:
+        psd[..., 1:] *= 2.0
+    else:
+        psd[..., 1:-1] *= 2.0
+    return np.fft.rfftfreq(n, 1.0 / fs), psd
+
+
+ESTIMATORS = {
+    "welch": welch_windows,
+    "periodogram": periodogram_windows,
+    "multitaper": multitaper_windows,
+}
+
+
+def _ratio_ticks(windows, fs, setting):
+    """Channel-averaged alpha/beta ratio and alpha power of (channels, ticks, window) windows."""
+    freqs, psd = ESTIMATORS[setting["ESTIMATOR"]](windows, fs, setting["NPERSEG"])
+    powers = psd @ band_weights(freqs, {"alpha": setting["ALPHA"], "beta": setting["BETA"]})
+    alpha, beta = powers[..., 0], powers[..., 1]
+    return (alpha / (beta + _EPSILON)).mean(axis=0), alpha.mean(axis=0)
+
+
+def evaluate(eeg, fs, setting, timing_ticks=200):
+    """
+    Replays one (channels x samples) recording with one DSP setting.
+
+    Returns:
+        dict: ticks, tick_costs (seconds per timed tick), mult (multiplier per tick), fallback
+        (bool per tick).
+    """
+    win = max(2, int(round(setting["WINDOW"] * fs)))
+    hop = max(1, int(round(setting["HOP"] * fs)))
+    windows = sliding_window_view(eeg, win, axis=-1)[:, ::hop, :]
+    ticks = windows.shape[1]
+    if ticks == 0:
+        return {"ticks": 0, "tick_costs": np.zeros(0), "mult": np.zeros(0), "fallback": np.zeros(0, dtype=bool)}
+
+    # Session trace in batches of ticks
+    # Overlapping Welch segments and multitaper copies expand each window up to ~4x
+    step = max(1, _CHUNK_BUDGET // (8 * eeg.shape[0] * win * 4))
+    ratio = np.empty(ticks)
+    alpha = np.empty(ticks)
+    for t0 in range(0, ticks, step):
+        ratio[t0:t0 + step], alpha[t0:t0 + step] = _ratio_ticks(windows[:, t0:t0 + step], fs, setting)
+
+    # Cost the way the game pays it: one window at a time, DC removal included
+    costs = np.empty(min(timing_ticks, ticks))
+    for i, t in enumerate(np.linspace(0, ticks - 1, costs.size).astype(int)):
+        start = time.perf_counter()
+        window = eeg[:, t * hop:t * hop + win]
+        window = window - window.mean(axis=1, keepdims=True)
+        _ratio_ticks(window[:, None, :], fs, setting)
+        costs[i] = time.perf_counter() - start
+
+    mult = np.clip(ratio * RATIO_TO_MULT, 0.0, MAX_MULT)
+    return {"ticks": ticks, "tick_costs": costs, "mult": mult, "fallback": (ratio <= 0.05) | (alpha <= 0.01)}
+
+
+def summarize(setting, fs, results):
+    """Aggregates evaluate() results of one setting over all recordings into RESULT_COLUMNS."""
+    costs = np.concatenate([r["tick_costs"] for r in results])
+    mult = [r["mult"] for r in results if r["ticks"]]
+    steps = np.concatenate([np.abs(np.diff(m)) for m in mult]) if mult else np.zeros(0)
+    mult = np.concatenate(mult) if mult else np.zeros(0)
+    fallback = np.concatenate([r["fallback"] for r in results])
+    cost_ms = float(np.median(costs) * 1000.0) if costs.size else 0.0
+    win_s = max(2, int(round(setting["WINDOW"] * fs))) / fs
+    hop_s = max(1, int(round(setting["HOP"] * fs))) / fs
+    return {
+        "ticks": int(mult.size),
+        "cost_ms": cost_ms,
+        "latency_ms": (win_s / 2.0 + hop_s / 2.0) * 1000.0 + cost_ms,
+        "mult_mean": float(mult.mean()) if mult.size else 0.0,
+        "mult_std": float(mult.std()) if mult.size else 0.0,
+        "mult_step": float(steps.mean()) if steps.size else 0.0,
+        "fallback": float(fallback.mean()) if fallback.size else 0.0,
+    }
+
+
+def parse_grid(specs):
+    """
+    Turns ["NAME=v1,v2", ...] into {NAME: [v1, v2]}. ESTIMATOR takes names, ALPHA and
+    BETA take "low:high" band edges, the others numbers.
+    """
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip().upper()
+        if name not in DEFAULT_SETTING:
+            raise ValueError(f"Unknown DSP parameter {name!r}; choose from {', '.join(DEFAULT_SETTING)}")
+        parsed = []
+        for value in values.split(","):
+            value = value.strip()
+            if name == "ESTIMATOR":
+                if value not in ESTIMATORS:
+                    raise ValueError(f"Unknown estimator {value!r}; choose from {', '.join(ESTIMATORS)}")
+                parsed.append(value)
+            elif name in ("ALPHA", "BETA"):
+                parsed.append(tuple(float(v) for v in value.split(":")))
+            elif name == "NPERSEG":
+                parsed.append(int(value))
+            else:
+                parsed.append(float(value))
+        grid[name] = parsed
+    return grid
+
+
+def recording_rates(paths, board_id=None, fs=None):
+    """
+    Sampling rate of every recording, from fs or the recording's metadata (no samples loaded).
+
+    Raises:
+        ValueError: A recording whose rate cannot be derived.
+    """
+    rates = []
+    for path in paths:
+        rate = fs or recording_meta(path, board_id).get("sampling_rate")
+        if not rate:
+            raise ValueError(f"{path}: sampling rate unknown; pass --fs or --board-id")
+        rates.append(float(rate))
+    return rates
+
+
+_RECORDINGS = None
+
+
+def _load_recordings(paths, board_id, rates, channels):
+    """Pool initializer: every worker loads the recordings once instead of receiving copies."""
+    global _RECORDINGS
+    _RECORDINGS = []
+    for path, rate in zip(paths, rates):
+        data, meta = load_recording(path, board_id)
+        rows = channels or meta.get("eeg_channels") or list(range(1, 9))
+        _RECORDINGS.append((np.ascontiguousarray(data[rows], dtype=np.float64), rate))
+
+
+def _evaluate_job(args):
+    idx, setting, timing_ticks = args
+    eeg, fs = _RECORDINGS[idx]
+    return fs, evaluate(eeg, fs, setting, timing_ticks)
+
+
+def run_sweep(paths, grid, board_id=None, fs=None, channels=None, workers=None, timing_ticks=200):
+    """
+    Evaluates every combination in grid on every recording on a process pool.
+
+    Returns:
+        list: (setting overrides, summary dict) per grid point, in grid order.
+
+    Raises:
+        ValueError: A recording's sampling rate is unknown (checked before the pool starts).
+    """
+    file_rates = recording_rates(paths, board_id, fs)
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    jobs = [(ci, ri) for ci in range(len(combos)) for ri in range(len(paths))]
+    settings = [dict(DEFAULT_SETTING, **combo) for combo in combos]
+
+    results = [[] for _ in combos]
+    rates = [None] * len(combos)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_recordings,
+                             initargs=(list(paths), board_id, file_rates, channels)) as pool:
+        args = [(ri, settings[ci], timing_ticks) for ci, ri in jobs]
+        for (ci, _), (rate, res) in zip(jobs, pool.map(_evaluate_job, args)):
+            results[ci].append(res)
+            rates[ci] = rate
+    return [(combo, summarize(setting, rate, res))
+            for combo, setting, rate, res in zip(combos, settings, rates, results)]
+
+
+def format_table(rows):
+    names = list(rows[0][0]) if rows else []
+    header = names + list(RESULT_COLUMNS)
+    lines = [header]
+    for setting, summary in rows:
+        cells = [str(setting[n]) for n in names]
+        cells += [f"{summary[c]:.3f}" if isinstance(summary[c], float) else str(summary[c]) for c in RESULT_COLUMNS]
+        lines.append(cells)
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(w) for cell, w in zip(line, widths)) for line in lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep DSP settings over recorded EEG sessions")
+    parser.add_argument("recordings", nargs="+", help="BrainFlow CSV, .npy (rows x samples) or spill file/glob (.eegz)")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="Parameter values to sweep (repeatable): WINDOW=1,2 (s), NPERSEG=256,1024, HOP=0.1,0.2 (s), "
+                             "ESTIMATOR=welch,periodogram,multitaper, ALPHA=8:12,8:13, BETA=12:30,13:30")
+    parser.add_argument("--board-id", type=int, default=None, help="BrainFlow board id (0 = Cyton) for rate and EEG rows")
+    parser.add_argument("--fs", type=float, default=None, help="Sampling rate if it cannot be derived from the board")
+    parser.add_argument("--channels", type=str, default=None, help="Comma-separated EEG rows (default: board's EEG channels)")
+    parser.add_argument("--timing-ticks", type=int, default=200, help="Ticks timed one by one per recording")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--out", type=str, default=None, help="Also write the table as CSV")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid) or {"WINDOW": [DEFAULT_SETTING["WINDOW"]]}
+    channels = [int(c) for c in args.channels.split(",")] if args.channels else None
+    try:
+        recording_rates(args.recordings, args.board_id, args.fs)
+    except ValueError as e:
+        parser.error(str(e))
+    t0 = time.perf_counter()
+    rows = run_sweep(args.recordings, grid, board_id=args.board_id, fs=args.fs, channels=channels,
+                     workers=args.workers, timing_ticks=args.timing_ticks)
+    wall_s = time.perf_counter() - t0
+    print(format_table(rows))
+    print(f"{len(rows)} settings x {len(args.recordings)} recordings in {wall_s:.1f} s "
+          f"on {args.workers or os.cpu_count()} workers")
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(grid) + list(RESULT_COLUMNS))
+            for setting, summary in rows:
+                writer.writerow([setting[n] for n in grid] + [summary[c] for c in RESULT_COLUMNS])
+        print(f"Wrote {args.out}")
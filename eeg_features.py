@@ -0,0 +1,225 @@
+"""
+Neurofeedback features computed from one shared PSD per tick.
+
+Features are small plugins: each declares the bands it needs and a reduction from band
+powers to one number per window. FeatureExtractor takes the union of the bands of the
+features it serves, runs Welch once, integrates all bands with one matrix product
+(channels x bands) and then hands that array to every feature. Adding a metric costs a
+few array operations per tick, not another PSD.
+
+    from eeg_features import FeatureExtractor, register_feature
+
+    @register_feature("alpha_theta", bands=("alpha", "theta"))
+    def alpha_theta(p):
+        return (p["alpha"] / (p["theta"] + EPSILON)).mean(axis=-1)
+
+    extractor = FeatureExtractor(["alpha_beta", "theta_beta", "alpha_theta"])
+    values = extractor.compute(eeg, sfreq)   # {"alpha_beta": 1.3, ...}
+
+Band powers passed to features are shaped (..., channels); reducing over axis=-1 keeps a
+feature valid for single windows and for batched timelines alike.
+
+A single (channels, samples) window, the live tick, runs Welch and the band product in
+buffers the extractor keeps for that window shape, so a steady stream of ticks does not
+allocate segments, FFT output or PSD arrays.
+"""
+import numpy as np
+
+from offline_bandpower import DEFAULT_BANDS, WelchScratch, band_weights, welch_windows
+
+EPSILON = 1e-12
+
+FEATURES = {}
+
+
+class Feature:
+    """
+    A registered feature.
+
+    Attributes:
+        name (str): Registry key.
+        bands (tuple): Band names the feature reads.
+        fn (callable): BandPowers -> array of shape (...) (channels reduced away).
+        description (str): One line for CLIs and HUDs.
+    """
+
+    def __init__(self, name, bands, fn, description=""):
+        self.name = name
+        self.bands = tuple(bands)
+        self.fn = fn
+        self.description = description
+
+
+def register_feature(name, bands, description=""):
+    """Decorator registering fn(band_powers) as feature `name` that reads `bands`."""
+    def decorator(fn):
+        FEATURES[name] = Feature(name, bands, fn, description or (fn.__doc__ or "").strip())
+        return fn
+    return decorator
+
+
+class BandPowers:
+    """
+    Band powers of one tick (or a batch), indexed by band name.
+
+    Attributes:
+        array (numpy.ndarray): (..., channels, bands) band powers.
+        index (dict): Band name -> position along the last axis.
+    """
+
+    def __init__(self, array, names):
+        self.array = array
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def __getitem__(self, band):
+        return self.array[..., self.index[band]]
+
+    @property
+    def total(self):
+        """Summed power of all bands the extractor integrated, per channel."""
+        return self.array.sum(axis=-1)
+
+
+@register_feature("alpha_beta", bands=("alpha", "beta"))
+def alpha_beta(p):
+    """Alpha/beta ratio averaged across channels (the game's P1 control signal)"""
+    return (p["alpha"] / (p["beta"] + EPSILON)).mean(axis=-1)
+
+
+@register_feature("alpha", bands=("alpha",))
+def alpha_power(p):
+    """Mean alpha power across channels"""
+    return p["alpha"].mean(axis=-1)
+
+
+@register_feature("beta", bands=("beta",))
+def beta_power(p):
+    """Mean beta power across channels"""
+    return p["beta"].mean(axis=-1)
+
+
+@register_feature("theta_beta", bands=("theta", "beta"))
+def theta_beta(p):
+    """Theta/beta ratio averaged across channels (inattention index)"""
+    return (p["theta"] / (p["beta"] + EPSILON)).mean(axis=-1)
+
+
+@register_feature("engagement", bands=("theta", "alpha", "beta"))
+def engagement(p):
+    """Beta / (alpha + theta) averaged across channels (engagement index)"""
+    return (p["beta"] / (p["alpha"] + p["theta"] + EPSILON)).mean(axis=-1)
+
+
+@register_feature("relative_alpha", bands=tuple(DEFAULT_BANDS))
+def relative_alpha(p):
+    """Alpha power as a share of delta..gamma power, averaged across channels"""
+    return (p["alpha"] / (p.total + EPSILON)).mean(axis=-1)
+
+
+@register_feature("alpha_asymmetry", bands=("alpha",))
+def alpha_asymmetry(p):
+    """ln(alpha) of the second channel minus the first (e.g. F4 - F3 frontal asymmetry)"""
+    alpha = p["alpha"]
+    if alpha.shape[-1] < 2:
+        return np.zeros(alpha.shape[:-1])
+    return np.log(alpha[..., 1] + EPSILON) - np.log(alpha[..., 0] + EPSILON)
+
+
+class FeatureExtractor:
+    """
+    Computes a set of registered features from one Welch PSD per call.
+
+    Attributes:
+        features (list): Feature objects served, in request order.
+        band_names (list): Union of the bands they need, integrated once per call.
+        bands (dict): Band name -> (low, high) Hz.
+        nperseg (int): Welch segment length (capped at the window length).
+    """
+
+    def __init__(self, features=None, bands=None, nperseg=1024):
+        """
+        Args:
+            features (list, optional): Feature names; all registered features if None.
+            bands (dict, optional): Band edges overriding DEFAULT_BANDS.
+            nperseg (int): Welch segment length.
+        """
+        names = list(FEATURES) if features is None else list(features)
+        unknown = [n for n in names if n not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown feature(s) {', '.join(unknown)}; registered: {', '.join(FEATURES)}")
+        self.features = [FEATURES[n] for n in names]
+        self.bands = dict(DEFAULT_BANDS, **(bands or {}))
+        needed = {band for feature in self.features for band in feature.bands}
+        self.band_names = [b for b in self.bands if b in needed]
+        self.nperseg = nperseg
+        self._weights = {}  # (window length, fs) -> band weight matrix
+        self._scratch = None  # WelchScratch of the last single-window shape
+        self._powers = None  # its (channels, bands) band power buffer
+
+    def _band_weights(self, freqs, sfreq):
+        key = (freqs.size, float(sfreq))
+        weights = self._weights.get(key)
+        if weights is None:
+            weights = self._weights[key] = band_weights(freqs, {b: self.bands[b] for b in self.band_names})
+        return weights
+
+    def analyze(self, eeg, sfreq):
+        """
+        PSD, band powers and all served features of the window(s) in eeg.
+
+        Args:
+            eeg (numpy.ndarray): (..., channels, samples) EEG; each segment is detrended, so
+                no separate DC removal is needed.
+            sfreq (float): Sampling rate.
+
+        Returns:
+            tuple: (freqs, psd of shape (..., channels, n_freqs), BandPowers of self.band_names,
+            feature values dict). Values are floats for a single (channels, samples) window
+            and arrays over the leading axes for batched input. For a single window, psd and
+            the band powers are the extractor's buffers and the next call overwrites them.
+        """
+        eeg = np.asarray(eeg)
+        if eeg.ndim == 1:
+            eeg = eeg[None, :]
+        if eeg.ndim == 2:
+            scratch = self._scratch
+            if scratch is None or scratch.shape != eeg.shape or scratch.fs != float(sfreq):
+                scratch = self._scratch = WelchScratch(eeg.shape, sfreq, self.nperseg)
+                self._powers = np.empty((eeg.shape[0], len(self.band_names)))
+            freqs, psd = scratch.compute(eeg)
+            powers = BandPowers(np.matmul(psd, self._band_weights(freqs, sfreq), out=self._powers), self.band_names)
+        else:
+            freqs, psd = welch_windows(eeg, sfreq, self.nperseg)
+            powers = BandPowers(psd @ self._band_weights(freqs, sfreq), self.band_names)
+        values = {feature.name: feature.fn(powers) for feature in self.features}
+        if eeg.ndim == 2:
+            values = {name: float(value) for name, value in values.items()}
+        return freqs, psd, powers, values
+
+    def compute(self, eeg, sfreq):
+        """Feature name -> value for the window(s) in eeg (see analyze())."""
+        return self.analyze(eeg, sfreq)[3]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from synthetic_eeg import SyntheticEEG
+
+    parser = argparse.ArgumentParser(description="List registered EEG features and time them on synthetic EEG")
+    parser.add_argument("--channels", type=int, default=8, help="EEG channels")
+    parser.add_argument("--fs", type=float, default=250.0, help="Sampling rate")
+    parser.add_argument("--ticks", type=int, default=500, help="Ticks to time")
+    args = parser.parse_args()
+
+    eeg, _ = SyntheticEEG(args.channels, args.fs, seed=0).generate(int(2.0 * args.fs), ratio=1.5)
+    single = FeatureExtractor(["alpha_beta"])
+    everything = FeatureExtractor()
+    for extractor, label in ((single, "alpha_beta only"), (everything, f"all {len(FEATURES)} features")):
+        t0 = time.perf_counter()
+        for _ in range(args.ticks):
+            values = extractor.compute(eeg, args.fs)
+        print(f"{label:<20} {(time.perf_counter() - t0) / args.ticks * 1e6:8.1f} us/tick")
+    for name, value in values.items():
+        print(f"  {name:<16} {value:10.3f}  {FEATURES[name].description}")
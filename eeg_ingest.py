@@ -0,0 +1,266 @@
+"""
+Gap-aware ingest of drained BrainFlow chunks.
+
+StreamIngest receives every chunk drained from the board (get_board_data()), checks the
+package-number and timestamp channels across the whole chunk in a few array operations,
+fills short radio dropouts by linear interpolation, and keeps the most recent window in a
+ring buffer for the DSP. Live counters tell apart the three usual sources of lag:
+
+    radio  package numbers skip            -> packets_lost / loss_rate
+    host   timestamps jump without a skip  -> host_gaps / jitter_ms / latency_ms
+    loop   we drain too rarely             -> drain_interval_ms
+"""
+import time
+
+import numpy as np
+
+PACKAGE_MODULUS = 256  # OpenBCI package counters wrap at one byte
+# Package counter increment per sample where it is not 1 (Cyton + Daisy interleaves two boards)
+PACKAGE_STEP = {2: 2}
+_EWMA = 0.1
+
+
+class StreamIngest:
+    """
+    Ring buffer of the latest board samples with packet-loss and timestamp gap detection.
+
+    Attributes:
+        sampling_rate (float): Nominal sampling rate.
+        capacity (int): Samples kept in the live ring.
+        contiguous (int): Samples since the last gap too long to interpolate; windows
+            returned by latest() never reach back across such a gap.
+        samples_received (int): Samples drained from the board.
+        packets_lost (int): Samples missing according to the package counter.
+        interpolated (int): Missing samples filled in by interpolation.
+        unfilled_gaps (int): Dropouts longer than max_fill_s (not interpolated).
+        host_gaps (int): Timestamp jumps not explained by lost packets.
+        jitter_ms (float): Smoothed standard deviation of the sample interval error.
+        max_gap_ms (float): Longest timestamp gap seen.
+        drain_interval_ms (float): Smoothed host time between drains.
+        latency_ms (float): Host clock minus the newest sample timestamp at the last drain.
+        eeg_ring (numpy.ndarray): EEG rows only, contiguous and in eeg_dtype, filled alongside
+            the full ring so the DSP never slices or converts board data itself (None
+            without eeg_rows).
+    """
+
+    def __init__(self, num_rows, sampling_rate, package_row=None, timestamp_row=None, window_s=10.0,
+                 package_step=1, max_fill_s=0.25, host_gap_factor=3.0, eeg_rows=None, eeg_dtype=np.float64):
+        """
+        Args:
+            num_rows (int): Rows of the board data.
+            sampling_rate (float): Nominal sampling rate in Hz.
+            package_row (int, optional): Row of the package counter.
+            timestamp_row (int, optional): Row of the (unix seconds) sample timestamps.
+            window_s (float): Length of the live ring in seconds.
+            package_step (int): Package counter increment per sample.
+            max_fill_s (float): Longest dropout that is interpolated instead of cutting the window.
+            host_gap_factor (float): A sample interval longer than this many nominal intervals
+                (beyond what lost packets explain) counts as a host gap.
+            eeg_rows (list, optional): EEG rows to extract once at ingest for latest_eeg().
+            eeg_dtype: dtype of the extracted EEG (float32 halves DSP memory traffic).
+        """
+        self.num_rows = int(num_rows)
+        self.sampling_rate = float(sampling_rate)
+        self.package_row = package_row
+        self.timestamp_row = timestamp_row
+        self.package_step = int(package_step)
+        self.max_fill = max(0, int(max_fill_s * self.sampling_rate))
+        self.host_gap_factor = host_gap_factor
+        self.capacity = max(1, int(window_s * self.sampling_rate))
+        self.ring = np.zeros((self.num_rows, self.capacity))
+        self.filled = np.zeros(self.capacity, dtype=bool)  # True where a sample was interpolated
+        self.eeg_rows = list(eeg_rows) if eeg_rows else None
+        self.eeg_ring = np.zeros((len(self.eeg_rows), self.capacity), dtype=eeg_dtype) if self.eeg_rows else None
+        self.reset()
+
+    def restart(self):
+        """Forgets the buffered window but keeps the counters (e.g. after a reconnect)."""
+        self.write_pos = 0
+        self.contiguous = 0
+        self._last = None
+        self._last_drain = None
+
+    def reset(self):
+        """Forgets the buffered window and zeroes the counters."""
+        self.restart()
+        self.samples_received = 0
+        self.packets_lost = 0
+        self.interpolated = 0
+        self.unfilled_gaps = 0
+        self.host_gaps = 0
+        self.jitter_ms = 0.0
+        self.max_gap_ms = 0.0
+        self.drain_interval_ms = 0.0
+        self.latency_ms = 0.0
+
+    @property
+    def loss_rate(self):
+        total = self.samples_received + self.packets_lost
+        return self.packets_lost / total if total else 0.0
+
+    def _write(self, block, filled):
+        n = block.shape[1]
+        if n >= self.capacity:
+            block, filled, n = block[:, -self.capacity:], filled[-self.capacity:], self.capacity
+        end = self.write_pos + n
+        if end <= self.capacity:
+            spans = ((slice(self.write_pos, end), slice(0, n)),)
+        else:
+            first = self.capacity - self.write_pos
+            spans = ((slice(self.write_pos, None), slice(0, first)), (slice(0, n - first), slice(first, n)))
+        for dst, src in spans:
+            self.ring[:, dst] = block[:, src]
+            self.filled[dst] = filled[src]
+            if self.eeg_ring is not None:
+                self.eeg_ring[:, dst] = block[self.eeg_rows, src]
+        self.write_pos = end % self.capacity
+        self.contiguous = min(self.capacity, self.contiguous + n)
+
+    def push(self, chunk):
+        """
+        Ingests one drained chunk (num_rows x n).
+
+        Returns:
+            int: Samples written to the ring, interpolated ones included.
+        """
+        now = time.time()
+        if self._last_drain is not None:
+            interval = (now - self._last_drain) * 1000.0
+            self.drain_interval_ms += _EWMA * (interval - self.drain_interval_ms)
+        self._last_drain = now
+        if chunk is None or chunk.ndim != 2 or chunk.shape[1] == 0:
+            return 0
+        n = chunk.shape[1]
+        self.samples_received += n
+        # Previous chunk's last sample anchors the first interval; without one the first
+        # sample is duplicated so every sample has a predecessor column in ext
+        anchor = self._last if self._last is not None else chunk[:, 0]
+        ext = np.concatenate((anchor[:, None], chunk), axis=1)
+
+        # Radio: samples skipped by the package counter before each sample of the chunk
+        if self.package_row is not None:
+            step = np.diff(ext[self.package_row]) % PACKAGE_MODULUS
+            missing = np.maximum(np.rint(step / self.package_step).astype(np.intp) - 1, 0)
+        else:
+            missing = np.zeros(n, dtype=np.intp)
+        if self._last is None:
+            missing[0] = 0
+        self.packets_lost += int(missing.sum())
+
+        # Host: sample intervals against the nominal rate, net of the lost packets
+        if self.timestamp_row is not None:
+            nominal = 1.0 / self.sampling_rate
+            dts = np.diff(ext[self.timestamp_row])
+            error = dts - nominal * (missing + 1)
+            if self._last is None:
+                error[0] = 0.0
+            self.jitter_ms += _EWMA * (float(np.std(error)) * 1000.0 - self.jitter_ms)
+            self.max_gap_ms = max(self.max_gap_ms, float(dts.max()) * 1000.0)
+            self.host_gaps += int(np.count_nonzero(error > nominal * (self.host_gap_factor - 1)))
+            self.latency_ms = (now - float(chunk[self.timestamp_row, -1])) * 1000.0
+        self._last = chunk[:, -1].copy()
+
+        # Dropouts longer than max_fill cut the window: keep only what follows the last one
+        long_gaps = np.flatnonzero(missing > self.max_fill)
+        if long_gaps.size:
+            self.unfilled_gaps += int(long_gaps.size)
+            cut = int(long_gaps[-1])
+            ext = ext[:, cut:]
+            missing = missing[cut:].copy()
+            missing[0] = 0
+            self.contiguous = 0
+
+        fill_total = int(missing.sum())
+        if fill_total:
+            block, filled = self._interpolate(ext, missing, fill_total)
+            self.interpolated += fill_total
+        else:
+            block, filled = ext[:, 1:], np.zeros(ext.shape[1] - 1, dtype=bool)
+        self._write(block, filled)
+        return block.shape[1]
+
+    @staticmethod
+    def _interpolate(ext, missing, fill_total):
+        """
+        Inserts missing[i] linearly interpolated samples between ext[:, i] and ext[:, i + 1].
+
+        Returns:
+            tuple: (block of ext[:, 1:] with the fills inserted, bool mask of the filled samples).
+        """
+        n = missing.size
+        out_len = n + fill_total
+        ends = np.cumsum(missing)
+        block = np.empty((ext.shape[0], out_len))
+        filled = np.ones(out_len, dtype=bool)
+        pos = np.arange(n) + ends  # output slot of every real sample
+        block[:, pos] = ext[:, 1:]
+        filled[pos] = False
+        # Fills of gap i occupy the slots just before pos[i], in order
+        gap = np.repeat(np.arange(n), missing)
+        rank = np.arange(fill_total) - np.repeat(ends - missing, missing)
+        frac = (rank + 1) / (missing[gap] + 1)
+        before = ext[:, gap]
+        block[:, filled] = before + (ext[:, gap + 1] - before) * frac
+        return block, filled
+
+    def latest(self, num_samples):
+        """
+        Copy of the newest num_samples (fewer if the contiguous window is shorter).
+
+        Returns:
+            numpy.ndarray: (num_rows, k) array, oldest sample first.
+        """
+        k = min(int(num_samples), self.contiguous)
+        if k <= 0:
+            return np.empty((self.num_rows, 0))
+        start = self.write_pos - k
+        if start >= 0:
+            return self.ring[:, start:self.write_pos].copy()
+        return np.concatenate((self.ring[:, start:], self.ring[:, :self.write_pos]), axis=1)
+
+    def latest_eeg(self, num_samples, out=None):
+        """
+        Newest num_samples of the EEG rows as one contiguous (channels, k) array in eeg_dtype.
+
+        Args:
+            num_samples (int): Samples wanted (fewer come back if the contiguous window is shorter).
+            out (numpy.ndarray, optional): (channels, >= k) buffer to fill instead of allocating;
+                the returned array is then a view of it that the caller may modify in place.
+
+        Returns:
+            numpy.ndarray: EEG window, oldest sample first.
+        """
+        k = max(0, min(int(num_samples), self.contiguous))
+        if out is None:
+            out = np.empty((self.eeg_ring.shape[0], k), dtype=self.eeg_ring.dtype)
+        window = out[:, :k]
+        start = self.write_pos - k
+        if start >= 0:
+            window[:] = self.eeg_ring[:, start:self.write_pos]
+        else:
+            window[:, :-start] = self.eeg_ring[:, start:]
+            window[:, -start:] = self.eeg_ring[:, :self.write_pos]
+        return window
+
+    def latest_filled_fraction(self, num_samples):
+        """Share of interpolated samples in the window latest(num_samples) would return."""
+        k = min(int(num_samples), self.contiguous)
+        if k <= 0:
+            return 0.0
+        idx = (self.write_pos - k + np.arange(k)) % self.capacity
+        return float(self.filled[idx].mean())
+
+    def stats(self):
+        """Live counters as a dict (for HUDs, logs and benchmarks)."""
+        return {
+            "samples_received": self.samples_received,
+            "packets_lost": self.packets_lost,
+            "loss_rate": self.loss_rate,
+            "interpolated": self.interpolated,
+            "unfilled_gaps": self.unfilled_gaps,
+            "host_gaps": self.host_gaps,
+            "jitter_ms": self.jitter_ms,
+            "max_gap_ms": self.max_gap_ms,
+            "drain_interval_ms": self.drain_interval_ms,
+            "latency_ms": self.latency_ms,
+        }
@@ -0,0 +1,129 @@
+"""
+Game-event markers for the EEG stream.
+
+The game loop hands events to BoardConnectionManager.mark(), which only appends to a
+queue. The manager's worker thread inserts them into the board's marker channel and, as
+samples arrive, resolves each event's host time to the index of the first sample stamped
+at or after it. That index counts drained samples since the manager started, which is the
+same sample numbering as the spill recording, so offline analysis can cut red/green epochs
+straight out of the raw data without a second, clock-skewed log.
+"""
+import collections
+import os
+import time
+
+import numpy as np
+
+# BrainFlow marker values must be non-zero
+MARKER_CODES = {
+    "match_start": 1,
+    "light_green": 2,
+    "light_yellow": 3,
+    "light_red": 4,
+    "car_spawn": 5,
+    "collision": 6,
+    "eliminated": 7,
+    "game_over": 8,
+}
+MARKER_NAMES = {code: name for name, code in MARKER_CODES.items()}
+
+
+def marker_name(event, value=None):
+    """Marker name of a GameSimulation event ("light" events are split per color)."""
+    return f"light_{value}" if event == "light" else event
+
+
+class EventIndex:
+    """
+    Host-side index of game events, aligned to stream sample numbers.
+
+    Attributes:
+        events (collections.deque): Resolved (sample_index, host_time, code, name, value)
+            tuples, newest last (bounded by max_events).
+        pending (list): Events still waiting for a sample stamped at or after them (at most
+            max_pending; the oldest are dropped beyond that).
+        dropped (int): Pending events dropped because no samples arrived to resolve them.
+        path (str): CSV file the resolved events are appended to, or None.
+    """
+
+    HEADER = "sample_index,host_time,code,name,value\n"
+
+    def __init__(self, path=None, max_events=10000, max_pending=1000):
+        self.events = collections.deque(maxlen=max_events)
+        self.pending = []
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.path = path
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a")
+            if self._file.tell() == 0:
+                self._file.write(self.HEADER)
+
+    def add(self, host_time, name, value=None):
+        if len(self.pending) >= self.max_pending:
+            del self.pending[0]
+            self.dropped += 1
+        self.pending.append((host_time, MARKER_CODES.get(name, 0), name, value))
+
+    def resolve(self, timestamps, base_index):
+        """
+        Assigns sample indices to pending events covered by a freshly drained chunk.
+
+        Args:
+            timestamps (numpy.ndarray): Host timestamps of the chunk's samples.
+            base_index (int): Stream index of the chunk's first sample.
+        """
+        if not self.pending or timestamps is None or timestamps.size == 0:
+            return
+        newest = timestamps[-1]
+        ready = [ev for ev in self.pending if ev[0] <= newest]
+        if not ready:
+            return
+        self.pending = [ev for ev in self.pending if ev[0] > newest]
+        offsets = np.searchsorted(timestamps, [ev[0] for ev in ready], side="left")
+        self._store(base_index + offsets, ready)
+
+    def resolve_by_count(self, end_index, end_time, sampling_rate):
+        """
+        Assigns sample indices to pending events from the sample count alone, for boards
+        without a timestamp row: each event is placed sampling_rate * (end_time - host_time)
+        samples before the end of the stream.
+
+        Args:
+            end_index (int): Stream index one past the newest sample.
+            end_time (float): time.time() the newest sample was drained.
+            sampling_rate (float): Nominal samples per second.
+        """
+        ready = [ev for ev in self.pending if ev[0] <= end_time]
+        if not ready or end_index <= 0:
+            return
+        self.pending = [ev for ev in self.pending if ev[0] > end_time]
+        back = np.rint((end_time - np.array([ev[0] for ev in ready])) * sampling_rate).astype(np.int64)
+        self._store(np.clip(end_index - back, 0, end_index - 1), ready)
+
+    def _store(self, indices, ready):
+        for index, (host_time, code, name, value) in zip(indices.tolist(), ready):
+            row = (index, host_time, code, name, value)
+            self.events.append(row)
+            if self._file is not None:
+                self._file.write(f"{index},{host_time:.6f},{code},{name},{'' if value is None else value}\n")
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def default_index_path(directory):
+    return os.path.join(directory, f"events-{time.strftime('%Y%m%d-%H%M%S')}.csv")
+
+
+def load_event_index(path):
+    """Reads an event index CSV into (sample_index, host_time, code) arrays plus names."""
+    data = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+    data = np.atleast_1d(data)
+    return data["sample_index"], data["host_time"], data["code"], [str(n) for n in data["name"]]
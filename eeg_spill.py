@@ -0,0 +1,204 @@
+"""
+Spill-to-disk recording of drained board data for long sessions.
+
+SpillWriter takes the chunks the connection manager drains from the board, packs them
+into fixed-size blocks and hands full blocks to a writer thread. That thread appends each
+block zlib-compressed to the current spill file and starts a new file once the current
+one passes max_bytes or max_seconds. Memory use is bounded by the block buffer and a short
+queue, however long the session runs; optionally only the newest keep_files files are kept.
+
+File layout (.eegz):
+    b"EEGZ1\\n", one JSON metadata line, then frames of
+    <uint32 rows><uint32 samples><uint32 compressed bytes><zlib(float64 rows x samples)>
+
+Usage:
+    python eeg_spill.py spill/session-*.eegz   # summary of recorded files
+"""
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"EEGZ1\n"
+_FRAME = struct.Struct("<III")
+
+
+class SpillWriter:
+    """
+    Chunked, compressed, rotating on-disk log of raw board data.
+
+    Attributes:
+        directory (str): Where spill files are written.
+        files (list): Paths written so far, oldest first (pruned ones removed).
+        samples_written (int): Samples handed to disk.
+        bytes_written (int): Compressed bytes written.
+        dropped_blocks (int): Blocks discarded because the disk could not keep up.
+    """
+
+    def __init__(self, directory, num_rows, sampling_rate, block_s=5.0, max_bytes=64 * 1024 * 1024,
+                 max_seconds=3600.0, keep_files=None, compress_level=3, queue_blocks=8, meta=None):
+        """
+        Args:
+            directory (str): Output directory (created if missing).
+            num_rows (int): Rows of the board data.
+            sampling_rate (float): Nominal sampling rate, used to size blocks.
+            block_s (float): Seconds of data per compressed frame.
+            max_bytes (int): Rotate once a file grows past this size.
+            max_seconds (float): Rotate once a file covers this much wall time.
+            keep_files (int, optional): Delete the oldest files beyond this count.
+            compress_level (int): zlib level (1 fast ... 9 small).
+            queue_blocks (int): Full blocks that may wait for the writer before new ones are dropped.
+            meta (dict, optional): Extra metadata stored in every file header.
+        """
+        self.directory = directory
+        self.num_rows = int(num_rows)
+        self.sampling_rate = float(sampling_rate)
+        self.block_samples = max(1, int(block_s * self.sampling_rate))
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.keep_files = keep_files
+        self.compress_level = compress_level
+        self.meta = dict(meta or {})
+        os.makedirs(directory, exist_ok=True)
+
+        self.files = []
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.dropped_blocks = 0
+        # A fixed set of blocks cycles between filling, the queue and the writer
+        self._free = queue.Queue()
+        for _ in range(queue_blocks + 2):
+            self._free.put(np.empty((self.num_rows, self.block_samples)))
+        self._full = queue.Queue(maxsize=queue_blocks)
+        self._block = self._free.get()
+        self._fill = 0
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._thread = threading.Thread(target=self._run, name="eeg-spill", daemon=True)
+        self._thread.start()
+
+    def write(self, chunk):
+        """Queues a (num_rows x n) chunk for disk. Never blocks on I/O."""
+        if chunk is None or chunk.ndim != 2 or chunk.shape[1] == 0:
+            return
+        pos = 0
+        n = chunk.shape[1]
+        while pos < n:
+            take = min(n - pos, self.block_samples - self._fill)
+            self._block[:, self._fill:self._fill + take] = chunk[:, pos:pos + take]
+            self._fill += take
+            pos += take
+            if self._fill == self.block_samples:
+                self._hand_off(self._fill)
+
+    def _hand_off(self, count):
+        try:
+            self._full.put_nowait((self._block, count))
+        except queue.Full:
+            self.dropped_blocks += 1
+            self._fill = 0
+            return
+        self._block = self._free.get()
+        self._fill = 0
+
+    def close(self, timeout=10.0):
+        """Flushes the partial block and waits for the writer to finish."""
+        if self._fill:
+            self._hand_off(self._fill)
+        self._full.put((None, 0))
+        self._thread.join(timeout)
+
+    def _open(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"session-{stamp}-{len(self.files) + 1:04d}.eegz")
+        self._file = open(path, "wb")
+        header = dict(self.meta, rows=self.num_rows, sampling_rate=self.sampling_rate, started=time.time())
+        self._file_bytes = self._file.write(MAGIC + json.dumps(header).encode() + b"\n")
+        self._file_opened = time.monotonic()
+        self.files.append(path)
+        if self.keep_files is not None:
+            while len(self.files) > self.keep_files:
+                try:
+                    os.remove(self.files.pop(0))
+                except OSError:
+                    pass
+
+    def _rotate_due(self):
+        return self._file_bytes >= self.max_bytes or time.monotonic() - self._file_opened >= self.max_seconds
+
+    def _run(self):
+        while True:
+            block, count = self._full.get()
+            if block is None:
+                break
+            if self._file is None or self._rotate_due():
+                if self._file is not None:
+                    self._file.close()
+                self._open()
+            payload = zlib.compress(block[:, :count].tobytes(), self.compress_level)
+            self._file.write(_FRAME.pack(self.num_rows, count, len(payload)))
+            self._file.write(payload)
+            self._file.flush()
+            self._file_bytes += _FRAME.size + len(payload)
+            self.bytes_written += _FRAME.size + len(payload)
+            self.samples_written += count
+            self._free.put(block)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_spill_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a spill file")
+        return json.loads(f.readline())
+
+
+def iter_spill_chunks(path):
+    """Yields the (rows x samples) float64 blocks of one spill file in order."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a spill file")
+        f.readline()
+        while True:
+            head = f.read(_FRAME.size)
+            if len(head) < _FRAME.size:
+                return
+            rows, count, size = _FRAME.unpack(head)
+            payload = f.read(size)
+            if len(payload) < size:
+                return  # file cut short by a crash; everything before is intact
+            yield np.frombuffer(zlib.decompress(payload), dtype=np.float64).reshape(rows, count)
+
+
+def load_spill(paths):
+    """Concatenates one or more spill files (a path, a glob pattern or a list) in name order."""
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths)) or [paths]
+    chunks = [chunk for path in paths for chunk in iter_spill_chunks(path)]
+    if not chunks:
+        return np.empty((0, 0))
+    return np.concatenate(chunks, axis=1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize spill files written during long EEG sessions")
+    parser.add_argument("files", nargs="+", help="Spill files (.eegz)")
+    args = parser.parse_args()
+
+    for path in sorted(args.files):
+        header = read_spill_header(path)
+        samples = sum(chunk.shape[1] for chunk in iter_spill_chunks(path))
+        seconds = samples / header["sampling_rate"] if header["sampling_rate"] else 0.0
+        print(f"{path}: {header['rows']} rows, {samples} samples ({seconds / 60.0:.1f} min), "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
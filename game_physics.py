@@ -0,0 +1,357 @@
+"""
+Struct-of-arrays player model and vectorized physics for Red Light, Green Light.
+
+All per-player state lives in NumPy arrays indexed by player id, so movement,
+lateral integration, road clamping and push-apart cost the same handful of array
+operations whether two or sixteen chickens are on the road. Nothing in here
+touches pygame, which keeps the physics usable headless.
+"""
+import numpy as np
+
+# Perspective scaling controls
+SCALE_FAR = 0.35  # size at horizon
+SCALE_NEAR = 1.35  # size near bottom
+SCALE_GAMMA = 1.15  # >1 exaggerates shrinking near horizon
+
+MAX_MULT = 1.6
+RATIO_TO_MULT = 0.5
+
+_NO_IDS = np.empty(0, dtype=np.intp)
+
+
+class RoadGeometry:
+    """
+    Screen/world projection for the tilted perspective road.
+
+    World y grows towards the viewer and is measured relative to the camera; world x is
+    measured from the road center line and scaled by depth, so the road edges in world
+    units depend on how far down the screen a player is.
+
+    Attributes:
+        width (int): Screen width in pixels.
+        height (int): Screen height in pixels.
+        horizon_y (int): Screen y of the horizon line.
+        road_tilt (float): Horizontal offset of the road center at the horizon.
+        top_width (float): Road width at the horizon in pixels.
+        bottom_width (float): Road width at the bottom of the screen in pixels.
+        player_size (int): Player sprite size at unit scale.
+    """
+
+    def __init__(self, width, height, player_size=None):
+        self.width = int(width)
+        self.height = int(height)
+        self.player_size = player_size if player_size is not None else max(28, int(min(width, height) * 0.06))
+        self.horizon_y = int(height * 0.35)
+        self.road_tilt = -int(width * 0.08)
+        self.bottom_width = int(width * 0.8)
+        self.top_width = int(width * 0.2)
+        self.depth_span = max(1, self.height - self.horizon_y)
+
+    def depth(self, world_y, camera_y, out=None):
+        """Normalized depth v in (0, 1] of world y positions (0 = horizon, 1 = screen bottom)."""
+        v = np.subtract(world_y, camera_y, out=out)
+        v /= self.depth_span
+        return np.clip(v, 0.0001, 1.0, out=v)
+
+    def scale(self, v, out=None):
+        """Sprite scale at depth v."""
+        sc = np.power(v, SCALE_GAMMA, out=out)
+        sc *= SCALE_NEAR - SCALE_FAR
+        sc += SCALE_FAR
+        return sc
+
+    def half_width(self, v, out=None):
+        """Half road width in pixels at depth v."""
+        halfw = np.multiply(v, (self.bottom_width - self.top_width) * 0.5, out=out)
+        halfw += self.top_width * 0.5
+        return halfw
+
+    def player_extents(self, world_y, camera_y, out=None):
+        """
+        Vectorized per-player hitbox and road limits in world units.
+
+        Args:
+            world_y (numpy.ndarray): World y of each player.
+            camera_y (float): Current camera world y.
+            out (tuple, optional): Six preallocated arrays to write into instead of allocating.
+
+        Returns:
+            tuple: (v, scale, x_min, x_max, half_x, height) arrays, where x_min/x_max are the
+            world x limits that keep the hitbox on the road.
+        """
+        if out is None:
+            out = tuple(np.empty(np.shape(world_y)) for _ in range(6))
+        v, sc, x_min, x_max, half_x, height = out
+        self.depth(world_y, camera_y, out=v)
+        self.scale(v, out=sc)
+        np.multiply(sc, self.player_size * 0.35, out=half_x)  # pixel half width for now
+        self.half_width(v, out=x_max)  # road half width for now
+        np.subtract(half_x, x_max, out=x_min)
+        x_min /= v
+        np.negative(x_min, out=x_max)
+        half_x /= v
+        np.multiply(sc, self.player_size * 0.65, out=height)
+        return out
+
+
+class PlayerArrays:
+    """
+    Struct-of-arrays state for N players.
+
+    Attributes:
+        count (int): Number of players.
+        start_y (float): World y every player starts from; red light never pushes past it.
+        home_x (numpy.ndarray): Spawn world x of each player.
+        x, y, vx (numpy.ndarray): World position and lateral velocity.
+        ratio (numpy.ndarray): Latest alpha/beta (or test) ratio driving each player.
+        mult (numpy.ndarray): Speed multiplier derived from ratio.
+        alive (numpy.ndarray): Boolean mask of players still in the match.
+        extents (tuple): (v, scale, x_min, x_max, half_x, height) scratch arrays refreshed
+            by RoadGeometry.player_extents so per-frame physics does not allocate.
+    """
+
+    def __init__(self, count, player_size, start_y=0.0):
+        self.count = int(count)
+        self.start_y = float(start_y)
+        self.home_x = (np.arange(self.count) - (self.count - 1) * 0.5) * (player_size * 0.7)
+        self.x = np.empty(self.count)
+        self.y = np.empty(self.count)
+        self.vx = np.empty(self.count)
+        self.ratio = np.empty(self.count)
+        self.mult = np.empty(self.count)
+        self.alive = np.empty(self.count, dtype=bool)
+        self.extents = tuple(np.empty(self.count) for _ in range(6))
+        self._tmp = np.empty((3, self.count))
+        self._mask = np.empty((2, self.count), dtype=bool)
+        self._ranks = np.arange(1, self.count + 1)  # sweep: box i only tests boxes after it
+        self.reset()
+
+    def reset(self):
+        """Puts every player back at its spawn point, standing still and alive."""
+        self.x[:] = self.home_x
+        self.y.fill(self.start_y)
+        self.vx.fill(0.0)
+        self.ratio.fill(1.0)
+        self.mult.fill(0.0)
+        self.alive.fill(True)
+
+    def update_multipliers(self, ratio_to_mult=RATIO_TO_MULT, max_mult=MAX_MULT):
+        """Direct translation of ratios to speed multipliers (clamped to a reasonable range)."""
+        np.multiply(self.ratio, ratio_to_mult, out=self.mult)
+        np.clip(self.mult, 0.0, max_mult, out=self.mult)
+
+    def alive_count(self):
+        return int(np.count_nonzero(self.alive))
+
+    def update_extents(self, road, camera_y):
+        """Refreshes the extents scratch arrays for the current positions and camera."""
+        return road.player_extents(self.y, camera_y, out=self.extents)
+
+    def eliminate(self, mask):
+        """
+        Removes the players in mask from the match.
+
+        If that would leave nobody standing, the highest-id player among them survives,
+        which keeps the two-player tie-break of the original game (P1 is checked first).
+
+        Returns:
+            numpy.ndarray: Ids of the players that were eliminated.
+        """
+        if not (mask & self.alive).any():
+            return _NO_IDS
+        hit = np.flatnonzero(mask & self.alive)
+        if hit.size == self.alive_count():
+            hit = hit[:-1]
+        self.alive[hit] = False
+        return hit
+
+
+def apply_light_movement(players, light_state, move_speed, dt_sec):
+    """Forward on green/yellow, backwards (never past the start line) on red."""
+    active = np.greater(players.mult, 0.0, out=players._mask[0])
+    active &= players.alive
+    step = np.multiply(players.mult, move_speed * dt_sec, out=players._tmp[0])
+    if light_state in ("green", "yellow"):
+        np.subtract(players.y, step, out=players.y, where=active)
+    elif light_state == "red":
+        step += players.y
+        np.minimum(step, players.start_y, out=step)
+        np.copyto(players.y, step, where=active)
+
+
+def integrate_lateral(players, steer, accel_base, max_base, drag, dt_sec):
+    """
+    Lateral acceleration, drag and speed cap for all players at once.
+
+    Args:
+        players (PlayerArrays): Player state, updated in place.
+        steer (numpy.ndarray): -1, 0 or +1 steering input per player.
+        accel_base (float): Lateral acceleration at multiplier 1.0.
+        max_base (float): Lateral speed cap at multiplier 1.0.
+        drag (float): Linear drag coefficient per second.
+        dt_sec (float): Frame time in seconds.
+    """
+    scale = np.maximum(players.mult, 0.1, out=players._tmp[0])  # 10% baseline so slow players can still dodge
+    vx = np.multiply(steer, accel_base * dt_sec, out=players._tmp[1])
+    vx *= scale
+    vx += players.vx
+    vx *= 1.0 - drag * dt_sec
+    cap = np.multiply(scale, max_base, out=scale)
+    np.minimum(vx, cap, out=vx)
+    np.negative(cap, out=cap)
+    np.maximum(vx, cap, out=vx)
+    np.copyto(players.vx, vx, where=players.alive)
+    np.multiply(players.vx, dt_sec, out=vx)
+    np.add(players.x, vx, out=players.x, where=players.alive)
+
+
+def clamp_to_road(players, road, camera_y, bounce=None):
+    """
+    Keeps every player's hitbox on the road.
+
+    With bounce set, players hitting an edge have their lateral velocity reflected and
+    damped by that factor; without it positions are clamped only.
+    """
+    _, _, x_min, x_max, _, _ = players.update_extents(road, camera_y)
+    if bounce is not None:
+        low = np.less(players.x, x_min, out=players._mask[0])
+        high = np.greater(players.x, x_max, out=players._mask[1])
+        reflected = np.abs(players.vx, out=players._tmp[0])
+        reflected *= bounce
+        np.copyto(players.vx, reflected, where=low)
+        np.negative(reflected, out=reflected)
+        np.copyto(players.vx, reflected, where=high)
+    np.clip(players.x, x_min, np.maximum(x_min, x_max, out=players._tmp[0]), out=players.x)
+
+
+def expand_candidate_pairs(starts, ends):
+    """
+    Expands per-owner candidate ranges [starts[i], ends[i]) into flat pair arrays.
+
+    This is the vectorized inner step of a sort-and-sweep broadphase: once the ranges are
+    found with searchsorted, every candidate pair is materialized without a Python loop.
+
+    Returns:
+        tuple: (owner, candidate) index arrays of equal length.
+    """
+    counts = np.maximum(np.asarray(ends) - starts, 0)
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    owner = np.repeat(np.arange(counts.size), counts)
+    candidate = np.repeat(starts, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+    return owner, candidate
+
+
+def resolve_player_overlaps(players, road, camera_y):
+    """
+    Pushes overlapping players apart and trades half their lateral velocities.
+
+    Candidate pairs come from a sweep over hitboxes sorted by left edge: every box only
+    needs testing against the boxes whose left edge starts before its right edge, found
+    with one searchsorted call, so the work stays proportional to the actual contacts
+    instead of N².
+
+    Returns:
+        int: Number of overlapping pairs resolved.
+    """
+    n = players.count
+    if n < 2:
+        return 0
+    x = players.x
+    y = players.y
+    _, _, _, _, half_x, height = players.update_extents(road, camera_y)
+    # Eliminated players get an empty box that sorts last and never overlaps
+    left = np.subtract(x, half_x, out=players._tmp[1])
+    right = np.add(x, half_x, out=players._tmp[2])
+    gone = np.logical_not(players.alive, out=players._mask[0])
+    np.copyto(left, np.inf, where=gone)
+    np.copyto(right, -np.inf, where=gone)
+
+    order = np.argsort(left, kind="stable")
+    ends = np.searchsorted(left[order], right[order], side="left")
+    if not (ends > players._ranks).any():
+        return 0
+    first, second = expand_candidate_pairs(players._ranks, ends)
+    a = order[first]
+    b = order[second]
+
+    x_overlap = np.minimum(right[a], right[b]) - np.maximum(left[a], left[b])
+    y_overlap = np.minimum(y[a], y[b]) - np.maximum(y[a] - height[a], y[b] - height[b])
+    hit = (x_overlap > 0) & (y_overlap > 0)
+    if not np.any(hit):
+        return 0
+    a, b = a[hit], b[hit]
+    push = x_overlap[hit] * 0.5
+    push = np.where(x[a] <= x[b], push, -push)
+
+    dx = np.zeros(n)
+    np.add.at(dx, a, -push)
+    np.add.at(dx, b, push)
+    vx = players.vx.copy()
+    players.vx[a] = vx[b] * 0.5
+    players.vx[b] = vx[a] * 0.5
+    players.x += dx
+    return int(a.size)
+
+
+def leader_world_y(players):
+    """World y of the front-most alive player (smallest y)."""
+    if not players.alive.any():
+        return players.start_y
+    return float(players.y.min(where=players.alive, initial=np.inf))
+
+
+def offscreen_mask(players, road, camera_y, margin=40):
+    """Alive players that fell behind the bottom of the screen."""
+    behind = np.greater(players.y, camera_y + road.height + margin - road.horizon_y, out=players._mask[0])
+    behind &= players.alive
+    return behind
+
+
+def bot_steering(players, targets, bot_mask, out, deadband=4.0):
+    """Writes steering input (-1/0/+1) that walks each bot towards its target world x into out."""
+    diff = np.subtract(targets, players.x, out=players._tmp[0])
+    np.sign(diff, out=out)
+    np.abs(diff, out=diff)
+    np.copyto(out, 0.0, where=np.less(diff, deadband, out=players._mask[1]))
+    out *= bot_mask
+    return out
+
+
+def project_to_screen(players, road, camera_y, nudge, out):
+    """
+    Screen placement of every player for rendering.
+
+    Args:
+        players (PlayerArrays): Player state.
+        road (RoadGeometry): Road projection.
+        camera_y (float): Current camera world y.
+        nudge (numpy.ndarray): Per-player sideways offset as a fraction of the screen width,
+            so players sharing a spot stay readable.
+        out (tuple): Preallocated (sx, sy, v, scale) arrays; sx and sy are integer arrays.
+
+    Returns:
+        tuple: The out arrays.
+    """
+    sx, sy, v, sc = out
+    tmp = players._tmp[0]
+    offset = players._tmp[1]
+    np.subtract(players.y, camera_y, out=tmp)
+    np.clip(tmp, 0.0, road.depth_span, out=v)
+    v /= road.depth_span
+    road.scale(v, out=sc)
+    tmp += road.horizon_y
+    np.copyto(sy, tmp, casting="unsafe")
+    # int(int(center) + x * v) + int(nudge * v * width), as the per-player code used to do
+    np.multiply(v, -road.road_tilt, out=tmp)
+    tmp += road.width * 0.5 + road.road_tilt
+    np.trunc(tmp, out=tmp)
+    tmp += np.multiply(players.x, v, out=offset)
+    np.copyto(sx, tmp, casting="unsafe")
+    np.multiply(nudge, v, out=offset)
+    offset *= road.width
+    np.trunc(offset, out=offset)
+    np.add(sx, offset, out=sx, casting="unsafe")
+    return out
@@ -0,0 +1,423 @@
+"""
+Deterministic, headless simulation core for Red Light, Green Light.
+
+GameSimulation owns everything that decides the outcome of a match: the traffic light,
+player physics, cars, the camera and eliminations. It draws all of its randomness from a
+seeded NumPy generator and takes everything else as explicit per-tick inputs (frame time,
+steering, per-player ratios), so a recorded InputLog replays the same match frame for
+frame, without pygame and as fast as the CPU allows.
+
+Usage:
+    python game_sim.py replay match.npz
+"""
+import json
+import time
+import zlib
+
+import numpy as np
+
+from game_physics import (
+    RATIO_TO_MULT, MAX_MULT,
+    RoadGeometry, PlayerArrays, apply_light_movement, integrate_lateral, clamp_to_road,
+    resolve_player_overlaps, leader_world_y, offscreen_mask, bot_steering,
+)
+from traffic import TrafficPool
+
+HEADLESS_SIZE = (1280, 720)
+LIGHT_SEQUENCE = ("green", "yellow", "red", "yellow")
+
+# Gameplay tunables. None means "derive from the screen size" the way the game always has.
+DEFAULT_TUNING = {
+    "MOVE_SPEED": None,
+    "LATERAL_ACCEL_FACTOR": 1.4 * 6.0,  # x MOVE_SPEED
+    "LATERAL_MAX_FACTOR": 1.2 * 6.0,  # x MOVE_SPEED
+    "LATERAL_DRAG": 6.0,
+    "WALL_BOUNCE": 0.25,
+    "CAR_MIN_COOLDOWN": 3500,
+    "CAR_MAX_COOLDOWN": 7000,
+    "CAR_ONCOMING_FACTOR": 0.55,  # x MOVE_SPEED
+    "CAR_TRAILING_FACTOR": 0.45,  # x MOVE_SPEED
+    "GREEN_MS": (4000, 8000),  # Extended green: 4-8 seconds
+    "RED_MS": (1500, 3000),
+    "YELLOW_MS": 800,
+    "RATIO_TO_MULT": RATIO_TO_MULT,
+    "MAX_MULT": MAX_MULT,
+}
+
+
+class GameSimulation:
+    """
+    One match of Red Light, Green Light, stepped tick by tick.
+
+    Attributes:
+        seed (int): Seed every random stream of the match derives from.
+        tuning (dict): Effective gameplay tunables (DEFAULT_TUNING plus overrides).
+        road (RoadGeometry): Road projection for the simulated screen size.
+        players (PlayerArrays): Player state; players at bot_mask are steered by the simulation.
+        traffic (TrafficPool): Cars.
+        light_state (str): "green", "yellow" or "red".
+        camera_y (float): Camera world y (follows the leader).
+        road_scroll, scenery_scroll, cloud_off_x, cloud_off_y (float): Animation offsets.
+        elapsed_ms (int): Match time.
+        tick (int): Number of steps taken since the last reset.
+        game_over (bool): True once at most one player is left.
+        winner_id (int): Id of the last player standing, or -1.
+        events (list): (tick, name, value) tuples produced by the last step, e.g.
+            ("light", "red"), ("car_spawn", count), ("collision", player_id),
+            ("eliminated", player_id), ("game_over", winner_id).
+    """
+
+    def __init__(self, num_players=2, seed=0, width=None, height=None, hazard=1.0, tuning=None, num_humans=2):
+        """
+        Args:
+            num_players (int): Number of players in the match.
+            seed (int): Match seed.
+            width (int, optional): Simulated screen width; defaults to HEADLESS_SIZE.
+            height (int, optional): Simulated screen height; defaults to HEADLESS_SIZE.
+            hazard (float): Traffic density multiplier.
+            tuning (dict, optional): Overrides for DEFAULT_TUNING.
+            num_humans (int): Leading players driven by the steer input; the rest are bots.
+        """
+        self.seed = int(seed)
+        self.num_players = int(num_players)
+        self.num_humans = max(0, min(int(num_humans), self.num_players))
+        self.hazard = float(hazard)
+        self.width = int(width or HEADLESS_SIZE[0])
+        self.height = int(height or HEADLESS_SIZE[1])
+        self.tuning = dict(DEFAULT_TUNING)
+        self.tuning.update(tuning or {})
+
+        self.road = RoadGeometry(self.width, self.height)
+        self.camera_anchor_screen_y = int(self.height * 0.62)
+        if self.tuning["MOVE_SPEED"] is None:
+            move_step = max(8, int(self.height * 0.02))
+            self.tuning["MOVE_SPEED"] = max(60, int(move_step * 5))
+        move_speed = self.tuning["MOVE_SPEED"]
+        self.move_speed = move_speed
+        self.lateral_accel = move_speed * self.tuning["LATERAL_ACCEL_FACTOR"]
+        self.lateral_max = move_speed * self.tuning["LATERAL_MAX_FACTOR"]
+
+        self.players = PlayerArrays(self.num_players, self.road.player_size, start_y=0.0)
+        self.bot_mask = np.arange(self.num_players) >= self.num_humans
+        self.bot_targets = np.zeros(self.num_players)
+        self.bot_retarget_ms = np.zeros(self.num_players)
+        self._bot_retarget = np.zeros(self.num_players, dtype=bool)
+        self._bot_picks = np.zeros(self.num_players)
+        self._bot_steer = np.zeros(self.num_players)
+        self.steer = np.zeros(self.num_players)
+
+        self.traffic = TrafficPool(
+            self.road,
+            move_speed * self.tuning["CAR_ONCOMING_FACTOR"],
+            move_speed * self.tuning["CAR_TRAILING_FACTOR"],
+            capacity=max(8, int(16 * self.hazard)),
+            min_cooldown_ms=self.tuning["CAR_MIN_COOLDOWN"],
+            max_cooldown_ms=self.tuning["CAR_MAX_COOLDOWN"],
+            hazard=self.hazard,
+        )
+        self.events = []
+        self.reset()
+
+    def reset(self, seed=None):
+        """
+        Restarts the match.
+
+        Args:
+            seed (int, optional): New match seed; by default the current seed is replayed.
+        """
+        if seed is not None:
+            self.seed = int(seed)
+        # Independent streams, so e.g. more cars never shift the light timings
+        light_seq, traffic_seq, bot_seq = np.random.SeedSequence(self.seed).spawn(3)
+        self.light_rng = np.random.default_rng(light_seq)
+        self.bot_rng = np.random.default_rng(bot_seq)
+        self.traffic.rng = np.random.default_rng(traffic_seq)
+        self.players.reset()
+        self.bot_targets[:] = self.players.home_x
+        self.bot_retarget_ms.fill(0.0)
+        self.traffic.reset()
+        self.camera_y = 0.0
+        self.camera_y_prev = 0.0
+        self.road_scroll = 0.0
+        self.scenery_scroll = 0.0
+        self.cloud_off_x = 0.0
+        self.cloud_off_y = 0.0
+        self.elapsed_ms = 0
+        self.tick = 0
+        self.game_over = False
+        self.winner_id = -1
+        self.state_index = 0
+        self.light_state = LIGHT_SEQUENCE[0]
+        self.light_timer_ms = 0
+        self.light_interval_ms = self.next_interval_for(self.light_state)
+        self.events.clear()
+
+    def next_interval_for(self, state):
+        if state == "yellow":
+            return self.tuning["YELLOW_MS"]
+        low, high = self.tuning["GREEN_MS"] if state == "green" else self.tuning["RED_MS"]
+        return int(self.light_rng.integers(low, high + 1))
+
+    @property
+    def winner_label(self):
+        return f"Player {self.winner_id + 1}" if self.winner_id >= 0 else ""
+
+    def _eliminate(self, mask, cause):
+        for pid in self.players.eliminate(mask).tolist():
+            if cause == "car":
+                self.events.append((self.tick, "collision", pid))
+            self.events.append((self.tick, "eliminated", pid))
+
+    def _update_bots(self, dt_ms):
+        players = self.players
+        self.bot_retarget_ms -= dt_ms
+        retarget = np.less_equal(self.bot_retarget_ms, 0, out=self._bot_retarget)
+        retarget &= self.bot_mask
+        if retarget.any():
+            _, _, wx_min, wx_max, _, _ = players.update_extents(self.road, self.camera_y)
+            self.bot_rng.random(out=self._bot_picks)
+            self.bot_targets[retarget] = (wx_min + (wx_max - wx_min) * self._bot_picks)[retarget]
+            self.bot_retarget_ms[retarget] = self.bot_rng.integers(600, 2401, size=int(retarget.sum()))
+        return bot_steering(players, self.bot_targets, self.bot_mask, out=self._bot_steer)
+
+    def step(self, dt_ms, steer, ratios):
+        """
+        Advances the match by one tick.
+
+        Args:
+            dt_ms (int): Tick length in milliseconds.
+            steer (numpy.ndarray): -1/0/+1 lateral input per player; ignored for bots.
+            ratios (numpy.ndarray): Alpha/beta (or test) ratio per player for this tick.
+
+        Returns:
+            list: The events produced by this tick (also kept in self.events).
+        """
+        self.events.clear()
+        if self.game_over:
+            return self.events
+        tuning = self.tuning
+        players = self.players
+        road = self.road
+        dt_sec = dt_ms / 1000.0
+
+        players.ratio[:] = ratios
+        players.update_multipliers(tuning["RATIO_TO_MULT"], tuning["MAX_MULT"])
+
+        # Forward/back with the traffic light, then lateral steering
+        apply_light_movement(players, self.light_state, self.move_speed, dt_sec)
+        bot_steer = self._update_bots(dt_ms)
+        np.copyto(self.steer, steer)
+        np.copyto(self.steer, bot_steer, where=self.bot_mask)
+        integrate_lateral(players, self.steer, self.lateral_accel, self.lateral_max, tuning["LATERAL_DRAG"], dt_sec)
+
+        # Clamp to road, push overlapping players apart, then hard clamp again
+        clamp_to_road(players, road, self.camera_y, bounce=tuning["WALL_BOUNCE"])
+        resolve_player_overlaps(players, road, self.camera_y)
+        clamp_to_road(players, road, self.camera_y)
+
+        # Camera and animations
+        self.camera_y = leader_world_y(players) - (self.camera_anchor_screen_y - road.horizon_y)
+        cam_dy = self.camera_y - self.camera_y_prev
+        self.road_scroll = (self.road_scroll + (-cam_dy) * 0.004) % 1.0
+        self.scenery_scroll = (self.scenery_scroll + (-cam_dy) * 0.003) % 1.0
+        self.cloud_off_x += (-cam_dy) * 0.01
+        self.cloud_off_y += (-cam_dy) * 0.02
+        self.camera_y_prev = self.camera_y
+
+        # Cars, then players that fell off the bottom of the screen
+        spawned = self.traffic.update(dt_ms, self.camera_y)
+        if spawned:
+            self.events.append((self.tick, "car_spawn", spawned))
+        self._eliminate(self.traffic.collide(players, self.camera_y), "car")
+        self._eliminate(offscreen_mask(players, road, self.camera_y), "offscreen")
+
+        # Last player standing wins
+        if players.alive_count() <= 1:
+            self.game_over = True
+            self.winner_id = int(np.flatnonzero(players.alive)[0])
+            self.events.append((self.tick, "game_over", self.winner_id))
+        else:
+            self.elapsed_ms += dt_ms
+            self.light_timer_ms += dt_ms
+            if self.light_timer_ms >= self.light_interval_ms:
+                self.state_index = (self.state_index + 1) % len(LIGHT_SEQUENCE)
+                self.light_state = LIGHT_SEQUENCE[self.state_index]
+                self.light_timer_ms = 0
+                self.light_interval_ms = self.next_interval_for(self.light_state)
+                self.events.append((self.tick, "light", self.light_state))
+        self.tick += 1
+        return self.events
+
+    def digest(self):
+        """CRC32 of the outcome-relevant state, for frame-by-frame replay verification."""
+        crc = 0
+        for arr in (self.players.x, self.players.y, self.players.vx, self.players.alive,
+                    self.traffic.active, self.traffic.y):
+            crc = zlib.crc32(arr, crc)
+        return zlib.crc32(np.float64(self.camera_y).tobytes() + bytes((self.state_index,)), crc)
+
+
+class TestRatioSource:
+    """
+    Stand-in ratios for players without an EEG headset: a fresh uniform draw for every
+    player every interval_ms, from a seeded generator.
+
+    Attributes:
+        ratios (numpy.ndarray): Current ratio per player.
+    """
+
+    def __init__(self, count, interval_ms=1500, low=0.1, high=3.0, seed=None):
+        self.interval_ms = interval_ms
+        self.low = low
+        self.high = high
+        self.rng = np.random.default_rng(seed)
+        self.ratios = np.empty(count)
+        self.timer_ms = 0
+        self.reset()
+
+    def reset(self):
+        self.ratios[:] = self.rng.uniform(self.low, self.high, size=self.ratios.size)
+        self.timer_ms = 0
+
+    def update(self, dt_ms):
+        """Returns True when new ratios were drawn this tick."""
+        self.timer_ms += dt_ms
+        if self.timer_ms < self.interval_ms:
+            return False
+        self.ratios[:] = self.rng.uniform(self.low, self.high, size=self.ratios.size)
+        self.timer_ms = 0
+        return True
+
+
+class InputLog:
+    """
+    Ordered per-tick inputs of one match: frame time, steering and ratios for every player,
+    plus the simulation digest after each tick so a replay can pinpoint the first tick at
+    which it diverges.
+
+    Storage grows by doubling, so appending a tick does not allocate in steady state.
+    """
+
+    def __init__(self, seed, num_players, width, height, hazard=1.0, tuning=None, num_humans=2, capacity=4096):
+        self.meta = {
+            "seed": int(seed),
+            "num_players": int(num_players),
+            "num_humans": int(num_humans),
+            "width": int(width),
+            "height": int(height),
+            "hazard": float(hazard),
+            "tuning": dict(tuning or {}),
+        }
+        self.length = 0
+        self.dt_ms = np.zeros(capacity, dtype=np.uint16)
+        self.steer = np.zeros((capacity, num_players), dtype=np.int8)
+        self.ratios = np.zeros((capacity, num_players))
+        self.digests = np.zeros(capacity, dtype=np.uint32)
+
+    @classmethod
+    def for_simulation(cls, sim):
+        tuning = {k: v for k, v in sim.tuning.items() if DEFAULT_TUNING.get(k) != v}
+        return cls(sim.seed, sim.num_players, sim.width, sim.height, sim.hazard, tuning, sim.num_humans)
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self):
+        cap = self.dt_ms.shape[0] * 2
+        for name in ("dt_ms", "steer", "ratios", "digests"):
+            old = getattr(self, name)
+            new = np.zeros((cap,) + old.shape[1:], dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            setattr(self, name, new)
+
+    def append(self, dt_ms, steer, ratios, digest=0):
+        if self.length == self.dt_ms.shape[0]:
+            self._grow()
+        i = self.length
+        self.dt_ms[i] = dt_ms
+        self.steer[i] = steer
+        self.ratios[i] = ratios
+        self.digests[i] = digest
+        self.length += 1
+
+    def new_simulation(self):
+        """A fresh GameSimulation configured exactly like the recorded one."""
+        m = self.meta
+        return GameSimulation(m["num_players"], seed=m["seed"], width=m["width"], height=m["height"],
+                              hazard=m["hazard"], tuning=m["tuning"], num_humans=m["num_humans"])
+
+    def save(self, path):
+        n = self.length
+        np.savez_compressed(path, meta=json.dumps(self.meta), dt_ms=self.dt_ms[:n], steer=self.steer[:n],
+                            ratios=self.ratios[:n], digests=self.digests[:n])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            tuning = {k: tuple(v) if isinstance(v, list) else v for k, v in meta["tuning"].items()}
+            log = cls(meta["seed"], meta["num_players"], meta["width"], meta["height"], meta["hazard"],
+                      tuning, meta["num_humans"], capacity=max(1, data["dt_ms"].shape[0]))
+            n = data["dt_ms"].shape[0]
+            log.dt_ms[:n] = data["dt_ms"]
+            log.steer[:n] = data["steer"]
+            log.ratios[:n] = data["ratios"]
+            log.digests[:n] = data["digests"]
+            log.length = n
+        return log
+
+
+def replay(log, verify=True):
+    """
+    Re-simulates a recorded match headless, as fast as possible.
+
+    Args:
+        log (InputLog): Recorded inputs.
+        verify (bool): Compare the digest after every tick with the recorded one.
+
+    Returns:
+        dict: ticks, sim_ms, wall_s, speedup, first_divergence (tick or -1), winner_id and
+        the final GameSimulation under "sim".
+    """
+    sim = log.new_simulation()
+    first_divergence = -1
+    t0 = time.perf_counter()
+    for i in range(log.length):
+        sim.step(int(log.dt_ms[i]), log.steer[i], log.ratios[i])
+        if verify and first_divergence < 0 and sim.digest() != log.digests[i]:
+            first_divergence = i
+    wall_s = time.perf_counter() - t0
+    sim_ms = int(log.dt_ms[:log.length].sum())
+    return {
+        "ticks": log.length,
+        "sim_ms": sim_ms,
+        "wall_s": wall_s,
+        "speedup": (sim_ms / 1000.0) / wall_s if wall_s > 0 else float("inf"),
+        "first_divergence": first_divergence,
+        "winner_id": sim.winner_id,
+        "sim": sim,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless replay of recorded Red Light Green Light matches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_replay = sub.add_parser("replay", help="Re-simulate a recorded input log and verify it frame by frame")
+    p_replay.add_argument("log", type=str, help="Input log (.npz) written by redlight_greenlight.py --record")
+    p_replay.add_argument("--no-verify", action="store_true", help="Skip per-tick digest comparison")
+    args = parser.parse_args()
+
+    result = replay(InputLog.load(args.log), verify=not args.no_verify)
+    print(f"Replayed {result['ticks']} ticks ({result['sim_ms'] / 1000.0:.1f} s of play) in {result['wall_s']:.2f} s "
+          f"-> {result['speedup']:.0f}x real time")
+    if result["winner_id"] >= 0:
+        print(f"Winner: Player {result['winner_id'] + 1}")
+    if args.no_verify:
+        pass
+    elif result["first_divergence"] < 0:
+        print("Replay matches the recording frame for frame.")
+    else:
+        print(f"Replay DIVERGES from the recording at tick {result['first_divergence']}.")
+        raise SystemExit(1)
@@ -0,0 +1,946 @@
+"""
+Networked matches: an authoritative UDP game server, player clients and spectators.
+
+GameServer owns the GameSimulation and steps it at a fixed tick. Player clients send their
+key state and EEG ratio every frame; spectators only acknowledge what they have received.
+At a fixed snapshot rate the server quantizes the replicated state into one int32 vector
+(SnapshotCodec) and sends each client the difference to the last snapshot that client
+acknowledged: a bitmask of the changed fields plus their deltas in the narrowest integer
+type that holds them, zlib-compressed. A client that has not acknowledged anything (or
+whose baseline is too old) gets a full snapshot.
+
+GameClient rebuilds the quantized vectors, keeps a short buffer of them and renders a
+few snapshot intervals in the past, interpolating positions between the two snapshots
+around that time, so motion stays smooth at a snapshot rate well below the frame rate.
+
+    python net_game.py serve --players 4 --humans 2
+    python redlight_greenlight.py --connect 127.0.0.1:47470            # a player
+    python redlight_greenlight.py --connect 127.0.0.1:47470 --spectate
+    python net_game.py selftest --clients 2 --spectators 2 --loss 0.05
+
+Packets (little endian):
+    HELLO    'H' version u8, role u8 (0 player, 1 spectator), nonce u32
+    WELCOME  'W' nonce u32, client id u16, slot i8 (-1 spectator), config JSON
+    REJECT   'R' nonce u32, reason (utf-8)
+    INPUT    'I' client id u16, input seq u32, keys u8 (1 left, 2 right), ratio f32 (NaN: no EEG), ack tick i32
+    RESTART  'X' client id u16
+    BYE      'B' client id u16
+    SNAPSHOT 'S' tick u32, baseline tick u32 (FULL_SNAPSHOT: none), zlib payload
+"""
+import json
+import select
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+from game_physics import PlayerArrays, RoadGeometry
+from game_sim import LIGHT_SEQUENCE, GameSimulation, TestRatioSource
+from traffic import TrafficPool
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 47470
+FULL_SNAPSHOT = 0xFFFFFFFF
+MAX_DATAGRAM = 65507
+KEY_LEFT, KEY_RIGHT = 1, 2
+PLAYER, SPECTATOR = 0, 1
+
+_HELLO = struct.Struct("<cBBI")
+_WELCOME = struct.Struct("<cIHb")
+_REJECT = struct.Struct("<cI")
+_INPUT = struct.Struct("<cHIBfi")
+_CLIENT = struct.Struct("<cH")
+_SNAPSHOT = struct.Struct("<cII")
+
+# Quantization steps: world positions to 1/8 unit (sub-pixel), ratios and lane sides to
+# 1/1000, scroll phases to 1/65536
+POS_SCALE = 8.0
+RATIO_SCALE = 1000.0
+PHASE_SCALE = 65536.0
+# Delta value dtypes, narrowest first; the payload names the one it uses
+_DELTA_DTYPES = (np.dtype("<i1"), np.dtype("<i2"), np.dtype("<i4"))
+
+
+class SnapshotCodec:
+    """
+    Layout, quantization and delta coding of the replicated match state.
+
+    Every field is an int32 slot (or a run of slots for per-player and per-car arrays),
+    so a snapshot is one vector and a delta is one vector subtraction.
+
+    Attributes:
+        fields (dict): Field name -> slice into the vector.
+        size (int): Vector length.
+        scale (numpy.ndarray): Quantization step of each slot (1 for discrete fields).
+    """
+
+    def __init__(self, num_players, capacity):
+        n, c = int(num_players), int(capacity)
+        layout = (
+            # name, length, scale, interpolated
+            ("match", 1, 1.0, False), ("light", 1, 1.0, False), ("game_over", 1, 1.0, False),
+            ("winner", 1, 1.0, False), ("elapsed_ms", 1, 1.0, True), ("camera_y", 1, POS_SCALE, True),
+            ("road_scroll", 1, PHASE_SCALE, True), ("scenery_scroll", 1, PHASE_SCALE, True),
+            ("cloud_x", 1, POS_SCALE, True), ("cloud_y", 1, POS_SCALE, True),
+            ("px", n, POS_SCALE, True), ("py", n, POS_SCALE, True), ("ratio", n, RATIO_SCALE, False),
+            ("mult", n, RATIO_SCALE, True), ("alive", n, 1.0, False),
+            ("active", c, 1.0, False), ("lane", c, 1.0, False), ("side", c, RATIO_SCALE, False),
+            ("cy", c, POS_SCALE, True),
+        )
+        self.num_players = n
+        self.capacity = c
+        self.fields = {}
+        scale, lerp = [], []
+        for name, length, step, interpolated in layout:
+            self.fields[name] = slice(len(scale), len(scale) + length)
+            scale += [step] * length
+            lerp += [interpolated] * length
+        self.size = len(scale)
+        self.scale = np.array(scale)
+        self.discrete = ~np.array(lerp)
+        self.phases = np.zeros(self.size, dtype=bool)
+        self.phases[self.fields["road_scroll"]] = True
+        self.phases[self.fields["scenery_scroll"]] = True
+        self._mask_bytes = (self.size + 7) // 8
+
+    def quantize(self, sim, match, out=None):
+        """
+        Quantized state of sim.
+
+        Args:
+            sim (GameSimulation): Match to capture.
+            match (int): Match counter; interpolation never blends across a restart.
+            out (numpy.ndarray, optional): int32 vector to fill.
+
+        Returns:
+            numpy.ndarray: The int32 snapshot vector.
+        """
+        out = np.empty(self.size, dtype=np.int32) if out is None else out
+        f = self.fields
+        players, traffic = sim.players, sim.traffic
+        values = (
+            ("match", match), ("light", sim.state_index), ("game_over", sim.game_over), ("winner", sim.winner_id),
+            ("elapsed_ms", sim.elapsed_ms), ("camera_y", sim.camera_y), ("road_scroll", sim.road_scroll),
+            ("scenery_scroll", sim.scenery_scroll), ("cloud_x", sim.cloud_off_x), ("cloud_y", sim.cloud_off_y),
+            ("px", players.x), ("py", players.y), ("ratio", players.ratio), ("mult", players.mult),
+            ("alive", players.alive), ("active", traffic.active), ("lane", traffic.lane), ("side", traffic.side),
+            ("cy", traffic.y),
+        )
+        for name, value in values:
+            sl = f[name]
+            out[sl] = np.rint(np.multiply(value, self.scale[sl.start]))
+        return out
+
+    def dequantize(self, q, out=None):
+        """Float state vector (world units, ratios, phases) of a quantized snapshot."""
+        return np.divide(q, self.scale, out=out)
+
+    def encode(self, q, base=None):
+        """
+        Snapshot payload: q in full, or its difference to base.
+
+        Returns:
+            bytes: zlib-compressed payload for decode().
+        """
+        if base is None:
+            body = b"\x00" + q.astype("<i4", copy=False).tobytes()
+        else:
+            diff = q - base
+            changed = diff != 0
+            values = diff[changed]
+            peak = int(np.abs(values).max()) if values.size else 0
+            code = 0 if peak < 0x80 else 1 if peak < 0x8000 else 2
+            body = (bytes((1, code)) + np.packbits(changed).tobytes()
+                    + values.astype(_DELTA_DTYPES[code]).tobytes())
+        return zlib.compress(body, 1)
+
+    def decode(self, payload, base=None):
+        """
+        Inverse of encode().
+
+        Args:
+            payload (bytes): Compressed payload.
+            base (numpy.ndarray, optional): The baseline snapshot of a delta payload.
+
+        Returns:
+            numpy.ndarray: The int32 snapshot vector.
+
+        Raises:
+            ValueError: Malformed payload, or a delta without its baseline.
+        """
+        try:
+            body = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt snapshot: {e}") from None
+        if body[:1] == b"\x00":
+            q = np.frombuffer(body, dtype="<i4", offset=1)
+            if q.size != self.size:
+                raise ValueError(f"Full snapshot has {q.size} fields, expected {self.size}")
+            return q.astype(np.int32)
+        if base is None:
+            raise ValueError("Delta snapshot without its baseline")
+        code = body[1]
+        mask_end = 2 + self._mask_bytes
+        changed = np.unpackbits(np.frombuffer(body, dtype=np.uint8, count=self._mask_bytes, offset=2),
+                                count=self.size).astype(bool)
+        values = np.frombuffer(body, dtype=_DELTA_DTYPES[code], offset=mask_end)
+        if values.size != int(changed.sum()):
+            raise ValueError("Delta snapshot field count does not match its mask")
+        q = base.copy()
+        q[changed] += values
+        return q
+
+    def interpolate(self, a, b, alpha, out):
+        """
+        State between two dequantized snapshots.
+
+        Positions, the camera, clouds and speed bars are blended; scroll phases take the
+        short way around the wrap; discrete fields, and cars that changed slot between the
+        two snapshots, come from a. Across a match restart the newer snapshot is used as is.
+
+        Returns:
+            numpy.ndarray: out.
+        """
+        f = self.fields
+        if a[f["match"]][0] != b[f["match"]][0]:
+            np.copyto(out, b)
+            return out
+        np.subtract(b, a, out=out)
+        phases = out[self.phases]
+        out[self.phases] = (phases + 0.5) % 1.0 - 0.5
+        out *= alpha
+        out += a
+        out[self.phases] %= 1.0
+        np.copyto(out, a, where=self.discrete)
+        cars = f["cy"]
+        moved = (a[f["active"]] < 0.5) | (b[f["active"]] < 0.5) | (a[f["lane"]] != b[f["lane"]])
+        out[cars] = np.where(moved, a[cars], out[cars])
+        return out
+
+
+class MatchView:
+    """
+    Client-side replica of a GameSimulation, filled from snapshots.
+
+    It has the attributes the game's draw code reads (road, players, traffic, camera_y,
+    light_state, scroll and cloud offsets, elapsed_ms, game_over, winner_label), so
+    redlight_greenlight.draw_world() renders it like a local match. Nothing here steps.
+
+    events holds what GameSimulation.step() would have reported since the previous update
+    ("light", "collision", "eliminated", "game_over"), derived from the state change so
+    snapshots do not carry them. A player that vanished while on screen counts as a
+    collision; one that fell behind the screen is only eliminated.
+    """
+
+    def __init__(self, config):
+        self.config = dict(config)
+        self.seed = int(config["seed"])
+        self.num_players = int(config["num_players"])
+        self.width = int(config["width"])
+        self.height = int(config["height"])
+        self.road = RoadGeometry(self.width, self.height)
+        self.players = PlayerArrays(self.num_players, self.road.player_size, start_y=0.0)
+        self.traffic = TrafficPool(self.road, 0.0, 0.0, capacity=int(config["capacity"]))
+        self.events = []
+        self.tick = -1  # server tick of the discrete fields shown; -1 before the first snapshot
+        self._was_alive = np.zeros(self.num_players, dtype=bool)
+        self.match = 0
+        self.camera_y = 0.0
+        self.road_scroll = 0.0
+        self.scenery_scroll = 0.0
+        self.cloud_off_x = 0.0
+        self.cloud_off_y = 0.0
+        self.elapsed_ms = 0
+        self.state_index = 0
+        self.light_state = LIGHT_SEQUENCE[0]
+        self.game_over = False
+        self.winner_id = -1
+
+    @property
+    def winner_label(self):
+        return f"Player {self.winner_id + 1}" if self.winner_id >= 0 else ""
+
+    def apply(self, codec, state, tick=None):
+        """
+        Loads a dequantized (possibly interpolated) state vector.
+
+        Args:
+            codec (SnapshotCodec): Layout of state.
+            state (numpy.ndarray): Dequantized state vector.
+            tick (int, optional): Server tick its discrete fields come from. When it is newer
+                than the last one, events is refilled with the changes since then; a match
+                restart, an older tick or no tick leaves events empty.
+        """
+        f = codec.fields
+        self.events.clear()
+        match = int(state[f["match"]][0])
+        newer = tick is not None and tick > self.tick
+        detect = newer and self.tick >= 0 and match == self.match
+        if detect:
+            np.copyto(self._was_alive, self.players.alive)
+            light_before, over_before = self.state_index, self.game_over
+        if newer:
+            self.tick = tick
+        self.match = match
+        self.state_index = int(state[f["light"]][0])
+        self.light_state = LIGHT_SEQUENCE[self.state_index]
+        self.game_over = bool(state[f["game_over"]][0])
+        self.winner_id = int(state[f["winner"]][0])
+        self.elapsed_ms = int(state[f["elapsed_ms"]][0])
+        self.camera_y = float(state[f["camera_y"]][0])
+        self.road_scroll = float(state[f["road_scroll"]][0])
+        self.scenery_scroll = float(state[f["scenery_scroll"]][0])
+        self.cloud_off_x = float(state[f["cloud_x"]][0])
+        self.cloud_off_y = float(state[f["cloud_y"]][0])
+        players, traffic = self.players, self.traffic
+        players.x[:] = state[f["px"]]
+        players.y[:] = state[f["py"]]
+        players.ratio[:] = state[f["ratio"]]
+        players.mult[:] = state[f["mult"]]
+        np.greater(state[f["alive"]], 0.5, out=players.alive)
+        np.greater(state[f["active"]], 0.5, out=traffic.active)
+        traffic.lane[:] = state[f["lane"]]
+        traffic.side[:] = state[f["side"]]
+        traffic.y[:] = state[f["cy"]]
+        traffic.refresh(self.camera_y)
+        if detect:
+            self._derive_events(light_before, over_before)
+
+    def _derive_events(self, light_before, over_before):
+        players, road = self.players, self.road
+        lost = self._was_alive & ~players.alive
+        if lost.any():
+            # game_physics.offscreen_mask() with its default margin
+            behind = players.y > self.camera_y + road.height + 40 - road.horizon_y
+            for pid in np.flatnonzero(lost).tolist():
+                if not behind[pid]:
+                    self.events.append((self.tick, "collision", pid))
+                self.events.append((self.tick, "eliminated", pid))
+        if self.game_over and not over_before:
+            self.events.append((self.tick, "game_over", self.winner_id))
+        elif self.state_index != light_before:
+            self.events.append((self.tick, "light", self.light_state))
+
+
+class _Peer:
+    """Server-side record of one connected client."""
+
+    def __init__(self, client_id, address, nonce, slot, now):
+        self.client_id = client_id
+        self.address = address
+        self.nonce = nonce
+        self.slot = slot  # player index, or -1 for spectators
+        self.last_seen = now
+        self.ack = -1
+        self.input_seq = 0
+        self.keys = 0
+        self.ratio = float("nan")
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.full_snapshots = 0
+        self.delta_snapshots = 0
+        self.mark = (now, 0, 0)  # (time, bytes_sent, bytes_received) at the last report
+
+    @property
+    def role(self):
+        return "spectator" if self.slot < 0 else f"P{self.slot + 1}"
+
+
+class GameServer:
+    """
+    Authoritative match server.
+
+    Players 0..num_humans-1 are steered by connected player clients (standing still on
+    test ratios while their slot is free); the rest are the simulation's bots. A client
+    that sends no EEG ratio plays on the same test ratios as the local game's P2.
+
+    Attributes:
+        sim (GameSimulation): The match.
+        codec (SnapshotCodec): Snapshot layout.
+        tick (int): Server ticks since start; snapshots are numbered by it and it keeps
+            counting across match restarts.
+        match (int): Matches played (restarts).
+        peers (dict): Client id -> _Peer.
+        tick_ms (numpy.ndarray): Ring of recent tick processing times.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, num_players=2, num_humans=2, seed=None, hazard=1.0,
+                 width=None, height=None, tick_hz=60.0, snapshot_hz=30.0, timeout_s=5.0, history=64):
+        """
+        Args:
+            host (str): Interface to listen on ("0.0.0.0" for the LAN).
+            port (int): UDP port (0 picks a free one; see address).
+            num_players (int): Players in the match.
+            num_humans (int): Leading player slots available to player clients.
+            seed (int, optional): First match seed (random by default); restarts use seed+1, ...
+            hazard (float): Traffic density.
+            width, height (int, optional): Simulated screen size (HEADLESS_SIZE by default);
+                clients render at this logical resolution.
+            tick_hz (float): Simulation rate.
+            snapshot_hz (float): Snapshot rate (a divisor of tick_hz works best).
+            timeout_s (float): Clients silent this long are dropped.
+            history (int): Snapshots kept as delta baselines.
+        """
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed = int(seed)
+        self.sim = GameSimulation(num_players, seed=self.seed, width=width, height=height, hazard=hazard,
+                                  num_humans=num_humans)
+        self.codec = SnapshotCodec(self.sim.num_players, self.sim.traffic.capacity)
+        self.tick_hz = float(tick_hz)
+        self.snapshot_every = max(1, int(round(tick_hz / snapshot_hz)))
+        self.timeout_s = timeout_s
+        self.config = {
+            "seed": self.sim.seed, "num_players": self.sim.num_players, "num_humans": self.sim.num_humans,
+            "width": self.sim.width, "height": self.sim.height, "hazard": self.sim.hazard,
+            "capacity": self.sim.traffic.capacity, "tick_hz": self.tick_hz,
+            "snapshot_hz": self.tick_hz / self.snapshot_every,
+        }
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.peers = {}
+        self.by_address = {}
+        self.next_client_id = 1
+
+        self.steer = np.zeros(self.sim.num_players, dtype=np.int8)
+        self.ratios = np.ones(self.sim.num_players)
+        self.test_ratios = TestRatioSource(self.sim.num_players, interval_ms=1500, seed=[self.sim.seed, 1])
+        self.history = {}  # tick -> quantized snapshot
+        self.history_ticks = deque(maxlen=history)
+        self.tick = 0
+        self.match = 0
+        self.restart_requested = False
+        self._ms_accum = 0.0
+        self.tick_ms = np.zeros(600)
+        self.ticks_timed = 0
+        self.send_errors = 0
+        self.bad_packets = 0
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def _send(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+            return len(data)
+        except (BlockingIOError, OSError):
+            self.send_errors += 1
+            return 0
+
+    def poll(self, now=None):
+        """Handles every pending datagram."""
+        now = time.perf_counter() if now is None else now
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue  # Windows reports an ICMP port unreachable from an earlier send here
+            try:
+                self._handle(data, address, now)
+            except (struct.error, ValueError, IndexError):
+                self.bad_packets += 1
+
+    def _handle(self, data, address, now):
+        kind = data[:1]
+        if kind == b"H":
+            _, version, role, nonce = _HELLO.unpack_from(data)
+            peer = self.by_address.get(address)
+            if peer is not None and peer.nonce != nonce:
+                self._drop(peer)  # same port, new client process
+                peer = None
+            if peer is None:
+                if version != PROTOCOL_VERSION:
+                    self._send(_REJECT.pack(b"R", nonce) + b"protocol version mismatch", address)
+                    return
+                slot = -1
+                if role == PLAYER:
+                    taken = {p.slot for p in self.peers.values()}
+                    free = [s for s in range(self.sim.num_humans) if s not in taken]
+                    if not free:
+                        self._send(_REJECT.pack(b"R", nonce) + b"all player slots are taken (join with --spectate)",
+                                   address)
+                        return
+                    slot = free[0]
+                peer = _Peer(self.next_client_id, address, nonce, slot, now)
+                self.next_client_id += 1
+                self.peers[peer.client_id] = peer
+                self.by_address[address] = peer
+                print(f"Client {peer.client_id} joined from {address[0]}:{address[1]} as {peer.role}", flush=True)
+            peer.last_seen = now
+            peer.bytes_received += len(data)
+            # Re-sent for a repeated HELLO too: the first WELCOME may have been lost
+            self._send(_WELCOME.pack(b"W", nonce, peer.client_id, peer.slot) + json.dumps(self.config).encode(),
+                       address)
+            return
+        _, client_id = _CLIENT.unpack_from(data)
+        peer = self.peers.get(client_id)
+        if peer is None or peer.address != address:
+            return
+        peer.last_seen = now
+        peer.bytes_received += len(data)
+        if kind == b"I":
+            _, _, seq, keys, ratio, ack = _INPUT.unpack_from(data)
+            if ack > peer.ack:
+                peer.ack = ack
+            if seq > peer.input_seq:  # ignore inputs that arrive out of order
+                peer.input_seq = seq
+                peer.keys = keys
+                peer.ratio = ratio
+        elif kind == b"X":
+            if peer.slot >= 0:
+                self.restart_requested = True
+        elif kind == b"B":
+            self._drop(peer)
+
+    def _drop(self, peer):
+        self.peers.pop(peer.client_id, None)
+        self.by_address.pop(peer.address, None)
+        print(f"Client {peer.client_id} ({peer.role}) left", flush=True)
+
+    def step(self, now=None):
+        """
+        One server tick: applies the latest inputs, steps the match and, on snapshot ticks,
+        sends every client its snapshot.
+        """
+        t0 = time.perf_counter()
+        now = t0 if now is None else now
+        sim = self.sim
+        for peer in [p for p in self.peers.values() if now - p.last_seen > self.timeout_s]:
+            self._drop(peer)
+        if self.restart_requested:
+            self.restart_requested = False
+            if sim.game_over:
+                self.match += 1
+                sim.reset(seed=self.seed + self.match)
+                self.test_ratios.reset()
+
+        self._ms_accum += 1000.0 / self.tick_hz
+        dt_ms = int(self._ms_accum)
+        self._ms_accum -= dt_ms
+        self.test_ratios.update(dt_ms)
+        self.ratios[:] = self.test_ratios.ratios
+        self.steer.fill(0)
+        for peer in self.peers.values():
+            if peer.slot < 0:
+                continue
+            self.steer[peer.slot] = bool(peer.keys & KEY_RIGHT) - bool(peer.keys & KEY_LEFT)
+            if peer.ratio == peer.ratio:  # NaN: this player has no headset
+                self.ratios[peer.slot] = peer.ratio
+        sim.step(dt_ms, self.steer, self.ratios)
+
+        if self.tick % self.snapshot_every == 0:
+            self._send_snapshots()
+        self.tick += 1
+        self.tick_ms[self.ticks_timed % self.tick_ms.size] = (time.perf_counter() - t0) * 1000.0
+        self.ticks_timed += 1
+
+    def _send_snapshots(self):
+        q = self.codec.quantize(self.sim, self.match)
+        if len(self.history_ticks) == self.history_ticks.maxlen:
+            self.history.pop(self.history_ticks[0], None)
+        self.history_ticks.append(self.tick)
+        self.history[self.tick] = q
+        payloads = {}  # baseline tick -> packet; clients on the same baseline share one encoding
+        for peer in self.peers.values():
+            base = peer.ack if peer.ack in self.history else FULL_SNAPSHOT
+            packet = payloads.get(base)
+            if packet is None:
+                payload = self.codec.encode(q, None if base == FULL_SNAPSHOT else self.history[base])
+                packet = payloads[base] = _SNAPSHOT.pack(b"S", self.tick, base) + payload
+            peer.bytes_sent += self._send(packet, peer.address)
+            if base == FULL_SNAPSHOT:
+                peer.full_snapshots += 1
+            else:
+                peer.delta_snapshots += 1
+
+    def run(self, duration_s=None, report_s=5.0, stop=None):
+        """
+        Runs the fixed-rate tick loop, handling packets while it waits for the next tick.
+
+        Args:
+            duration_s (float, optional): Stop after this long.
+            report_s (float): Print report() this often (0 disables).
+            stop (threading.Event, optional): Stop when set.
+        """
+        period = 1.0 / self.tick_hz
+        start = next_tick = next_report = time.perf_counter()
+        next_report += report_s
+        while not (stop is not None and stop.is_set()):
+            now = time.perf_counter()
+            if duration_s is not None and now - start >= duration_s:
+                break
+            if now < next_tick:
+                select.select([self.sock], [], [], next_tick - now)
+                self.poll()
+                continue
+            self.poll(now)
+            self.step(now)
+            next_tick += period
+            if now - next_tick > 0.25:
+                next_tick = now  # fell far behind (machine asleep, debugger): don't try to catch up
+            if report_s and now >= next_report:
+                next_report = now + report_s
+                print(self.report(now), flush=True)
+
+    def metrics(self, now=None):
+        """
+        Tick timing and per-client traffic since the previous call.
+
+        Returns:
+            dict: tick_ms_mean, tick_ms_p99, tick_ms_max, ticks, and "clients": a list of
+            dicts with id, role, address, kbps_out, kbps_in, full and delta snapshot counts.
+        """
+        now = time.perf_counter() if now is None else now
+        ticks = self.tick_ms[:min(self.ticks_timed, self.tick_ms.size)]
+        out = {
+            "ticks": self.tick,
+            "tick_ms_mean": float(ticks.mean()) if ticks.size else 0.0,
+            "tick_ms_p99": float(np.percentile(ticks, 99)) if ticks.size else 0.0,
+            "tick_ms_max": float(ticks.max()) if ticks.size else 0.0,
+            "clients": [],
+        }
+        for peer in self.peers.values():
+            t_mark, sent_mark, received_mark = peer.mark
+            elapsed = max(now - t_mark, 1e-6)
+            out["clients"].append({
+                "id": peer.client_id, "role": peer.role, "address": f"{peer.address[0]}:{peer.address[1]}",
+                "kbps_out": (peer.bytes_sent - sent_mark) * 8 / 1000.0 / elapsed,
+                "kbps_in": (peer.bytes_received - received_mark) * 8 / 1000.0 / elapsed,
+                "full": peer.full_snapshots, "delta": peer.delta_snapshots,
+            })
+            peer.mark = (now, peer.bytes_sent, peer.bytes_received)
+        return out
+
+    def report(self, now=None):
+        m = self.metrics(now)
+        lines = [f"Server tick {m['ticks']} | tick {m['tick_ms_mean']:.2f} ms avg, {m['tick_ms_p99']:.2f} p99, "
+                 f"{m['tick_ms_max']:.2f} max (budget {1000.0 / self.tick_hz:.1f}) | {len(m['clients'])} clients"]
+        for c in m["clients"]:
+            lines.append(f"  client {c['id']:<3} {c['role']:<9} {c['address']:<21} out {c['kbps_out']:7.1f} kbit/s  "
+                         f"in {c['kbps_in']:6.1f} kbit/s  snapshots {c['delta']} delta / {c['full']} full")
+        return "\n".join(lines)
+
+    def close(self):
+        self.sock.close()
+
+
+class GameClient:
+    """
+    Player or spectator connection to a GameServer.
+
+    Attributes:
+        view (MatchView): Interpolated match state (after connect()).
+        slot (int): Player index this client steers, or -1 for a spectator.
+        config (dict): Match configuration sent by the server.
+        snapshots (int): Snapshots decoded.
+        underruns (int): update_view() calls that found no snapshot newer than the render
+            time (the client held the newest state instead of interpolating).
+    """
+
+    def __init__(self, address, spectate=False, interp_snapshots=2.0, drop_rate=0.0, seed=None, history=64):
+        """
+        Args:
+            address (tuple): (host, port) of the server.
+            spectate (bool): Join read-only.
+            interp_snapshots (float): Render this many snapshot intervals behind the newest
+                snapshot; more hides more jitter and loss at the cost of latency.
+            drop_rate (float): Share of incoming snapshots to discard, to test loss on localhost.
+            seed (int, optional): Seed of the simulated loss.
+            history (int): Decoded snapshots kept as delta baselines.
+        """
+        self.address = (socket.gethostbyname(address[0]), int(address[1]))
+        self.spectate = spectate
+        self.interp_snapshots = interp_snapshots
+        self.drop_rate = drop_rate
+        self.rng = np.random.default_rng(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(self.address)
+        self.sock.setblocking(False)
+        self.nonce = int(self.rng.integers(1, 2 ** 32))
+        self.client_id = None
+        self.slot = -1
+        self.config = None
+        self.codec = None
+        self.view = None
+        self.history = {}  # tick -> quantized snapshot (delta baselines)
+        self.history_ticks = deque(maxlen=history)
+        self.frames = deque(maxlen=16)  # (tick, dequantized state), oldest first
+        self.ack = -1
+        self.input_seq = 0
+        self.clock_base = None
+        self.tick_hz = None
+        self.delay_ticks = 0.0
+        self._state = None
+        self.snapshots = 0
+        self.dropped = 0
+        self.decode_errors = 0
+        self.underruns = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def _send(self, data):
+        try:
+            self.sock.send(data)
+            self.bytes_sent += len(data)
+        except (BlockingIOError, OSError):
+            pass
+
+    def connect(self, timeout_s=5.0):
+        """
+        Joins the server, resending HELLO until it answers.
+
+        Returns:
+            GameClient: self.
+
+        Raises:
+            ConnectionError: The server rejected the client or did not answer in time.
+        """
+        role = SPECTATOR if self.spectate else PLAYER
+        hello = _HELLO.pack(b"H", PROTOCOL_VERSION, role, self.nonce)
+        deadline = time.perf_counter() + timeout_s
+        while time.perf_counter() < deadline:
+            self._send(hello)
+            ready, _, _ = select.select([self.sock], [], [], 0.25)
+            if not ready:
+                continue
+            try:
+                data = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, ConnectionRefusedError):
+                continue
+            kind = data[:1]
+            if kind == b"R" and _REJECT.unpack_from(data)[1] == self.nonce:
+                raise ConnectionError(f"Server refused to join: {data[_REJECT.size:].decode(errors='replace')}")
+            if kind == b"W":
+                _, nonce, client_id, slot = _WELCOME.unpack_from(data)
+                if nonce != self.nonce:
+                    continue
+                self.client_id, self.slot = client_id, slot
+                self.config = json.loads(data[_WELCOME.size:].decode())
+                self.codec = SnapshotCodec(self.config["num_players"], self.config["capacity"])
+                self.view = MatchView(self.config)
+                self._state = np.zeros(self.codec.size)
+                self.tick_hz = float(self.config["tick_hz"])
+                self.delay_ticks = self.interp_snapshots * self.tick_hz / float(self.config["snapshot_hz"])
+                return self
+        raise ConnectionError(f"No answer from {self.address[0]}:{self.address[1]} within {timeout_s:g} s")
+
+    def send_input(self, keys, ratio=None):
+        """
+        Sends this frame's key state (KEY_LEFT | KEY_RIGHT bits) and EEG ratio (None: no
+        headset, the server uses a test ratio). Also acknowledges the newest snapshot.
+        """
+        self.input_seq += 1
+        self._send(_INPUT.pack(b"I", self.client_id, self.input_seq, keys,
+                               float("nan") if ratio is None else ratio, self.ack))
+
+    def request_restart(self):
+        """Asks for a new match (honored for players once the current match is over)."""
+        self._send(_CLIENT.pack(b"X", self.client_id))
+
+    def poll(self, now=None):
+        """
+        Receives and decodes every pending snapshot; spectators acknowledge here.
+
+        Returns:
+            int: Snapshots decoded.
+        """
+        now = time.perf_counter() if now is None else now
+        decoded = 0
+        while True:
+            try:
+                data = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError, ConnectionRefusedError):
+                break
+            self.bytes_received += len(data)
+            if data[:1] != b"S":
+                continue
+            if self.drop_rate and self.rng.random() < self.drop_rate:
+                self.dropped += 1
+                continue
+            try:
+                _, tick, base = _SNAPSHOT.unpack_from(data)
+                if self.frames and tick <= self.frames[-1][0]:
+                    continue  # late or duplicate
+                q = self.codec.decode(data[_SNAPSHOT.size:], None if base == FULL_SNAPSHOT else self.history[base])
+            except KeyError:
+                self.decode_errors += 1  # baseline already evicted: the next snapshot will be full
+                continue
+            except (struct.error, ValueError, IndexError):
+                self.decode_errors += 1  # truncated or corrupt datagram
+                continue
+            if len(self.history_ticks) == self.history_ticks.maxlen:
+                self.history.pop(self.history_ticks[0], None)
+            self.history_ticks.append(tick)
+            self.history[tick] = q
+            self.frames.append((tick, self.codec.dequantize(q)))
+            self.ack = tick
+            # Server clock estimate: the earliest arrival seen, drifting up slowly so a
+            # single fast packet does not pin it forever
+            sample = now - tick / self.tick_hz
+            if self.clock_base is None or sample < self.clock_base:
+                self.clock_base = sample
+            else:
+                self.clock_base += (sample - self.clock_base) * 0.01
+            self.snapshots += 1
+            decoded += 1
+        if decoded and self.spectate:
+            self.send_input(0)
+        return decoded
+
+    def render_tick(self, now=None):
+        """Server tick the view shows at time now (fractional)."""
+        now = time.perf_counter() if now is None else now
+        return (now - self.clock_base) * self.tick_hz - self.delay_ticks
+
+    def update_view(self, now=None):
+        """
+        Interpolates the snapshot buffer to the render time and loads it into view, whose
+        events then list the game events since the previous update.
+
+        Returns:
+            MatchView: self.view.
+        """
+        frames = self.frames
+        if not frames:
+            return self.view
+        r = self.render_tick(now)
+        if r >= frames[-1][0]:
+            if len(frames) > 1:
+                self.underruns += 1
+            a = b = frames[-1]
+        elif r <= frames[0][0]:
+            a = b = frames[0]
+        else:
+            i = len(frames) - 2
+            while frames[i][0] > r:
+                i -= 1
+            a, b = frames[i], frames[i + 1]
+        if a is b:
+            np.copyto(self._state, a[1])
+        else:
+            alpha = (r - a[0]) / (b[0] - a[0])
+            self.codec.interpolate(a[1], b[1], alpha, out=self._state)
+        self.view.apply(self.codec, self._state, tick=a[0])
+        return self.view
+
+    def status_text(self):
+        kind = "spectating" if self.slot < 0 else f"playing as P{self.slot + 1}"
+        return f"Online ({kind}) | {self.snapshots} snapshots, {self.dropped + self.decode_errors} lost"
+
+    def close(self):
+        if self.client_id is not None:
+            self._send(_CLIENT.pack(b"B", self.client_id))
+        self.sock.close()
+
+
+def selftest(clients=2, spectators=1, seconds=10.0, num_players=4, loss=0.0, seed=0, tick_hz=60.0, snapshot_hz=30.0,
+             fps=60.0):
+    """
+    Runs a server and bot clients on localhost and checks the replication.
+
+    Player clients steer randomly and send made-up EEG ratios. At the end, every snapshot
+    each client decoded is compared with the one the server quantized for that tick.
+
+    Returns:
+        bool: True if every client received snapshots and all of them matched the server.
+    """
+    server = GameServer(port=0, num_players=num_players, num_humans=clients, seed=seed, tick_hz=tick_hz,
+                        snapshot_hz=snapshot_hz, history=4096)
+    stop = threading.Event()
+    thread = threading.Thread(target=server.run, kwargs={"report_s": 0, "stop": stop}, name="net-server", daemon=True)
+    thread.start()
+    rng = np.random.default_rng(seed)
+    peers = [GameClient(server.address, drop_rate=loss, seed=seed + i, history=4096).connect() for i in range(clients)]
+    peers += [GameClient(server.address, spectate=True, drop_rate=loss, seed=seed + 100 + i, history=4096).connect()
+              for i in range(spectators)]
+    keys = np.zeros(clients, dtype=int)
+    period = 1.0 / fps
+    t_end = time.perf_counter() + seconds
+    next_report = time.perf_counter() + min(5.0, seconds / 2)
+    frame_ms = []
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        change = rng.random(clients) < 0.05
+        keys[change] = rng.integers(0, 4, size=int(change.sum()))
+        for i, client in enumerate(peers):
+            client.poll()
+            if client.slot >= 0:
+                client.send_input(int(keys[i]), float(rng.uniform(0.5, 2.5)) if i % 2 == 0 else None)
+            client.update_view()
+        frame_ms.append((time.perf_counter() - t0) * 1000.0)
+        if time.perf_counter() >= next_report:
+            next_report += 5.0
+            print(server.report(), flush=True)
+        time.sleep(max(0.0, period - (time.perf_counter() - t0)))
+    print(server.report(), flush=True)
+    stop.set()
+    thread.join()
+
+    ok = True
+    for client in peers:
+        common = [t for t in client.history_ticks if t in server.history]
+        mismatched = sum(not np.array_equal(client.history[t], server.history[t]) for t in common)
+        lag_ms = client.delay_ticks / client.tick_hz * 1000.0
+        print(f"client {client.client_id} ({'spectator' if client.slot < 0 else f'P{client.slot + 1}'}): "
+              f"{client.snapshots} snapshots, {client.dropped} dropped (simulated), {client.decode_errors} undecodable, "
+              f"{client.underruns} interpolation underruns, {client.bytes_received / seconds * 8 / 1000.0:.1f} kbit/s in, "
+              f"{mismatched}/{len(common)} snapshots differ from the server, view {lag_ms:.0f} ms behind")
+        ok &= client.snapshots > 0 and mismatched == 0
+        client.close()
+    print(f"client frame (poll + input + interpolation): {np.mean(frame_ms):.2f} ms avg, {np.max(frame_ms):.2f} max")
+    server.close()
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Red Light Green Light network server and localhost self-test")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="Run an authoritative match server")
+    p_test = sub.add_parser("selftest", help="Server plus bot players and spectators on localhost")
+    for p in (p_serve, p_test):
+        p.add_argument("--players", type=int, default=4, help="Players in the match (the rest of --humans are bots)")
+        p.add_argument("--seed", type=int, default=None, help="Match seed (random by default)")
+        p.add_argument("--tick-hz", type=float, default=60.0, help="Simulation rate")
+        p.add_argument("--snapshot-hz", type=float, default=30.0, help="Snapshot rate")
+    p_serve.add_argument("--host", type=str, default="0.0.0.0", help="Interface to listen on")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port")
+    p_serve.add_argument("--humans", type=int, default=2, help="Player slots open to network clients")
+    p_serve.add_argument("--hazard", type=float, default=1.0, help="Car traffic density")
+    p_serve.add_argument("--size", type=str, default=None, metavar="WxH",
+                         help="Simulated screen size (default 1280x720); clients render at this resolution")
+    p_serve.add_argument("--report", type=float, default=5.0, help="Seconds between metric reports (0: off)")
+    p_test.add_argument("--clients", type=int, default=2, help="Bot player clients")
+    p_test.add_argument("--spectators", type=int, default=1, help="Spectator clients")
+    p_test.add_argument("--seconds", type=float, default=10.0, help="Test length")
+    p_test.add_argument("--loss", type=float, default=0.0, help="Simulated share of lost snapshots (0-1)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        width, height = (int(v) for v in args.size.lower().split("x")) if args.size else (None, None)
+        server = GameServer(args.host, args.port, num_players=args.players, num_humans=args.humans, seed=args.seed,
+                            hazard=args.hazard, width=width, height=height, tick_hz=args.tick_hz,
+                            snapshot_hz=args.snapshot_hz)
+        host, port = server.address
+        print(f"Serving match (seed {server.sim.seed}, {args.players} players, {server.sim.num_humans} network slots) "
+              f"on udp {host}:{port}", flush=True)
+        try:
+            server.run(report_s=args.report)
+        except KeyboardInterrupt:
+            pass
+        server.close()
+    else:
+        passed = selftest(args.clients, args.spectators, args.seconds, max(args.players, args.clients),
+                          loss=args.loss, seed=args.seed or 0, tick_hz=args.tick_hz, snapshot_hz=args.snapshot_hz)
+        print("Self-test passed." if passed else "Self-test FAILED.")
+        raise SystemExit(0 if passed else 1)
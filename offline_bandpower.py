@@ -0,0 +1,298 @@
+"""
+Offline band-power timelines for recorded EEG sessions.
+
+Computes per-channel band powers and the alpha/beta ratio at a fixed hop over a whole
+recording, with the same estimator the game uses live (Welch PSD per window, trapezoid
+integration over each band, ratio averaged across channels). Windows are strided views of
+the recording, so each chunk of the timeline is one batched detrend + rFFT + matrix
+product rather than a Python loop over windows; chunks run on a process pool.
+
+Inputs: BrainFlow CSV files (DataFilter.write_file), spill recordings (.eegz, see
+eeg_spill.py) and raw .npy arrays (rows x samples).
+
+Usage:
+    python offline_bandpower.py session.csv --board-id 0 --hop 0.2 -o session_bands.npz
+    python offline_bandpower.py "spill/session-*.eegz" --window 2.0 --hop 0.1
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_BANDS = {
+    "delta": (1, 4),
+    "theta": (4, 8),
+    "alpha": (8, 12),
+    "beta": (12, 30),
+    "gamma": (30, 100),
+}
+_EPSILON = 1e-12
+# Bytes of windowed samples one chunk may expand into before the FFT
+_CHUNK_BUDGET = 32 * 1024 * 1024
+
+
+def recording_meta(path, board_id=None):
+    """
+    What is known about a recording without loading its samples.
+
+    Returns:
+        dict: May carry "sampling_rate", "board_id" and "eeg_channels" (from a spill header,
+        else from BrainFlow's board description of board_id).
+    """
+    meta = {}
+    if path.endswith(".eegz") or "*" in path:
+        from eeg_spill import read_spill_header
+        import glob
+        files = sorted(glob.glob(path)) or [path]
+        header = read_spill_header(files[0])
+        meta["sampling_rate"] = header.get("sampling_rate")
+        meta["board_id"] = header.get("board_id")
+        if header.get("eeg_channels"):
+            meta["eeg_channels"] = header["eeg_channels"]
+    board_id = board_id if board_id is not None else meta.get("board_id")
+    if board_id is not None:
+        meta["board_id"] = board_id
+        try:
+            from brainflow.board_shim import BoardShim
+            if not meta.get("sampling_rate"):
+                meta["sampling_rate"] = BoardShim.get_sampling_rate(board_id)
+            if not meta.get("eeg_channels"):
+                meta["eeg_channels"] = BoardShim.get_eeg_channels(board_id)
+        except Exception:
+            pass  # no BrainFlow, or a board id it does not know (e.g. the synthetic board)
+    return meta
+
+
+def load_recording(path, board_id=None):
+    """
+    Loads a recording as a (rows x samples) array.
+
+    Returns:
+        tuple: (data, meta) where meta may carry "sampling_rate", "board_id" and "eeg_channels".
+    """
+    meta = recording_meta(path, board_id)
+    if path.endswith(".eegz") or "*" in path:
+        from eeg_spill import load_spill
+        import glob
+        data = load_spill(sorted(glob.glob(path)) or [path])
+    elif path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+    else:
+        try:
+            from brainflow.data_filter import DataFilter
+            data = DataFilter.read_file(path)
+        except ImportError:
+            data = np.loadtxt(path, delimiter="\t").T
+    return np.asarray(data), meta
+
+
+def band_weights(freqs, bands):
+    """
+    (n_freqs x n_bands) matrix W such that psd @ W equals np.trapezoid(psd[mask], freqs[mask])
+    for every band's inclusive [low, high] mask, so all bands integrate in one product.
+    """
+    weights = np.zeros((freqs.size, len(bands)))
+    for j, (low, high) in enumerate(bands.values()):
+        idx = np.flatnonzero((freqs >= low) & (freqs <= high))
+        if idx.size < 2:
+            continue
+        df = np.diff(freqs[idx])
+        weights[idx[:-1], j] += df * 0.5
+        weights[idx[1:], j] += df * 0.5
+    return weights
+
+
+def welch_windows(segments_source, fs, nperseg):
+    """
+    Welch PSD of many windows at once.
+
+    Args:
+        segments_source (numpy.ndarray): (..., window) array of windows (a strided view is fine).
+        fs (float): Sampling rate.
+        nperseg (int): Segment length; segments overlap by half like scipy.signal.welch.
+
+    Returns:
+        tuple: (freqs, psd) with psd shaped (..., n_freqs), density scaling, one-sided.
+    """
+    win_len = segments_source.shape[-1]
+    nperseg = int(min(nperseg, win_len))
+    step = nperseg - nperseg // 2
+    segs = sliding_window_view(segments_source, nperseg, axis=-1)[..., ::step, :]
+    taper = 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(nperseg) / nperseg)  # periodic Hann, as scipy
+    x = segs - segs.mean(axis=-1, keepdims=True)
+    x *= taper
+    spec = np.fft.rfft(x, axis=-1)
+    psd = spec.real ** 2 + spec.imag ** 2
+    psd *= 1.0 / (fs * float((taper ** 2).sum()))
+    if nperseg % 2:
+        psd[..., 1:] *= 2.0
+    else:
+        psd[..., 1:-1] *= 2.0
+    return np.fft.rfftfreq(nperseg, 1.0 / fs), psd.mean(axis=-2)
+
+
+class WelchScratch:
+    """
+    welch_windows() for one fixed (channels, samples) window shape, run in preallocated
+    buffers (segments, taper, FFT output, PSD) so a live tick allocates only a few hundred
+    bytes of views and small per-segment temporaries.
+
+    Every large operation runs on same-shape contiguous operands: numpy gives a broadcast or
+    strided ufunc an iteration buffer the size of the operation. So the segment means are
+    removed in the frequency domain, through the few nonzero bins of the taper's spectrum,
+    and one per-bin PSD weight applies the density scale, the one-sided doubling and the
+    segment average. Segments are float64 whatever the input dtype, because numpy's float32
+    rFFT allocates a work buffer per call. Results match welch_windows() to rounding.
+
+    Attributes:
+        shape (tuple): (channels, samples) this scratch serves.
+        freqs (numpy.ndarray): Frequencies of the PSD bins.
+        psd (numpy.ndarray): (channels, n_freqs) PSD of the last compute(), overwritten by the next.
+    """
+
+    def __init__(self, shape, fs, nperseg):
+        n_ch, win_len = shape
+        self.shape = (int(n_ch), int(win_len))
+        self.fs = float(fs)
+        self.nperseg = int(min(nperseg, win_len))
+        self.step = self.nperseg - self.nperseg // 2
+        n_segs = (win_len - self.nperseg) // self.step + 1
+        n_freqs = self.nperseg // 2 + 1
+        taper = 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(self.nperseg) / self.nperseg)  # periodic Hann, as scipy
+        taper_spec = np.fft.rfft(taper)
+        self.taper_bins = [(k, complex(taper_spec[k]))
+                           for k in np.flatnonzero(np.abs(taper_spec) > 1e-9 * self.nperseg)]
+        self.segments = np.empty((n_ch, n_segs, self.nperseg))
+        self.taper = np.ascontiguousarray(np.broadcast_to(taper, self.segments.shape))
+        self.means = np.empty((n_ch, n_segs))
+        self.correction = np.empty((n_ch, n_segs), dtype=np.complex128)
+        self.spec = np.empty((n_ch, n_segs, n_freqs), dtype=np.complex128)
+        self.power = np.empty((n_ch, n_segs, n_freqs))
+        self.imag_sq = np.empty_like(self.power)
+        self.psd = np.empty((n_ch, n_freqs))
+        weight = np.full(n_freqs, 1.0 / (self.fs * float((taper ** 2).sum()) * n_segs))
+        weight[slice(1, None) if self.nperseg % 2 else slice(1, -1)] *= 2.0
+        self.psd_weight = np.ascontiguousarray(np.broadcast_to(weight, self.psd.shape))
+        self.freqs = np.fft.rfftfreq(self.nperseg, 1.0 / self.fs)
+
+    def compute(self, eeg):
+        """(freqs, psd) of one (channels, samples) window; both arrays are this scratch's buffers."""
+        np.copyto(self.segments, sliding_window_view(eeg, self.nperseg, axis=-1)[:, ::self.step, :])
+        np.mean(self.segments, axis=-1, out=self.means)
+        self.segments *= self.taper
+        np.fft.rfft(self.segments, axis=-1, out=self.spec)
+        # rfft((x - mean) * taper) = rfft(x * taper) - mean * rfft(taper)
+        for k, value in self.taper_bins:
+            np.multiply(self.means, value, out=self.correction)
+            self.spec[..., k] -= self.correction
+        np.multiply(self.spec.real, self.spec.real, out=self.power)
+        np.multiply(self.spec.imag, self.spec.imag, out=self.imag_sq)
+        self.power += self.imag_sq
+        np.sum(self.power, axis=-2, out=self.psd)
+        self.psd *= self.psd_weight
+        return self.freqs, self.psd
+
+
+def _timeline_chunk(args):
+    eeg, fs, win, hop, nperseg, bands = args
+    windows = sliding_window_view(eeg, win, axis=-1)[:, ::hop, :]  # (ch, frames, win)
+    freqs, psd = welch_windows(windows, fs, nperseg)
+    powers = psd @ band_weights(freqs, bands)  # (ch, frames, bands)
+    return np.moveaxis(powers, -1, 0).astype(np.float32)
+
+
+def band_power_timeline(eeg, fs, window_s=2.0, hop_s=0.2, nperseg=1024, bands=None, workers=None):
+    """
+    Per-channel band powers and alpha/beta ratios over a whole recording.
+
+    Args:
+        eeg (numpy.ndarray): (channels x samples) EEG.
+        fs (float): Sampling rate.
+        window_s (float): Analysis window (the game uses 2.0 s).
+        hop_s (float): Time between consecutive windows.
+        nperseg (int): Welch segment length (the game uses 1024, capped at the window).
+        bands (dict, optional): Band name -> (low, high) Hz; defaults to DEFAULT_BANDS.
+        workers (int, optional): Worker processes; 1 runs in-process.
+
+    Returns:
+        dict: times (window end, s), bands (names), band_power (bands x channels x frames,
+        float32), ratio (channels x frames), ratio_mean (frames), plus the settings used.
+    """
+    bands = dict(bands or DEFAULT_BANDS)
+    eeg = np.asarray(eeg, dtype=np.float64)
+    win = max(2, int(round(window_s * fs)))
+    hop = max(1, int(round(hop_s * fs)))
+    n_ch, n_samples = eeg.shape
+    n_frames = 0 if n_samples < win else (n_samples - win) // hop + 1
+
+    seg = min(nperseg, win)
+    n_seg = (win - seg) // (seg - seg // 2) + 1
+    chunk_frames = max(1, _CHUNK_BUDGET // (8 * n_ch * n_seg * seg))
+    jobs = []
+    for f0 in range(0, n_frames, chunk_frames):
+        f1 = min(n_frames, f0 + chunk_frames)
+        jobs.append((eeg[:, f0 * hop:(f1 - 1) * hop + win], fs, win, hop, nperseg, bands))
+
+    if workers == 1 or len(jobs) <= 1:
+        parts = [_timeline_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_timeline_chunk, jobs))
+    names = list(bands)
+    if parts:
+        band_power = np.concatenate(parts, axis=-1)
+    else:
+        band_power = np.zeros((len(names), n_ch, 0), dtype=np.float32)
+    ratio = band_power[names.index("alpha")] / (band_power[names.index("beta")] + _EPSILON)
+    return {
+        "times": (np.arange(n_frames) * hop + win) / fs,
+        "bands": np.array(names),
+        "band_edges": np.array([bands[n] for n in names], dtype=float),
+        "band_power": band_power,
+        "ratio": ratio.astype(np.float32),
+        "ratio_mean": ratio.mean(axis=0).astype(np.float32),
+        "sampling_rate": float(fs),
+        "window_s": win / fs,
+        "hop_s": hop / fs,
+        "nperseg": int(min(nperseg, win)),
+    }
+
+
+def save_timeline(path, timeline):
+    np.savez_compressed(path, **timeline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Band-power and alpha/beta timelines from a recorded EEG session")
+    parser.add_argument("recording", help="BrainFlow CSV, .npy (rows x samples) or spill file/glob (.eegz)")
+    parser.add_argument("-o", "--out", default=None, help="Output .npz (default: <recording>_bands.npz)")
+    parser.add_argument("--board-id", type=int, default=None, help="BrainFlow board id (0 = Cyton) for rate and EEG rows")
+    parser.add_argument("--fs", type=float, default=None, help="Sampling rate if it cannot be derived from the board")
+    parser.add_argument("--channels", type=str, default=None, help="Comma-separated EEG rows (default: board's EEG channels)")
+    parser.add_argument("--window", type=float, default=2.0, help="Window length in seconds")
+    parser.add_argument("--hop", type=float, default=0.2, help="Hop between windows in seconds")
+    parser.add_argument("--nperseg", type=int, default=1024, help="Welch segment length")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    data, meta = load_recording(args.recording, args.board_id)
+    fs = args.fs or meta.get("sampling_rate")
+    if not fs:
+        parser.error("sampling rate unknown; pass --fs or --board-id")
+    if args.channels:
+        channels = [int(c) for c in args.channels.split(",")]
+    else:
+        channels = meta.get("eeg_channels") or list(range(1, 9))
+    t_load = time.perf_counter()
+    timeline = band_power_timeline(data[channels], fs, window_s=args.window, hop_s=args.hop,
+                                   nperseg=args.nperseg, workers=args.workers)
+    t_done = time.perf_counter()
+    out = args.out or os.path.splitext(args.recording.replace("*", "all"))[0] + "_bands.npz"
+    save_timeline(out, timeline)
+    minutes = data.shape[1] / fs / 60.0
+    print(f"{len(channels)} channels, {minutes:.1f} min, {timeline['times'].size} windows | "
+          f"load {t_load - t0:.1f} s, compute {t_done - t_load:.1f} s | wrote {out}")
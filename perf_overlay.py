@@ -0,0 +1,218 @@
+"""
+In-game performance overlay and on-demand profiler.
+
+FrameTimers splits every frame into named sections with lap(): each call charges the time
+since the previous lap to one section, so interleaved work (players and cars drawn in depth
+order) lands in the right bucket without nested timers. The last few seconds of frames are
+kept in a preallocated ring.
+
+PerfOverlay draws that ring as a frame-time graph plus per-section averages, sprite cache
+hit rates and EEG freshness. FrameProfiler captures a time-bounded cProfile of the running
+loop to a .prof file (open with snakeviz or pstats) and a plain-text summary next to it,
+so stutter on venue hardware can be diagnosed without a developer setup.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+
+import numpy as np
+import pygame
+
+
+class FrameTimers:
+    """
+    Per-frame section timings.
+
+    Attributes:
+        sections (tuple): Section names, in display order.
+        frame_ms (numpy.ndarray): Ring of whole-frame times (start to start).
+        section_ms (numpy.ndarray): Ring of (frames, sections) times.
+        count (int): Frames recorded so far.
+    """
+
+    def __init__(self, sections, history=240):
+        self.sections = tuple(sections)
+        self.index = {name: i for i, name in enumerate(self.sections)}
+        self.frame_ms = np.zeros(history)
+        self.section_ms = np.zeros((history, len(self.sections)))
+        self.current = [0.0] * len(self.sections)
+        self.count = 0
+        self.pos = 0
+        self.frame_start = None
+        self.last = time.perf_counter()
+
+    def start_frame(self):
+        """Closes the previous frame (if any) and starts timing a new one."""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame_ms[self.pos] = (now - self.frame_start) * 1000.0
+            row = self.section_ms[self.pos]
+            for i, value in enumerate(self.current):
+                row[i] = value * 1000.0
+                self.current[i] = 0.0
+            self.pos = (self.pos + 1) % self.frame_ms.size
+            self.count += 1
+        self.frame_start = self.last = now
+
+    def lap(self, section):
+        """Charges the time since the previous lap (or frame start) to section."""
+        now = time.perf_counter()
+        self.current[self.index[section]] += now - self.last
+        self.last = now
+
+    def work_ms(self):
+        """Time charged to sections so far this frame (the frame minus its wait)."""
+        return sum(self.current) * 1000.0
+
+    def recent(self):
+        """(frame_ms, section_ms) of the recorded frames, oldest first."""
+        n = min(self.count, self.frame_ms.size)
+        order = (np.arange(self.pos - n, self.pos)) % self.frame_ms.size
+        return self.frame_ms[order], self.section_ms[order]
+
+
+class PerfOverlay:
+    """
+    Toggleable debug panel: frame-time graph, per-section timers, cache hit rates and
+    EEG freshness. Its text refreshes a few times per second, so the overlay itself stays
+    cheap enough not to distort what it measures.
+
+    Attributes:
+        visible (bool): Whether draw() paints anything.
+        caches (dict): Cache name -> [hits, misses] counters owned by the game.
+    """
+
+    def __init__(self, timers, font, caches=None, budget_ms=1000.0 / 60, visible=False, refresh_s=0.25):
+        self.timers = timers
+        self.font = font
+        self.caches = caches or {}
+        self.budget_ms = budget_ms
+        self.visible = visible
+        self.refresh_s = refresh_s
+        self.lines = []
+        self.next_refresh = 0.0
+        self.cache_marks = {}
+        self.panel = None
+        self.graph_w, self.graph_h = 240, 60
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.next_refresh = 0.0
+
+    def _refresh_text(self, info):
+        frame_ms, section_ms = self.timers.recent()
+        if frame_ms.size == 0:
+            return
+        fps = 1000.0 / max(frame_ms.mean(), 1e-6)
+        over = int((frame_ms > self.budget_ms * 1.5).sum())
+        rows = [f"frame {frame_ms.mean():5.1f} ms avg  {frame_ms.max():5.1f} max  {fps:5.1f} fps  "
+                f"{over} slow / {frame_ms.size}"]
+        means, peaks = section_ms.mean(axis=0), section_ms.max(axis=0)
+        for name, mean, peak in zip(self.timers.sections, means, peaks):
+            rows.append(f"{name:<9}{mean:6.2f} ms  max {peak:6.2f}")
+        rows.append(f"{'idle':<9}{max(0.0, frame_ms.mean() - means.sum()):6.2f} ms")
+        for name, (hits, misses) in self.caches.items():
+            # Rates over the last refresh period, so cache churn shows up immediately
+            last_hits, last_misses = self.cache_marks.get(name, (0, 0))
+            d_hits, d_misses = hits - last_hits, misses - last_misses
+            self.cache_marks[name] = (hits, misses)
+            total = d_hits + d_misses
+            rate = f"{100.0 * d_hits / total:5.1f}%" if total else "   --"
+            rows.append(f"{name + ' cache':<13}{rate} hit  ({misses} misses total)")
+        for label, value in (info() if info else {}).items():
+            rows.append(f"{label}: {value}")
+        self.lines = [self.font.render(row, True, (255, 255, 255)) for row in rows]
+
+    def draw(self, surface, info=None):
+        """
+        Paints the panel in the top-right corner.
+
+        Args:
+            surface (pygame.Surface): Target (the screen).
+            info (callable, optional): Returns extra label -> text rows (e.g. EEG age);
+                only called when the text refreshes.
+        """
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now >= self.next_refresh:
+            self.next_refresh = now + self.refresh_s
+            self._refresh_text(info)
+        line_h = self.font.get_linesize()
+        width = max([self.graph_w] + [line.get_width() for line in self.lines]) + 16
+        height = self.graph_h + 16 + line_h * len(self.lines) + 8
+        if self.panel is None or self.panel.get_size() != (width, height):
+            self.panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.panel.fill((0, 0, 0, 170))
+
+        # Frame-time graph: one column per frame, budget line at 1x, scale at 3x budget
+        frame_ms, _ = self.timers.recent()
+        top_ms = self.budget_ms * 3.0
+        gx, gy, gw, gh = 8, 8, self.graph_w, self.graph_h
+        pygame.draw.rect(self.panel, (40, 40, 40, 200), (gx, gy, gw, gh))
+        budget_y = gy + gh - int(gh * self.budget_ms / top_ms)
+        pygame.draw.line(self.panel, (80, 200, 80), (gx, budget_y), (gx + gw - 1, budget_y))
+        if frame_ms.size >= 2:
+            tail = frame_ms[-gw:]
+            xs = gx + np.arange(tail.size) * (gw - 1) // max(1, tail.size - 1)
+            ys = gy + gh - 1 - (np.minimum(tail, top_ms) * (gh - 1) / top_ms).astype(int)
+            pygame.draw.lines(self.panel, (255, 220, 80), False, np.column_stack((xs, ys)).tolist())
+        y = gy + gh + 8
+        for line in self.lines:
+            self.panel.blit(line, (8, y))
+            y += line_h
+        surface.blit(self.panel, (surface.get_width() - width - 10, 10))
+
+
+class FrameProfiler:
+    """
+    Time-bounded cProfile capture of the thread that calls toggle()/poll() (the game loop).
+
+    Attributes:
+        active (bool): Whether a capture is running.
+        last_path (str): .prof file of the last finished capture.
+    """
+
+    def __init__(self, directory=".", seconds=10.0, top=40):
+        self.directory = directory
+        self.seconds = seconds
+        self.top = top
+        self.profile = None
+        self.stop_at = 0.0
+        self.last_path = None
+
+    @property
+    def active(self):
+        return self.profile is not None
+
+    def toggle(self):
+        """Starts a capture, or ends the running one early."""
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.stop_at = time.perf_counter() + self.seconds
+            print(f"Profiling the game loop for {self.seconds:g} s (press again to stop early)", flush=True)
+            self.profile.enable()
+        else:
+            self._finish()
+
+    def poll(self):
+        """Ends the capture once its time is up; call once per frame."""
+        if self.profile is not None and time.perf_counter() >= self.stop_at:
+            self._finish()
+
+    def _finish(self):
+        self.profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, time.strftime("rlgl-profile-%Y%m%d-%H%M%S"))
+        self.profile.dump_stats(base + ".prof")
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=summary)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+        with open(base + ".txt", "w") as f:
+            f.write(summary.getvalue())
+        self.profile = None
+        self.last_path = base + ".prof"
+        print(f"Profile written to {base}.prof (summary: {base}.txt)", flush=True)
@@ -0,0 +1,134 @@
+"""
+Adaptive rendering quality for the game.
+
+QualityGovernor watches a rolling average of frame times and steps through QUALITY_TIERS:
+down as soon as the game misses its frame rate, up only after a sustained stretch of
+headroom. A tier that had to be abandoned again shortly after an upgrade is retried only
+after twice the previous wait, so a machine that sits right at a tier boundary settles
+instead of flapping between two tiers.
+
+    governor = QualityGovernor(budget_ms=1000 / 60)
+    ...
+    if governor.update(frame_ms, work_ms):   # once per frame
+        apply(governor.settings)
+"""
+import time
+
+import numpy as np
+
+# Best first. scenery_rows: tree rows beside the road; road_stripes: center-line segments;
+# scenery_frames: tree rows blitted from this many pre-rendered scroll positions (0 = drawn
+# live; coarser motion, a fraction of the draw time); fog: horizon fog overlay;
+# smooth_sprites: smoothscale (vs nearest) for scaled sprites; clouds: clouds drawn in the sky
+QUALITY_TIERS = (
+    {"name": "high", "scenery_rows": 24, "road_stripes": 16, "scenery_frames": 0, "fog": True, "smooth_sprites": True, "clouds": 3},
+    {"name": "medium", "scenery_rows": 16, "road_stripes": 12, "scenery_frames": 0, "fog": True, "smooth_sprites": True, "clouds": 3},
+    {"name": "low", "scenery_rows": 12, "road_stripes": 8, "scenery_frames": 0, "fog": False, "smooth_sprites": False, "clouds": 2},
+    {"name": "minimal", "scenery_rows": 8, "road_stripes": 6, "scenery_frames": 128, "fog": False, "smooth_sprites": False, "clouds": 0},
+)
+QUALITY_NAMES = tuple(tier["name"] for tier in QUALITY_TIERS)
+
+
+class QualityGovernor:
+    """
+    Picks a quality tier from recent frame times.
+
+    Attributes:
+        tier (int): Index into tiers (0 = best).
+        fixed (bool): Never change tier (a quality was chosen on the command line).
+        changes (int): Tier changes so far.
+    """
+
+    def __init__(self, tiers=QUALITY_TIERS, budget_ms=1000.0 / 60, window=90, downgrade_ratio=1.15,
+                 upgrade_ratio=0.6, hold_s=3.0, probation_s=10.0, tier=0, fixed=False):
+        """
+        Args:
+            tiers (tuple): Settings dicts, best first.
+            budget_ms (float): Frame time of the target frame rate.
+            window (int): Frames in the rolling averages; re-filled after every change.
+            downgrade_ratio (float): Step down when the average frame time exceeds this
+                multiple of the budget.
+            upgrade_ratio (float): Step up when the average work time (frame time minus the
+                wait for the next frame) stays below this multiple of the budget...
+            hold_s (float): ...for this long (doubled per failed retry of a tier).
+            probation_s (float): A tier abandoned within this time of upgrading to it counts
+                as a failed retry.
+            tier (int): Starting tier.
+            fixed (bool): Keep the starting tier.
+        """
+        self.tiers = tiers
+        self.budget_ms = budget_ms
+        self.downgrade_ratio = downgrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.probation_s = probation_s
+        self.tier = int(tier)
+        self.fixed = fixed
+        self.changes = 0
+        self.frame_ms = np.zeros(window)
+        self.work_ms = np.zeros(window)
+        self.count = 0
+        self.retry_hold_s = [hold_s] * len(tiers)
+        self.headroom_since = None
+        self.upgraded_at = None
+
+    @property
+    def settings(self):
+        return self.tiers[self.tier]
+
+    @property
+    def name(self):
+        return self.tiers[self.tier]["name"]
+
+    def averages(self):
+        """(frame_ms, work_ms) rolling averages, or None until the window has filled."""
+        if self.count < self.frame_ms.size:
+            return None
+        return float(self.frame_ms.mean()), float(self.work_ms.mean())
+
+    def update(self, frame_ms, work_ms, now=None):
+        """
+        Records one frame and changes tier if needed.
+
+        Args:
+            frame_ms (float): Time since the previous frame, including the frame-rate wait.
+            work_ms (float): Time this frame spent working (simulation, drawing, flip).
+            now (float, optional): Clock in seconds; time.perf_counter() by default.
+
+        Returns:
+            bool: True if the tier changed (apply settings before the next frame).
+        """
+        i = self.count % self.frame_ms.size
+        self.frame_ms[i] = frame_ms
+        self.work_ms[i] = work_ms
+        self.count += 1
+        if self.fixed:
+            return False
+        averages = self.averages()
+        if averages is None:
+            return False
+        now = time.perf_counter() if now is None else now
+        frame_avg, work_avg = averages
+
+        if frame_avg > self.budget_ms * self.downgrade_ratio and self.tier < len(self.tiers) - 1:
+            if self.upgraded_at is not None and now - self.upgraded_at < self.probation_s:
+                self.retry_hold_s[self.tier] *= 2.0  # this tier just failed again: wait longer next time
+            self.upgraded_at = None
+            self._set_tier(self.tier + 1)
+            return True
+
+        if work_avg < self.budget_ms * self.upgrade_ratio and self.tier > 0:
+            if self.headroom_since is None:
+                self.headroom_since = now
+            elif now - self.headroom_since >= self.retry_hold_s[self.tier - 1]:
+                self._set_tier(self.tier - 1)
+                self.upgraded_at = now
+                return True
+        else:
+            self.headroom_since = None
+        return False
+
+    def _set_tier(self, tier):
+        self.tier = tier
+        self.changes += 1
+        self.count = 0  # judge the new tier on its own frames only
+        self.headroom_since = None
@@ -1,10 +1,11 @@
 import time
 import numpy as np
-from scipy.signal import welch
-import matplotlib.pyplot as plt
 
-from brainflow_stream import BrainFlowBoardSetup
-import brainflow
+# scipy, matplotlib and BrainFlow are imported where they are used, so importing this
+# module for compute_band_powers stays cheap
+
+BANDS_ORDER = ["delta", "theta", "alpha", "beta", "gamma"]
+_BAND_WEIGHTS = {}  # (n_freqs, fs, bands) -> band weight matrix of psd_band_powers
 
 
 def remove_dc_offset(eeg_data: np.ndarray) -> np.ndarray:
@@ -21,6 +22,8 @@ def compute_band_powers(eeg_data: np.ndarray, sfreq: float, bands=None, nperseg:
             "gamma": (30, 100),
         }
 
+    from scipy.signal import welch
+
     n_channels = eeg_data.shape[0]
     band_powers = {band: np.zeros(n_channels) for band in bands}
 
@@ -38,74 +41,404 @@ def compute_band_powers(eeg_data: np.ndarray, sfreq: float, bands=None, nperseg:
     return band_powers
 
 
-def main(serial_port: str = None, window_seconds: int = 2, refresh_hz: float = 5.0):
-    board_id = brainflow.BoardIds.CYTON_BOARD.value
-    setup = BrainFlowBoardSetup(board_id=board_id, serial_port=serial_port, name="Cyton")
-    setup.setup()
-
-    sfreq = setup.get_sampling_rate()
-    if not sfreq:
-        print("Failed to get sampling rate; exiting.")
-        return
-
-    eeg_chs = getattr(setup, "eeg_channels", []) or []
-    if not eeg_chs:
-        # Fallback for Cyton typical layout if descriptor lookup failed
-        eeg_chs = list(range(1, 9))
-
-    # Matplotlib setup
-    plt.ion()
-    fig, ax = plt.subplots(figsize=(8, 5))
-    bands_order = ["delta", "theta", "alpha", "beta", "gamma"]
-    x = np.arange(len(bands_order))
-    bars = ax.bar(x, np.zeros(len(bands_order)))
-    ax.set_xticks(x)
-    ax.set_xticklabels(bands_order)
-    ax.set_ylabel("Average Band Power (a.u.)")
-    ax.set_title("Real-time EEG Band Powers (Averaged across 8 channels)")
-    ax.set_ylim(0, 1)
-
-    samples_needed = max(int(window_seconds * sfreq), 64)
-    dt = 1.0 / refresh_hz
+def psd_band_powers(eeg_data: np.ndarray, sfreq: float, nperseg: int = 256, bands=None):
+    """
+    Per-channel PSD and band powers from one batched Welch over all channels (the same
+    estimator as compute_band_powers, without the per-channel loop).
 
-    try:
-        # Give the stream a moment to buffer
-        time.sleep(max(0.5, window_seconds))
-        while True:
-            data = setup.get_current_board_data(num_samples=samples_needed)
-            if data is None or data.size == 0 or data.shape[1] < 8:
-                time.sleep(dt)
-                continue
+    Returns:
+        tuple: (freqs, psd of shape (channels, n_freqs), band powers of shape (channels, bands)).
+    """
+    from offline_bandpower import DEFAULT_BANDS, band_weights, welch_windows
 
-            if max(eeg_chs) >= data.shape[0]:
-                # Data shape not as expected yet; wait for buffer to fill
-                time.sleep(dt)
-                continue
+    bands = bands or DEFAULT_BANDS
+    freqs, psd = welch_windows(eeg_data, sfreq, max(min(nperseg, eeg_data.shape[1]), 64))
+    key = (freqs.size, float(sfreq), tuple(bands.items()))
+    weights = _BAND_WEIGHTS.get(key)
+    if weights is None:
+        weights = _BAND_WEIGHTS[key] = band_weights(freqs, bands)
+    return freqs, psd, psd @ weights
+
+
+class RollingRing:
+    """
+    Fixed-size history whose newest rows are always one contiguous view.
+
+    Every row is written twice, at i and i + size, so window() is a plain slice of a
+    preallocated (2 * size, ...) buffer: no np.roll, copies or allocations per frame.
+
+    Attributes:
+        size (int): Rows kept.
+        count (int): Rows written so far, capped at size.
+    """
+
+    def __init__(self, size, shape=(), dtype=np.float32):
+        self.size = int(size)
+        self.buf = np.zeros((2 * self.size,) + tuple(shape), dtype=dtype)
+        self.head = 0
+        self.count = 0
+
+    def push(self, row):
+        self.buf[self.head] = row
+        self.buf[self.head + self.size] = row
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def window(self):
+        """All size rows, oldest first (zeros before the ring has filled)."""
+        return self.buf[self.head:self.head + self.size]
+
+    def filled(self):
+        """Only the rows written so far, oldest first."""
+        return self.window()[self.size - self.count:]
+
+
+def minmax_decimate(values: np.ndarray, columns: int):
+    """
+    Reduces (n, ...) samples to at most 2 * columns rows: the min and max of each bucket,
+    interleaved, so a line through them draws the same envelope as all n samples at a
+    display resolution of `columns` pixels.
+
+    Returns:
+        tuple: (row index of each output point, decimated values).
+    """
+    n = values.shape[0]
+    bucket = max(1, n // max(1, columns))
+    usable = n // bucket * bucket
+    start = n - usable  # drop the oldest remainder so the newest sample is always shown
+    if bucket == 1:
+        return np.arange(start, n), values[start:]
+    blocks = values[start:].reshape((usable // bucket, bucket) + values.shape[1:])
+    out = np.empty((2 * blocks.shape[0],) + values.shape[1:], dtype=values.dtype)
+    np.min(blocks, axis=1, out=out[0::2])
+    np.max(blocks, axis=1, out=out[1::2])
+    index = np.empty(out.shape[0], dtype=np.int64)
+    index[0::2] = np.arange(start, n, bucket)
+    index[1::2] = index[0::2] + bucket - 1
+    return index, out
+
+
+class BandPowerFigure:
+    """
+    Band-power bars, a spectrogram waterfall and a long band-power strip chart, updated by
+    blitting.
+
+    The static parts (axes, ticks, labels) are rendered once into cached per-axes
+    backgrounds; each frame restores the axes whose data changed and draws only their
+    animated artists (the waterfall only when it gained a row). A full redraw happens only
+    when an axis range must change (with hysteresis, so rarely) or the window is resized.
+
+    Attributes:
+        waterfall (RollingRing): (rows, freqs) channel-averaged PSD in dB.
+        history (RollingRing): (samples, bands) channel-averaged band powers.
+        times (RollingRing): Time of each history sample.
+        full_redraws (int): Redraws that were not blits.
+    """
+
+    def __init__(self, freqs, bands_order=None, refresh_hz=30.0, waterfall_s=20.0, waterfall_rows=200,
+                 history_s=600.0, fmax=60.0, strip_columns=600, title=None):
+        """
+        Args:
+            freqs (numpy.ndarray): PSD frequencies (the waterfall shows those <= fmax).
+            bands_order (list, optional): Bars and strip lines; defaults to BANDS_ORDER.
+            refresh_hz (float): Expected updates per second (sizes the history ring).
+            waterfall_s (float): Seconds of spectrogram shown.
+            waterfall_rows (int): Spectrogram rows; at most one PSD per waterfall_s / rows
+                seconds enters the waterfall, so its image cost does not grow with refresh_hz.
+            history_s (float): Seconds of band-power history in the strip chart.
+            fmax (float): Highest frequency in the waterfall.
+            strip_columns (int): Min/max buckets the strip history is decimated to.
+            title (str, optional): Figure title.
+        """
+        import matplotlib.pyplot as plt
+
+        self.bands_order = list(bands_order or BANDS_ORDER)
+        self.n_freq = int(np.searchsorted(freqs, min(fmax, freqs[-1]), side="right"))
+        self.strip_columns = strip_columns
+        self.history_s = history_s
+        self.waterfall = RollingRing(waterfall_rows, (self.n_freq,))
+        self.waterfall.buf[:] = np.nan
+        self.row_period = waterfall_s / waterfall_rows
+        self.next_row = None
+        self.history = RollingRing(max(2, int(history_s * refresh_hz)), (len(self.bands_order),))
+        self.times = RollingRing(self.history.size, dtype=np.float64)
+        self.recent_n = max(1, int(10.0 * refresh_hz))  # bar range follows the last ~10 s
+        self.full_redraws = 0
+        self.backgrounds = {}
+
+        plt.ion()
+        self.fig = plt.figure(figsize=(10, 7))
+        grid = self.fig.add_gridspec(2, 2, height_ratios=(1, 1), width_ratios=(1, 1.4))
+        self.ax_bars = self.fig.add_subplot(grid[0, 0])
+        self.ax_fall = self.fig.add_subplot(grid[0, 1])
+        self.ax_strip = self.fig.add_subplot(grid[1, :])
+        if title:
+            self.fig.suptitle(title)
+
+        x = np.arange(len(self.bands_order))
+        self.bars = self.ax_bars.bar(x, np.zeros(len(self.bands_order)), animated=True)
+        self.ax_bars.set_xticks(x)
+        self.ax_bars.set_xticklabels(self.bands_order)
+        self.ax_bars.set_ylabel("Average Band Power (a.u.)")
+        self.ax_bars.set_ylim(0, 1)
+
+        self.image = self.ax_fall.imshow(self.waterfall.window(), aspect="auto", origin="lower", cmap="viridis",
+                                         extent=(0.0, float(freqs[self.n_freq - 1]), -waterfall_s, 0.0),
+                                         interpolation="nearest", animated=True)
+        self.ax_fall.set_xlabel("Frequency (Hz)")
+        self.ax_fall.set_ylabel("Time (s)")
+        self.ax_fall.set_title("Spectrogram (dB, channel average)")
+
+        self.lines = [self.ax_strip.plot([], [], label=band, animated=True)[0] for band in self.bands_order]
+        self.ax_strip.set_yscale("log")
+        self.ax_strip.set_xlim(-history_s, 0.0)
+        self.ax_strip.set_ylim(1e-2, 1e2)
+        self.ax_strip.set_xlabel("Time (s)")
+        self.ax_strip.set_ylabel("Band power")
+        self.ax_strip.legend(loc="upper left", ncol=len(self.bands_order), fontsize="small")
+        self.fig.tight_layout()
+
+        self.artists = {self.ax_bars: list(self.bars), self.ax_fall: [self.image], self.ax_strip: self.lines}
+        self.canvas = self.fig.canvas
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        plt.show(block=False)
+        self._redraw()
+
+    def _on_draw(self, event):
+        # Full draws (first show, resize, rescale) refresh the cached backgrounds
+        for ax, artists in self.artists.items():
+            self.backgrounds[ax] = self.canvas.copy_from_bbox(ax.bbox)
+            for artist in artists:
+                ax.draw_artist(artist)
 
-            eeg = data[eeg_chs, :]
-            eeg = remove_dc_offset(eeg)
-            bands = compute_band_powers(eeg, sfreq)
-            # Average across channels
-            avg_values = np.array([bands[b].mean() for b in bands_order])
+    def _blit(self, axes):
+        for ax in axes:
+            self.canvas.restore_region(self.backgrounds[ax])
+            for artist in self.artists[ax]:
+                ax.draw_artist(artist)
+            self.canvas.blit(ax.bbox)
 
-            # Update plot scaling smoothly
-            cur_max = max(avg_values.max(), 1e-6)
-            prev_top = ax.get_ylim()[1]
-            new_top = max(prev_top * 0.9 + cur_max * 0.2, cur_max * 1.2)
-            ax.set_ylim(0, new_top)
+    def _redraw(self):
+        self.full_redraws += 1
+        self.canvas.draw()
 
-            for i, bar in enumerate(bars):
-                bar.set_height(avg_values[i])
+    def _rescale(self, band_avg, strip_values):
+        """Adjusts axis ranges that no longer fit; True if a full redraw is needed."""
+        changed = False
+        top = self.ax_bars.get_ylim()[1]
+        peak = max(float(band_avg.max()), 1e-6)
+        # Grow at once, shrink only after the recent maximum stayed low (blinks spike delta)
+        recent = max(float(self.history.filled()[-self.recent_n:].max()), 1e-6)
+        if peak > top or recent < top / 4:
+            self.ax_bars.set_ylim(0, max(peak, recent) * 2)
+            changed = True
+        if strip_values.size:
+            low, high = self.ax_strip.get_ylim()
+            vmin = max(float(strip_values.min()), 1e-9)
+            vmax = max(float(strip_values.max()), vmin * 10)
+            if vmin < low or vmax > high or vmax < high / 100:
+                self.ax_strip.set_ylim(vmin / 2, vmax * 2)
+                changed = True
+        return changed
 
-            fig.canvas.draw()
-            fig.canvas.flush_events()
-            time.sleep(dt)
+    def update(self, t, band_avg, psd_avg):
+        """
+        Adds one tick and redraws.
+
+        Args:
+            t (float): Time of the tick in seconds (any monotonic clock).
+            band_avg (numpy.ndarray): Channel-averaged band powers in bands_order.
+            psd_avg (numpy.ndarray): Channel-averaged PSD over the figure's frequencies.
+        """
+        self.history.push(band_avg)
+        self.times.push(t)
+        for bar, value in zip(self.bars, band_avg):
+            bar.set_height(value)
+
+        new_row = self.next_row is None or t >= self.next_row
+        if new_row:
+            self.next_row = max(t, (self.next_row or t) + self.row_period)
+            row = 10.0 * np.log10(np.maximum(psd_avg[:self.n_freq], 1e-12))
+            self.waterfall.push(row)
+            self.image.set_data(self.waterfall.window())
+            vmax = float(row.max())
+            low, high = self.image.get_clim()
+            if not np.isfinite(high) or vmax > high or vmax < high - 20:
+                self.image.set_clim(vmax - 50, vmax + 3)
+        index, values = minmax_decimate(self.history.filled(), self.strip_columns)
+        x = self.times.filled()[index] - t
+        for j, line in enumerate(self.lines):
+            line.set_data(x, values[:, j])
+
+        if not self.backgrounds or self._rescale(band_avg, values):
+            self._redraw()
+        else:
+            self._blit((self.ax_bars, self.ax_strip, self.ax_fall) if new_row else (self.ax_bars, self.ax_strip))
+        self.canvas.flush_events()
+
+
+def _bus_frame(client, bands_order):
+    """Channel-averaged band powers, freqs and PSD from the spectral bus, or None without a tick."""
+    if not client.streaming:
+        return None
+    frame = client.read(("band_power", "freqs", "psd"))
+    if frame is None or frame["tick"] == 0:
+        return None
+    avg = frame["band_power"].mean(axis=0)
+    band_avg = np.array([avg[client.band_names.index(b)] if b in client.band_names else 0.0 for b in bands_order])
+    return band_avg, frame["freqs"], frame["psd"].mean(axis=0)
+
+
+def _acquisition_worker(results, stop, source, refresh_hz, window_seconds, options):
+    """
+    Worker process: owns the data source and the DSP, and puts (seq, time, band_avg, freqs,
+    psd_avg) on the bounded results queue at refresh_hz. When the GUI falls behind and the
+    queue is full, the result is dropped (its seq still advances, so the GUI can count it)
+    rather than delaying acquisition.
+    """
+    import queue
+
+    bands_order = BANDS_ORDER
+    if source == "bus":
+        # The board and the PSD live in a `spectral_bus.py publish` process (shared with the game)
+        from spectral_bus import SpectralBusClient
+        setup = SpectralBusClient(options["bus"])
+    else:
+        if source == "synthetic":
+            from synthetic_eeg import SyntheticBoardSetup
+            setup = SyntheticBoardSetup(num_channels=options["num_channels"], seed=0, name="Synthetic")
+        else:
+            import brainflow
+            from brainflow_stream import BrainFlowBoardSetup
+
+            board_id = brainflow.BoardIds.CYTON_BOARD.value
+            setup = BrainFlowBoardSetup(board_id=board_id, serial_port=options["serial_port"], name="Cyton")
+        setup.setup()
+
+        sfreq = setup.get_sampling_rate()
+        if not sfreq:
+            print("Failed to get sampling rate; exiting.")
+            results.put(None)
+            return
+
+        eeg_chs = getattr(setup, "eeg_channels", []) or []
+        if not eeg_chs:
+            # Fallback for Cyton typical layout if descriptor lookup failed
+            eeg_chs = list(range(1, 9))
+        samples_needed = max(int(window_seconds * sfreq), 64)
+        # Give the stream a moment to buffer
+        stop.wait(max(0.5, window_seconds))
+
+    dt = 1.0 / refresh_hz
+    seq = 0
+    next_frame = time.perf_counter()
+    try:
+        while not stop.is_set():
+            result = None
+            if source == "bus":
+                result = _bus_frame(setup, bands_order)
+            else:
+                data = setup.get_current_board_data(num_samples=samples_needed)
+                # Data shape may not be as expected yet while the buffer fills
+                if data is not None and data.size > 0 and data.shape[1] >= 8 and max(eeg_chs) < data.shape[0]:
+                    freqs, psd, powers = psd_band_powers(data[eeg_chs, :], sfreq)
+                    # Average across channels
+                    result = powers.mean(axis=0), freqs, psd.mean(axis=0)
+            if result is not None:
+                seq += 1
+                try:
+                    results.put_nowait((seq, time.perf_counter(), *result))
+                except queue.Full:
+                    pass
+            # Fixed-rate schedule: time spent fetching and computing comes out of the wait
+            next_frame += dt
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                stop.wait(delay)
+            else:
+                next_frame = time.perf_counter()
     except KeyboardInterrupt:
         pass
     finally:
         setup.stop()
-        plt.ioff()
-        plt.show()
+
+
+def main(serial_port: str = None, window_seconds: int = 2, refresh_hz: float = 30.0, bus: str = None,
+         synthetic: bool = False, num_channels: int = 8, history_s: float = 600.0, duration_s: float = None,
+         report_s: float = 5.0, queue_size: int = 4):
+    """
+    Runs acquisition and DSP in a worker process and renders the newest result in this one,
+    so a slow redraw never delays polling the board. Prints achieved vs requested fps and the
+    number of results that were computed but never drawn every report_s seconds.
+    """
+    import multiprocessing
+    import queue
+
+    import matplotlib.pyplot as plt
+
+    source = "bus" if bus else "synthetic" if synthetic else "board"
+    context = multiprocessing.get_context("spawn")  # same behavior on Windows, macOS and Linux
+    results = context.Queue(maxsize=queue_size)
+    stop = context.Event()
+    worker = context.Process(target=_acquisition_worker, name="bandpower-acquisition", daemon=True,
+                             args=(results, stop, source, refresh_hz, window_seconds,
+                                   {"bus": bus, "serial_port": serial_port, "num_channels": num_channels}))
+    worker.start()
+
+    view = None  # built on the first result, once the PSD frequencies are known
+    rendered = first_seq = last_seq = 0
+    report_rendered = report_seq = 0
+    t_first = t_report = None
+    t_start = time.perf_counter()
+
+    def report(t_from, frames, produced, final=False):
+        elapsed = time.perf_counter() - t_from
+        if elapsed > 0 and frames > 0:
+            print(f"{'total' if final else 'last ' + format(elapsed, '.0f') + ' s'}: "
+                  f"{frames / elapsed:.1f} fps (requested {refresh_hz:g}), "
+                  f"{produced - frames} dropped updates, {view.full_redraws} full redraws", flush=True)
+
+    try:
+        while duration_s is None or time.perf_counter() - t_start < duration_s:
+            try:
+                item = results.get(timeout=0.5)
+                while True:  # keep only the newest result; older ones are dropped updates
+                    try:
+                        item = results.get_nowait()
+                    except queue.Empty:
+                        break
+            except queue.Empty:
+                if not worker.is_alive():
+                    break
+                continue
+            if item is None:
+                break
+            seq, t, band_avg, freqs, psd_avg = item
+            if view is None:
+                title = f"spectral bus {bus}" if bus else f"{num_channels} synthetic channels" if synthetic else "Cyton"
+                view = BandPowerFigure(freqs, BANDS_ORDER, refresh_hz, history_s=history_s,
+                                       title=f"Real-time EEG Band Powers ({title})")
+                t_first = t_report = time.perf_counter()
+                first_seq = report_seq = seq
+                report_rendered = 1
+            view.update(t, band_avg, psd_avg)
+            rendered += 1
+            last_seq = seq
+            if time.perf_counter() - t_report >= report_s:
+                report(t_report, rendered - report_rendered, last_seq - report_seq)
+                t_report, report_rendered, report_seq = time.perf_counter(), rendered, last_seq
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if view is not None:
+            report(t_first, rendered - 1, last_seq - first_seq, final=True)
+        worker.join(timeout=3.0)
+        if worker.is_alive():
+            worker.terminate()
+        if view is not None and duration_s is None:
+            plt.ioff()
+            plt.show()
 
 
 if __name__ == "__main__":
@@ -114,7 +447,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Real-time band power visualization for OpenBCI Cyton")
     parser.add_argument("--port", type=str, default=None, help="Serial port like \\ \\.\\COM3 (Windows) or /dev/ttyUSB0 (Linux)")
     parser.add_argument("--window", type=float, default=2.0, help="Window length in seconds for PSD")
-    parser.add_argument("--fps", type=float, default=5.0, help="Refresh rate (updates per second)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Refresh rate (updates per second)")
+    parser.add_argument("--history", type=float, default=600.0, help="Seconds of band-power history in the strip chart")
+    parser.add_argument("--bus", type=str, default=None, metavar="NAME",
+                        help="Plot band powers from a 'spectral_bus.py publish' process instead of opening the board")
+    parser.add_argument("--synthetic", action="store_true", help="Plot synthetic EEG (see synthetic_eeg.py)")
+    parser.add_argument("--channels", type=int, default=8, help="Channels of the synthetic board")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--report", type=float, default=5.0, help="Seconds between fps / dropped-update reports")
     args = parser.parse_args()
 
-    main(serial_port=args.port, window_seconds=int(args.window), refresh_hz=args.fps)
+    main(serial_port=args.port, window_seconds=int(args.window), refresh_hz=args.fps, bus=args.bus,
+         synthetic=args.synthetic, num_channels=args.channels, history_s=args.history, duration_s=args.duration,
+         report_s=args.report)
@@ -1,33 +1,71 @@
+import time
+_PROCESS_T0 = time.perf_counter()  # startup benchmark reference, taken before the heavy imports
 import sys
 import random
 import pygame
 import math
 import os
-import time
+import functools
+import gc
+import threading
+import tracemalloc
 import numpy as np
-import brainflow_stream
-
-# Optional BrainFlow import (graceful fallback if unavailable)
-EEG_AVAILABLE = False
+from game_physics import SCALE_FAR, SCALE_NEAR, SCALE_GAMMA, MAX_MULT, project_to_screen
+from game_sim import GameSimulation, TestRatioSource, InputLog
+from traffic import ONCOMING, TRAILING
+from board_connection import BoardConnectionManager, STREAMING
+from eeg_markers import marker_name
+from eeg_features import FEATURES, FeatureExtractor
+from perf_overlay import FrameProfiler, FrameTimers, PerfOverlay
+from quality_governor import QUALITY_NAMES, QUALITY_TIERS, QualityGovernor
+from net_game import DEFAULT_PORT, KEY_LEFT, KEY_RIGHT, GameClient
+
+# Optional BrainFlow import (graceful fallback if unavailable). Importing BrainFlow and
+# pyserial costs a noticeable slice of cold start, so it happens on first use, normally on
+# the startup loader thread while the start screen is already up.
+EEG_AVAILABLE = None  # unknown until _load_eeg_backend() has run
 BrainFlowBoardSetup = None
 BoardIds = None
-try:
-    _this_dir = os.path.dirname(os.path.abspath(__file__))
-    _parent_dir = os.path.abspath(os.path.join(_this_dir, os.pardir))
-    if _parent_dir not in sys.path:
-        sys.path.insert(0, _parent_dir)
-    from brainflow_stream import BrainFlowBoardSetup  # uses your repo helper
-    import brainflow
-    from brainflow.board_shim import BoardIds  # correct enum import
-    EEG_AVAILABLE = True
-except Exception:
-    BrainFlowBoardSetup = None
-    BoardIds = None
-    EEG_AVAILABLE = False
+
+def _load_eeg_backend():
+    global EEG_AVAILABLE, BrainFlowBoardSetup, BoardIds
+    if EEG_AVAILABLE is None:
+        try:
+            _this_dir = os.path.dirname(os.path.abspath(__file__))
+            _parent_dir = os.path.abspath(os.path.join(_this_dir, os.pardir))
+            if _parent_dir not in sys.path:
+                sys.path.insert(0, _parent_dir)
+            from brainflow_stream import BrainFlowBoardSetup  # uses your repo helper
+            from brainflow.board_shim import BoardIds  # correct enum import
+            EEG_AVAILABLE = True
+        except Exception:
+            BrainFlowBoardSetup = None
+            BoardIds = None
+            EEG_AVAILABLE = False
+    return EEG_AVAILABLE
 
 WIDTH, HEIGHT = 640, 480
 FPS = 60
 
+# Automatic GC is off during play; generation 0 is collected at light changes and game
+# over, or early if this many container allocations pile up in between
+GC_GEN0_LIMIT = 20000
+# --alloc-check budgets (tracemalloc bytes). The frame budget is ~1.5x the worst frame seen
+# (16-18 KB with synthetic EEG, ~8 KB for a bare GameSimulation.step). Growth is measured
+# with pending garbage collected at both ends; new sprite scale and layer cache entries get
+# ALLOC_CACHE_ENTRY_BYTES each (~230 B measured: Surface object, key and dict slot; pixels
+# live in SDL memory), and everything else must fit in ALLOC_GROWTH_BUDGET. That residual is
+# ~1.5x the worst seen (up to ~32 KB, mostly numpy's small-buffer cache holding freed temporaries).
+# The first EEG tick on a full window builds the feature extractor's Welch buffers once
+# (~150 KB for 8 ch x 2 s at 250 Hz). That setup is budgeted separately: measurement starts
+# after it, or after ALLOC_EEG_WAIT_FRAMES more frames if the board never delivers a window.
+# Later ticks reuse the buffers and count against the per-frame budget like any frame.
+ALLOC_WARMUP_FRAMES = 120
+ALLOC_EEG_WAIT_FRAMES = 600
+ALLOC_FRAME_PEAK_BUDGET = 24 * 1024
+ALLOC_GROWTH_BUDGET = 48 * 1024
+ALLOC_CACHE_ENTRY_BYTES = 256
+
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (220, 30, 30)
@@ -41,11 +79,12 @@ ORANGE = (255, 140, 0)
 GRAY = (200, 200, 200)
 P1_ACCENT = (90, 150, 255)
 P2_ACCENT = (255, 120, 120)
-
-# Perspective scaling controls
-SCALE_FAR = 0.35  # size at horizon
-SCALE_NEAR = 1.35  # size near bottom
-SCALE_GAMMA = 1.15  # >1 exaggerates shrinking near horizon
+PLAYER_ACCENTS = [
+    P1_ACCENT, P2_ACCENT, (120, 220, 120), (240, 200, 80),
+    (200, 120, 255), (80, 220, 220), (255, 160, 60), (160, 160, 160),
+]
+MAX_PLAYERS = 16
+PLAYER_LABELS = [f"P{i + 1}" for i in range(MAX_PLAYERS)]
 
 # Optional PNG chicken data
 CHICKEN_IMG = None
@@ -56,95 +95,127 @@ CAR_IMG = None  # legacy single image fallback
 CAR_IMG_FRONT = None
 CAR_IMG_BACK = None
 _CAR_IMG_SCALE_CACHE = {}
+# [hits, misses] of the sprite scale caches and pre-rendered layer frames, for the performance overlay
+_SCALE_CACHE_STATS = {"chicken": [0, 0], "car": [0, 0], "layer": [0, 0]}
+# smoothscale sprites (False at low quality tiers: nearest-neighbor scale is much cheaper)
+_SMOOTH_SPRITES = True
+
+def _scale_sprite(img, size):
+    if _SMOOTH_SPRITES:
+        try:
+            return pygame.transform.smoothscale(img, size)
+        except Exception:
+            pass
+    return pygame.transform.scale(img, size)
+
+def set_sprite_smoothing(smooth):
+    global _SMOOTH_SPRITES
+    if smooth != _SMOOTH_SPRITES:
+        _SMOOTH_SPRITES = smooth
+        _IMG_SCALE_CACHE.clear()
+        _CAR_IMG_SCALE_CACHE.clear()
 
 # ---------------- EEG utilities (restored for real data) ---------------- #
 
 def _remove_dc_offset(eeg_data: np.ndarray) -> np.ndarray:
     return eeg_data - np.mean(eeg_data, axis=1, keepdims=True)
 
-try:
-    from scipy.signal import welch
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
-    welch = None
+# One extractor per (bands, nperseg): the PSD is computed once per tick and every feature
+# (alpha/beta ratio, band averages, whatever P1 is mapped to) is derived from it
+_FEATURE_EXTRACTORS = {}
+
+def _feature_extractor(features, bands=None, nperseg=1024):
+    key = (tuple(features), tuple(sorted((bands or {}).items())), nperseg)
+    extractor = _FEATURE_EXTRACTORS.get(key)
+    if extractor is None:
+        extractor = _FEATURE_EXTRACTORS[key] = FeatureExtractor(features, bands=bands, nperseg=nperseg)
+    return extractor
+
+def _eeg_window_features(eeg, extractor, buf=None, window_s=2.0):
+    """
+    One P1 EEG tick: the newest window of the board's EEG rows and every feature of
+    extractor from one PSD.
+
+    Only full windows are analyzed, so the extractor keeps a single set of Welch buffers
+    for the window shape; each Welch segment is detrended, so there is no separate DC
+    removal pass.
+
+    Args:
+        eeg (BoardConnectionManager): Streaming board.
+        extractor (FeatureExtractor): Features to compute.
+        buf (numpy.ndarray, optional): Window buffer from the previous call, reused while
+            the channel count and sampling rate stay the same.
+        window_s (float): Window length in seconds.
+
+    Returns:
+        tuple: (dict of feature values, or None until a full window is buffered; buf).
+    """
+    sfreq = eeg.sampling_rate
+    shape = (len(eeg.eeg_channels), max(int(window_s * sfreq), 64))
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=eeg.eeg_dtype)
+    eeg_data = eeg.get_current_eeg(shape[1], out=buf)
+    if eeg_data is None or eeg_data.shape[1] != shape[1]:
+        return None, buf
+    return extractor.compute(eeg_data, sfreq), buf
 
 def _band_power_ratio_fft(eeg_data, sfreq, bands=None, nperseg=1024):
     """
     Compute a single scalar: the alpha:beta power ratio averaged across all channels
     using Welch's method.
     """
-    if not SCIPY_AVAILABLE:
-        return 1.0, 1.0, 1.0  # fallback if scipy not available (ratio, alpha_avg, beta_avg)
-        
-    if bands is None:
-        bands = {
-            "delta": (1, 4),
-            "theta": (4, 8),
-            "alpha": (8, 12),
-            "beta": (12, 30),
-            "gamma": (30, 100),
-        }
-
-    alpha_band = bands.get("alpha", (8, 12))
-    beta_band = bands.get("beta", (12, 30))
-
     eeg = np.asarray(eeg_data)
     if eeg.ndim == 1:
         eeg = eeg[None, :]  # (1, n_samples)
-
-    nperseg = int(min(nperseg, eeg.shape[1])) if eeg.shape[1] > 0 else 0
-    if nperseg <= 1 or sfreq <= 0:
+    if eeg.shape[1] <= 1 or sfreq <= 0:
         return 1.0, 1.0, 1.0
 
-    freqs, psd = welch(eeg, fs=sfreq, nperseg=nperseg, axis=1)  # psd: (n_channels, n_freqs)
-
-    def band_power(low, high):
-        mask = (freqs >= low) & (freqs <= high)
-        if not np.any(mask):
-            return np.zeros(psd.shape[0], dtype=float)
-        return np.trapezoid(psd[:, mask], freqs[mask], axis=1)
+    values = _feature_extractor(("alpha_beta", "alpha", "beta"), bands, nperseg).compute(eeg, sfreq)
+    return values["alpha_beta"], values["alpha"], values["beta"]
 
-    alpha_power = band_power(*alpha_band)
-    beta_power = band_power(*beta_band)
-
-    # Calculate averages across channels
-    alpha_avg = float(np.mean(alpha_power))
-    beta_avg = float(np.mean(beta_power))
-
-    epsilon = 1e-12
-    ratios = alpha_power / (beta_power + epsilon)  # per-channel ratio
-    ratio_avg = float(np.mean(ratios))
-    
-    return ratio_avg, alpha_avg, beta_avg
+def _handle_match_events(events, eeg):
+    """
+    Game events of one tick (GameSimulation.step() or a network MatchView): EEG markers,
+    and a gen-0 collection at light changes and game over, natural pauses in the action.
+    """
+    if eeg is not None:
+        for _, name, value in events:
+            eeg.mark(marker_name(name, value), value)
+    for _, name, _ in events:
+        if name in ("light", "game_over"):
+            gc.collect(0)
+            break
 
 # ---------------- Drawing helpers (copied from v2) ---------------- #
 
+# Lamp layout and glow colors never change, so they live at module level and the glow
+# surfaces are built once per state instead of every frame
+_LIGHT_LAMPS = (("red", RED, DK_RED, 35), ("yellow", YELLOW, DK_YELLOW, 80), ("green", GREEN, DK_GREEN, 125))
+_LIGHT_GLOW_COLORS = {
+    "red": (255, 80, 80, 70),
+    "yellow": (255, 240, 100, 70),
+    "green": (120, 255, 140, 70),
+}
+_LIGHT_GLOW_CACHE = {}
+
+def _light_glow(name):
+    glow = _LIGHT_GLOW_CACHE.get(name)
+    if glow is None:
+        glow = pygame.Surface((140, 140), pygame.SRCALPHA)
+        pygame.draw.circle(glow, _LIGHT_GLOW_COLORS[name], (70, 70), 60)
+        _LIGHT_GLOW_CACHE[name] = glow
+    return glow
+
 def draw_traffic_light(surface, x, y, state):
     pygame.draw.rect(surface, (60, 60, 60), (x + 24, y + 160, 12, 120), border_radius=6)
     pygame.draw.rect(surface, (30, 30, 30), (x, y, 60, 160), border_radius=12)
     pygame.draw.rect(surface, (80, 80, 80), (x, y, 60, 160), width=2, border_radius=12)
     cx = x + 30
-    colors = {
-        "red": RED if state == "red" else DK_RED,
-        "yellow": YELLOW if state == "yellow" else DK_YELLOW,
-        "green": GREEN if state == "green" else DK_GREEN,
-    }
-    positions = {"red": y + 35, "yellow": y + 80, "green": y + 125}
-    pygame.draw.circle(surface, colors["red"], (cx, positions["red"]), 22)
-    pygame.draw.circle(surface, colors["yellow"], (cx, positions["yellow"]), 22)
-    pygame.draw.circle(surface, colors["green"], (cx, positions["green"]), 22)
-    active = state
-    if active in ("red", "yellow", "green"):
-        glow_color = {
-            "red": (255, 80, 80, 70),
-            "yellow": (255, 240, 100, 70),
-            "green": (120, 255, 140, 70),
-        }[active]
-        glow = pygame.Surface((140, 140), pygame.SRCALPHA)
-        pygame.draw.circle(glow, glow_color, (70, 70), 60)
-        gy = positions[active] - 70
-        surface.blit(glow, (cx - 70, gy), special_flags=pygame.BLEND_ADD)
+    for name, lit, dark, dy in _LIGHT_LAMPS:
+        pygame.draw.circle(surface, lit if state == name else dark, (cx, y + dy), 22)
+    for name, _, _, dy in _LIGHT_LAMPS:
+        if state == name:
+            surface.blit(_light_glow(name), (cx - 70, y + dy - 70), special_flags=pygame.BLEND_ADD)
 
 def draw_background(surface):
     top = (180, 210, 255)
@@ -167,16 +238,74 @@ def draw_cloud(surface, x, y, scale=1.0):
     for cx, cy in c:
         pygame.draw.circle(surface, color, (int(cx), int(cy)), r)
 
+_FOG_CACHE = {}
+
 def draw_horizon_fog(surface, horizon_y):
     fog_h = int(HEIGHT * 0.35)
-    fog = pygame.Surface((WIDTH, fog_h), pygame.SRCALPHA)
-    for i in range(fog_h):
-        t = i / max(1, fog_h)
-        alpha = int(90 * (1 - t))
-        pygame.draw.rect(fog, (255, 255, 255, alpha), (0, i, WIDTH, 1))
+    fog = _FOG_CACHE.get((WIDTH, fog_h))
+    if fog is None:
+        fog = pygame.Surface((WIDTH, fog_h), pygame.SRCALPHA)
+        for i in range(fog_h):
+            t = i / max(1, fog_h)
+            alpha = int(90 * (1 - t))
+            pygame.draw.rect(fog, (255, 255, 255, alpha), (0, i, WIDTH, 1))
+        _FOG_CACHE.clear()
+        _FOG_CACHE[(WIDTH, fog_h)] = fog
     surface.blit(fog, (0, horizon_y))
 
-def draw_road(surface, horizon_y, center_tilt_x, scroll):
+# Pre-rendered layer frames are drawn on this color and blitted with it as the colorkey
+_LAYER_KEY = (255, 0, 255)
+
+class LayerCycle:
+    """
+    A scrolling layer pre-rendered at evenly spaced points of its scroll period.
+
+    The road and the tree rows only move by a periodic scroll offset, so for one resolution
+    and road tilt only a bounded set of images can appear. Each frame is drawn by
+    draw(surface, scroll) the first time the nearest scroll position comes up. It is cropped
+    to rect and colorkeyed with RLE acceleration, so a blit skips the transparent runs and SDL
+    keeps only the opaque pixels in memory.
+    """
+
+    def __init__(self, draw, frames, period=1.0, rect=None):
+        self.draw = draw
+        self.period = period
+        self.rect = pygame.Rect(rect or (0, 0, WIDTH, HEIGHT))
+        self.frames = [None] * max(1, int(frames))
+
+    def frame(self, scroll):
+        n = len(self.frames)
+        k = int(round((scroll % self.period) / self.period * n)) % n
+        surf = self.frames[k]
+        if surf is None:
+            _SCALE_CACHE_STATS["layer"][1] += 1
+            full = pygame.Surface((WIDTH, HEIGHT))
+            full.fill(_LAYER_KEY)
+            self.draw(full, k * self.period / n)
+            surf = full.subsurface(self.rect).copy()
+            surf.set_colorkey(_LAYER_KEY, pygame.RLEACCEL)
+            self.frames[k] = surf
+        else:
+            _SCALE_CACHE_STATS["layer"][0] += 1
+        return surf
+
+    def blit(self, surface, scroll):
+        surface.blit(self.frame(scroll), self.rect)
+
+_LAYER_CYCLES = {}
+
+def _layer_cycle(key, frames, period, rect, draw, *args):
+    # One cycle per layer, resolution and geometry; a handful at most (quality tiers change
+    # the stripe and row counts), so the cache simply starts over when it fills up
+    key = (WIDTH, HEIGHT, frames) + key
+    cycle = _LAYER_CYCLES.get(key)
+    if cycle is None:
+        if len(_LAYER_CYCLES) >= 8:
+            _LAYER_CYCLES.clear()
+        cycle = _LAYER_CYCLES[key] = LayerCycle(functools.partial(draw, *args), frames, period, rect)
+    return cycle
+
+def draw_road(surface, horizon_y, center_tilt_x, scroll, segments=16):
     bottom_width = int(WIDTH * 0.8)
     top_width = int(WIDTH * 0.2)
     bottom_y = HEIGHT
@@ -190,8 +319,20 @@ def draw_road(surface, horizon_y, center_tilt_x, scroll):
         (center_bottom - bottom_width // 2, bottom_y),
     ]
     pygame.draw.polygon(surface, color_road, pts)
+    # The stripes come from a LayerCycle cropped to the center line; the road itself stays a
+    # live polygon fill, which is as cheap as a blit and would cost a full road of pixels per
+    # cached frame. The pattern repeats every 1/segments of scroll, and one frame per pixel
+    # the nearest stripe moves in that time keeps the motion as smooth as drawing it live.
+    frames = max(1, math.ceil((HEIGHT - horizon_y) / segments))
+    left = min(center_top, center_bottom) - 8
+    rect = (left, horizon_y, abs(center_top - center_bottom) + 16, HEIGHT - horizon_y)
+    _layer_cycle(("stripes", horizon_y, center_tilt_x, segments), frames, 1.0 / segments, rect,
+                 _draw_road_stripes, horizon_y, center_tilt_x, segments).blit(surface, scroll)
+
+def _draw_road_stripes(horizon_y, center_tilt_x, segments, surface, scroll):
+    center_bottom = WIDTH // 2
+    center_top = int(WIDTH * 0.5 + center_tilt_x)
     line_color = (230, 230, 230)
-    segments = 16
     for i in range(segments):
         v = (i / segments + scroll) % 1.0
         y0 = int(horizon_y + (HEIGHT - horizon_y) * v)
@@ -210,15 +351,15 @@ def draw_car(surface, sx, sy, v, lane_halfw, color_body=(180, 30, 30), img=None)
         cache_key = (img_id, int(car_w))
         scaled = _CAR_IMG_SCALE_CACHE.get(cache_key)
         if scaled is None:
+            _SCALE_CACHE_STATS["car"][1] += 1
             orig_w, orig_h = img.get_width(), img.get_height()
             car_h = max(8, int(orig_h * (car_w / max(1, orig_w))))
-            try:
-                scaled = pygame.transform.smoothscale(img, (int(car_w), int(car_h)))
-            except Exception:
-                scaled = pygame.transform.scale(img, (int(car_w), int(car_h)))
+            scaled = _scale_sprite(img, (int(car_w), int(car_h)))
             _CAR_IMG_SCALE_CACHE[cache_key] = scaled
             if len(_CAR_IMG_SCALE_CACHE) > 256:
                 _CAR_IMG_SCALE_CACHE.clear()
+        else:
+            _SCALE_CACHE_STATS["car"][0] += 1
         surface.blit(scaled, (int(sx - scaled.get_width() // 2), int(sy - scaled.get_height())))
         return
     car_w = lane_w
@@ -229,12 +370,43 @@ def draw_car(surface, sx, sy, v, lane_halfw, color_body=(180, 30, 30), img=None)
     if w.height > 0 and w.width > 0:
         pygame.draw.rect(surface, (230, 230, 230), w, border_radius=max(2, int(4 * v)))
 
-def draw_side_scenery(surface, horizon_y, road_tilt, scroll):
+def _prand(n: int, salt: int = 0) -> float:
+    return (math.sin(n * 127.1 + salt * 311.7) * 43758.5453) % 1.0
+
+def _draw_tree(surface, x, y, sc):
+    trunk_h = max(10, int(28 * sc))
+    trunk_w = max(3, int(6 * sc))
+    pygame.draw.rect(surface, (110, 80, 50), (x - trunk_w // 2, y - trunk_h, trunk_w, trunk_h))
+    leaf_r = max(8, int(16 * sc))
+    leaf_color = (50, 120, 60)
+    pygame.draw.circle(surface, leaf_color, (x, y - trunk_h - int(leaf_r * 0.2)), leaf_r)
+    pygame.draw.circle(surface, leaf_color, (x - leaf_r, y - trunk_h), int(leaf_r * 0.8))
+    pygame.draw.circle(surface, leaf_color, (x + leaf_r, y - trunk_h), int(leaf_r * 0.8))
+
+_SCENERY_FRACS = (0.12, 0.28, 0.45, 0.62, 0.78, 0.92)
+
+def _scenery_row(row_idx):
+    # Tree layout per row is a pure function of the row index: which slots hold a tree
+    # on each side, and the horizontal jitter of each slot
+    maskL = int(_prand(row_idx, 101) * (1 << len(_SCENERY_FRACS)))
+    maskR = int(_prand(row_idx, 202) * (1 << len(_SCENERY_FRACS)))
+    if maskL == 0:
+        maskL = 0b001010
+    if maskR == 0:
+        maskR = 0b010100
+    left = tuple((f, int((_prand(row_idx * 17 + k, 303) - 0.5) * 12)) for k, f in enumerate(_SCENERY_FRACS) if (maskL >> k) & 1)
+    right = tuple((f, int((_prand(row_idx * 19 + k, 404) - 0.5) * 12)) for k, f in enumerate(_SCENERY_FRACS) if (maskR >> k) & 1)
+    return left, right
+
+_SCENERY_ROWS = tuple(_scenery_row(i) for i in range(64))
+
+def draw_side_scenery(surface, horizon_y, road_tilt, scroll, segments=24, frames=0):
+    # frames > 0 draws the tree rows from a LayerCycle. Row layouts travel with their row, so
+    # the period is the whole scroll range and the cycle trades smoothness for draw time
     bottom_width = int(WIDTH * 0.8)
     top_width = int(WIDTH * 0.2)
     center_bottom = WIDTH // 2
     center_top = int(WIDTH * 0.5 + road_tilt)
-    segments = 24
     left_top = (center_top - top_width // 2, horizon_y)
     left_bottom = (center_bottom - bottom_width // 2, HEIGHT)
     right_top = (center_top + top_width // 2, horizon_y)
@@ -243,57 +415,39 @@ def draw_side_scenery(surface, horizon_y, road_tilt, scroll):
     grass_right = (76, 135, 85)
     pygame.draw.polygon(surface, grass_left, [(0, horizon_y), left_top, left_bottom, (0, HEIGHT)])
     pygame.draw.polygon(surface, grass_right, [right_top, (WIDTH, horizon_y), (WIDTH, HEIGHT), right_bottom])
+    if frames:
+        _layer_cycle(("trees", horizon_y, road_tilt, segments), frames, 1.0, None,
+                     _draw_trees, horizon_y, road_tilt, segments).blit(surface, scroll)
+    else:
+        _draw_trees(horizon_y, road_tilt, segments, surface, scroll)
 
-    def draw_tree(x, y, sc):
-        trunk_h = max(10, int(28 * sc))
-        trunk_w = max(3, int(6 * sc))
-        pygame.draw.rect(surface, (110, 80, 50), (x - trunk_w // 2, y - trunk_h, trunk_w, trunk_h))
-        leaf_r = max(8, int(16 * sc))
-        leaf_color = (50, 120, 60)
-        pygame.draw.circle(surface, leaf_color, (x, y - trunk_h - int(leaf_r * 0.2)), leaf_r)
-        pygame.draw.circle(surface, leaf_color, (x - leaf_r, y - trunk_h), int(leaf_r * 0.8))
-        pygame.draw.circle(surface, leaf_color, (x + leaf_r, y - trunk_h), int(leaf_r * 0.8))
-
-    def prand(n: int, salt: int = 0) -> float:
-        return (math.sin(n * 127.1 + salt * 311.7) * 43758.5453) % 1.0
-
-    fracs = [0.12, 0.28, 0.45, 0.62, 0.78, 0.92]
-
+def _draw_trees(horizon_y, road_tilt, segments, surface, scroll):
+    bottom_width = int(WIDTH * 0.8)
+    top_width = int(WIDTH * 0.2)
+    center_bottom = WIDTH // 2
+    center_top = int(WIDTH * 0.5 + road_tilt)
+    half_top = top_width * 0.5
+    half_bottom = bottom_width * 0.5
+    left_pad = 16
+    right_pad = 16
     for i in range(segments):
         v = (i / segments + scroll) % 1.0
         y = int(horizon_y + (HEIGHT - horizon_y) * v)
         if y < horizon_y or y > HEIGHT:
             continue
-        half_top = top_width * 0.5
-        half_bottom = bottom_width * 0.5
         halfw = int(half_top * (1 - v) + half_bottom * v)
         cx = int(center_top * (1 - v) + center_bottom * v)
-        left_edge = cx - halfw
-        right_edge = cx + halfw
         margin = max(6, int(halfw * 0.10))
         sc = SCALE_FAR + (SCALE_NEAR - SCALE_FAR) * (v ** SCALE_GAMMA)
-        row_idx = i % 64
-        maskL = int(prand(row_idx, 101) * (1 << len(fracs)))
-        maskR = int(prand(row_idx, 202) * (1 << len(fracs)))
-        if maskL == 0:
-            maskL = 0b001010
-        if maskR == 0:
-            maskR = 0b010100
-        left_pad = 16
-        right_pad = 16
         left_min = left_pad
-        left_max = max(left_min, left_edge - margin)
-        right_min = min(WIDTH - right_pad, right_edge + margin)
+        left_max = max(left_min, cx - halfw - margin)
+        right_min = min(WIDTH - right_pad, cx + halfw + margin)
         right_max = WIDTH - right_pad
-        for k, f in enumerate(fracs):
-            jL = int((prand(row_idx * 17 + k, 303) - 0.5) * 12)
-            jR = int((prand(row_idx * 19 + k, 404) - 0.5) * 12)
-            if (maskL >> k) & 1:
-                gx = int(left_min + f * (left_max - left_min)) + jL
-                draw_tree(gx, y, sc)
-            if (maskR >> k) & 1:
-                gx = int(right_min + f * (right_max - right_min)) + jR
-                draw_tree(gx, y, sc)
+        trees_left, trees_right = _SCENERY_ROWS[i % 64]
+        for f, jitter in trees_left:
+            _draw_tree(surface, int(left_min + f * (left_max - left_min)) + jitter, y, sc)
+        for f, jitter in trees_right:
+            _draw_tree(surface, int(right_min + f * (right_max - right_min)) + jitter, y, sc)
 
 def draw_player(surface, x, y, size, accent_color=None, anim_phase: float = 0.0, moving: bool = False):
     bob = int(size * 0.04 * math.sin(anim_phase * math.tau)) if moving else 0
@@ -303,13 +457,13 @@ def draw_player(surface, x, y, size, accent_color=None, anim_phase: float = 0.0,
         img_key = int(size)
         img = _IMG_SCALE_CACHE.get(img_key)
         if img is None:
-            try:
-                img = pygame.transform.smoothscale(CHICKEN_IMG, (int(size), int(size)))
-            except Exception:
-                img = pygame.transform.scale(CHICKEN_IMG, (int(size), int(size)))
+            _SCALE_CACHE_STATS["chicken"][1] += 1
+            img = _scale_sprite(CHICKEN_IMG, (int(size), int(size)))
             _IMG_SCALE_CACHE[img_key] = img
             if len(_IMG_SCALE_CACHE) > 128:
                 _IMG_SCALE_CACHE.clear()
+        else:
+            _SCALE_CACHE_STATS["chicken"][0] += 1
         surface.blit(img, (x, y - bob))
         return
     yb = y - bob
@@ -353,195 +507,379 @@ def draw_player(surface, x, y, size, accent_color=None, anim_phase: float = 0.0,
         )
         pygame.draw.rect(surface, accent_color, band_rect, border_radius=6)
 
-def show_center_text(screen, text, color, font):
+_TEXT_CACHE = {}
+
+def render_text(font, text, color, slot=None):
+    # HUD strings mostly repeat frame to frame, so keep their rendered surfaces around.
+    # Fixed strings are cached by content; text that keeps changing (timer, live ratios)
+    # names a slot instead, which holds only its latest rendering and re-renders on change.
+    key = (id(font), text, color) if slot is None else (id(font), slot)
+    cached = _TEXT_CACHE.get(key)
+    if cached is not None and cached[0] == text and cached[1] == color:
+        return cached[2]
     msg = font.render(text, True, color)
+    _TEXT_CACHE[key] = (text, color, msg)
+    return msg
+
+def show_center_text(screen, text, color, font):
+    msg = render_text(font, text, color, slot="center")
     rect = msg.get_rect(center=(WIDTH // 2, HEIGHT // 2))
     screen.blit(msg, rect)
 
-def main(serial_port: str = None):
+# draw_world() charges its time to these FrameTimers sections; callers without an overlay
+# get a throwaway timer
+WORLD_SECTIONS = ("scenery", "road", "players", "cars")
+_UNTIMED = FrameTimers(WORLD_SECTIONS, history=1)
+# (num_players, car capacity) -> render scratch: player nudges, screen projection, depth keys
+_WORLD_SCRATCH = {}
+
+def _world_scratch(num_players, capacity):
+    scratch = _WORLD_SCRATCH.get((num_players, capacity))
+    if scratch is None:
+        p_nudge = np.where(np.arange(num_players) % 2 == 0, -0.02, 0.02)
+        p_proj = (np.empty(num_players, dtype=int), np.empty(num_players, dtype=int), np.empty(num_players), np.empty(num_players))
+        scratch = _WORLD_SCRATCH[(num_players, capacity)] = (p_nudge, p_proj, np.empty(num_players + capacity))
+    return scratch
+
+def draw_world(screen, sim, font_small, q=QUALITY_TIERS[0], perf=None):
+    """
+    Draws one frame of the match world: sky, scenery, road, traffic light, players and cars.
+
+    Args:
+        screen (pygame.Surface): Target, sized like the simulation (WIDTH x HEIGHT).
+        sim: GameSimulation, or anything with the same camera_y, light_state, elapsed_ms,
+            scroll/cloud offsets, road, players, traffic and num_players attributes
+            (net_game.MatchView).
+        font_small (pygame.font.Font): Font of the player labels.
+        q (dict): Quality tier settings (see quality_governor.py).
+        perf (FrameTimers, optional): Timers with the WORLD_SECTIONS sections.
+    """
+    perf = perf if perf is not None else _UNTIMED
+    road = sim.road
+    players = sim.players
+    traffic = sim.traffic
+    num_players = sim.num_players
+    player_size = road.player_size
+    horizon_y = road.horizon_y
+    road_tilt = road.road_tilt
+    p_nudge, p_proj, depth_keys = _world_scratch(num_players, traffic.capacity)
+
+    draw_background(screen)
+    camera_y = sim.camera_y
+    light_state = sim.light_state
+    elapsed_ms = sim.elapsed_ms
+    cloud_dx = int(sim.cloud_off_x)
+    cloud_dy = int(sim.cloud_off_y)
+    if q["clouds"] > 0:
+        draw_cloud(screen, int(WIDTH * 0.15) + cloud_dx, int(HEIGHT * 0.16) + int(cloud_dy * 0.6), 1.2)
+    if q["clouds"] > 1:
+        draw_cloud(screen, int(WIDTH * 0.65) - int(cloud_dx * 0.5), int(HEIGHT * 0.12) + int(cloud_dy * 0.4), 1.4)
+    if q["clouds"] > 2:
+        draw_cloud(screen, int(WIDTH * 0.42) + int(cloud_dx * 0.3), int(HEIGHT * 0.20) + int(cloud_dy * 0.8), 1.0)
+    draw_side_scenery(screen, horizon_y, road_tilt, sim.scenery_scroll, q["scenery_rows"], q["scenery_frames"])
+    perf.lap("scenery")
+    draw_road(screen, horizon_y, road_tilt, sim.road_scroll, q["road_stripes"])
+    if q["fog"]:
+        draw_horizon_fog(screen, horizon_y)
+    draw_traffic_light(screen, WIDTH // 2 - 30, int(HEIGHT * 0.02), light_state)
+    perf.lap("road")
+
+    # Players and cars back-to-front, in one vectorized projection
+    p_sx, p_sy, p_v, p_scale = project_to_screen(players, road, camera_y, p_nudge, out=p_proj)
+    for pid in range(num_players):
+        screen.blit(render_text(font_small, PLAYER_LABELS[pid], PLAYER_ACCENTS[pid % len(PLAYER_ACCENTS)]), (int(p_sx[pid]) - 10, int(p_sy[pid]) - int(player_size * p_scale[pid])))
+    perf.lap("players")
+    car_ids, car_sx, car_sy, car_v, car_lane_halfw = traffic.screen_positions(camera_y)
+    # Entities 0..num_players-1 are players, the rest index into the active cars
+    n_ent = num_players + car_ids.size
+    depth_keys[:num_players] = p_v
+    depth_keys[num_players:n_ent] = car_v
+    moving_light = light_state in ("green", "yellow")
+    anim_t = elapsed_ms / 1000.0
+    perf.lap("cars")
+    for ent in depth_keys[:n_ent].argsort(kind="stable").tolist():
+        if ent < num_players:
+            sc = float(p_scale[ent])
+            mult = float(players.mult[ent])
+            draw_player(screen, int(p_sx[ent]) - int(player_size * sc * 0.5), int(p_sy[ent]) - int(player_size * sc * 0.8), int(player_size * sc), accent_color=PLAYER_ACCENTS[ent % len(PLAYER_ACCENTS)], anim_phase=anim_t * (2.0 + 2.0 * mult), moving=(mult > 0 and moving_light))
+            perf.lap("players")
+            continue
+        k = ent - num_players
+        img = None
+        if traffic.lane[car_ids[k]] == ONCOMING and CAR_IMG_FRONT is not None:
+            img = CAR_IMG_FRONT
+        elif traffic.lane[car_ids[k]] == TRAILING and CAR_IMG_BACK is not None:
+            img = CAR_IMG_BACK
+        elif CAR_IMG is not None:
+            img = CAR_IMG
+        draw_car(screen, int(car_sx[k]), int(car_sy[k]), float(car_v[k]), float(car_lane_halfw[k]), (180, 30, 30), img)
+        perf.lap("cars")
+
+class StartupLoader(threading.Thread):
+    """
+    Loads sprites and imports the EEG stack off the main thread, so the window can show a
+    start screen right away, then hands the board to a BoardConnectionManager that keeps
+    connecting (and reconnecting) in the background.
+
+    Surfaces are only decoded here; convert_alpha() needs the display and happens in
+    finish() on the main thread.
+
+    Attributes:
+        status (str): What the loader is doing right now, for the start screen.
+        images (dict): Decoded sprites by name ("chicken", "car_front", "car_back", "car").
+        eeg (BoardConnectionManager): Board connection, or None without BrainFlow / with --no-eeg.
+            With synthetic_eeg it streams synthetic_eeg.SyntheticBoardSetup instead of a Cyton;
+            with spectral_bus it is a spectral_bus.SpectralBusClient reading another process's DSP.
+    """
+
+    SPRITES = ("chicken", "car_front", "car_back", "car")
+
+    def __init__(self, serial_port=None, use_eeg=True, eeg_options=None, synthetic_eeg=False, seed=None,
+                 spectral_bus=None):
+        super().__init__(name="startup-loader", daemon=True)
+        self.serial_port = serial_port
+        self.use_eeg = use_eeg
+        self.synthetic_eeg = synthetic_eeg
+        self.spectral_bus = spectral_bus
+        self.seed = seed
+        self.eeg_options = dict(eeg_options or {})
+        self.status = "Starting..."
+        self.images = {}
+        self.eeg = None
+
+    def run(self):
+        base_dir = os.path.dirname(__file__)
+        self.status = "Loading sprites..."
+        for name in self.SPRITES:
+            path = os.path.join(base_dir, f"{name}.png")
+            if os.path.isfile(path):
+                try:
+                    self.images[name] = pygame.image.load(path)
+                except Exception:
+                    pass
+        if not self.use_eeg:
+            return
+        self.status = "Loading EEG libraries..."
+        if self.spectral_bus:
+            # The board and the DSP live in a `spectral_bus.py publish` process
+            from spectral_bus import SpectralBusClient
+            self.eeg = SpectralBusClient(self.spectral_bus)
+            return
+        if self.synthetic_eeg:
+            # Same manager, ingest and DSP path as a real board, fed by generated EEG whose
+            # alpha/beta ratio wanders like a player's would
+            from balance_sweep import SyntheticRatios
+            from synthetic_eeg import SYNTHETIC_BOARD_ID, SyntheticBoardSetup
+            factory = functools.partial(SyntheticBoardSetup, seed=self.seed,
+                                        ratio_source=SyntheticRatios(1, np.random.default_rng(self.seed)))
+            self.eeg = BoardConnectionManager(SYNTHETIC_BOARD_ID, name="Synthetic", setup_factory=factory,
+                                              **self.eeg_options).start()
+            return
+        # BrainFlow setup for P1
+        if not _load_eeg_backend():
+            print("BrainFlow not available - using fallback mode")
+            return
+        self.eeg = BoardConnectionManager(BoardIds.CYTON_BOARD.value, serial_port=self.serial_port, name="Cyton",
+                                          **self.eeg_options).start()
+
+    def finish(self):
+        """Converts the loaded sprites for the display (main thread only)."""
+        global CHICKEN_IMG, CAR_IMG, CAR_IMG_FRONT, CAR_IMG_BACK
+        converted = {}
+        for name, img in self.images.items():
+            try:
+                converted[name] = img.convert_alpha()
+            except Exception:
+                pass
+        CHICKEN_IMG = converted.get("chicken")
+        CAR_IMG_FRONT = converted.get("car_front")
+        CAR_IMG_BACK = converted.get("car_back")
+        CAR_IMG = converted.get("car")
+
+def draw_start_screen(screen, font_big, font_small, status, t_ms):
+    draw_background(screen)
+    horizon_y = int(HEIGHT * 0.35)
+    draw_side_scenery(screen, horizon_y, -int(WIDTH * 0.08), 0.0)
+    draw_road(screen, horizon_y, -int(WIDTH * 0.08), (t_ms / 4000.0) % 1.0)
+    draw_horizon_fog(screen, horizon_y)
+    title = render_text(font_big, "Red Light, Green Light", WHITE)
+    screen.blit(title, title.get_rect(center=(WIDTH // 2, int(HEIGHT * 0.18))))
+    dots = "." * (1 + (t_ms // 400) % 3)
+    msg = render_text(font_small, status.rstrip(".") + dots, WHITE, slot="start_status")
+    screen.blit(msg, msg.get_rect(center=(WIDTH // 2, int(HEIGHT * 0.18) + 48)))
+
+def main(serial_port: str = None, num_players: int = 2, hazard: float = 1.0, alloc_check_frames: int = 0,
+         seed: int = None, record_path: str = None, use_eeg: bool = True, startup_benchmark: bool = False,
+         eeg_options: dict = None, synthetic_eeg: bool = False, p1_metric: str = "alpha_beta",
+         spectral_bus: str = None, perf_overlay: bool = False, profile_seconds: float = 10.0,
+         profile_dir: str = ".", quality: str = "auto", connect: str = None, spectate: bool = False):
     pygame.init()
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-    info = pygame.display.Info()
+    # Networked play: the server owns the match, this window renders its snapshots
+    net = None
+    if connect:
+        host, _, port = connect.partition(":")
+        try:
+            net = GameClient((host, int(port or DEFAULT_PORT)), spectate=spectate).connect()
+        except (ConnectionError, OSError) as e:
+            print(f"Could not join {connect}: {e}")
+            pygame.quit()
+            sys.exit(1)
+        use_eeg = use_eeg and not spectate
+    if net is None:
+        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    else:
+        # The match is simulated at the server's resolution; SCALED stretches it to the display
+        net_size = (net.config["width"], net.config["height"])
+        try:
+            screen = pygame.display.set_mode(net_size, pygame.FULLSCREEN | pygame.SCALED)
+        except pygame.error:
+            screen = pygame.display.set_mode(net_size)
     global WIDTH, HEIGHT
-    WIDTH, HEIGHT = info.current_w, info.current_h
+    WIDTH, HEIGHT = screen.get_size()
     pygame.display.set_caption("Red Light Green Light - Real Alpha + Test P2 (Fullscreen)")
     clock = pygame.time.Clock()
 
     font_big = pygame.font.SysFont(None, 56)
     font_small = pygame.font.SysFont(None, 28)
-
-    global CHICKEN_IMG, CAR_IMG, CAR_IMG_FRONT, CAR_IMG_BACK
-    # PNGs
-    png_path = os.path.join(os.path.dirname(__file__), "chicken.png")
-    if os.path.isfile(png_path):
-        try:
-            CHICKEN_IMG = pygame.image.load(png_path).convert_alpha()
-        except Exception:
-            CHICKEN_IMG = None
-    base_dir = os.path.dirname(__file__)
-    car_front_path = os.path.join(base_dir, "car_front.png")
-    car_back_path = os.path.join(base_dir, "car_back.png")
-    car_png_path = os.path.join(base_dir, "car.png")
-    if os.path.isfile(car_front_path):
-        try:
-            CAR_IMG_FRONT = pygame.image.load(car_front_path).convert_alpha()
-        except Exception:
-            CAR_IMG_FRONT = None
-    if os.path.isfile(car_back_path):
-        try:
-            CAR_IMG_BACK = pygame.image.load(car_back_path).convert_alpha()
-        except Exception:
-            CAR_IMG_BACK = None
-    if os.path.isfile(car_png_path):
-        try:
-            CAR_IMG = pygame.image.load(car_png_path).convert_alpha()
-        except Exception:
-            CAR_IMG = None
-
-    # World setup
-    player_size = max(28, int(min(WIDTH, HEIGHT) * 0.06))
-    horizon_y = int(HEIGHT * 0.35)
-    road_tilt = -int(WIDTH * 0.08)
-    road_bottom_width = int(WIDTH * 0.8)
-    road_top_width = int(WIDTH * 0.2)
-    player1_world_x = -player_size * 0.35
-    player2_world_x = player_size * 0.35
-    player1_vx = 0.0
-    player2_vx = 0.0
-    start_world_y = 0.0
-    player1_world_y = start_world_y
-    player2_world_y = start_world_y
-    camera_y = 0.0
-    camera_y_prev = camera_y
-    camera_anchor_screen_y = int(HEIGHT * 0.62)
-    move_step = max(8, int(HEIGHT * 0.02))
-    MOVE_SPEED = max(60, int(move_step * 5))
-    LATERAL_ACCEL_BASE = MOVE_SPEED * 1.4 * 6.0
-    LATERAL_MAX_BASE = MOVE_SPEED * 1.2 * 6.0
-    LATERAL_DRAG = 6.0
-    WALL_BOUNCE = 0.25
-
-    # Cars
-    road_scroll = 0.0
-    cloud_off_x = 0.0
-    cloud_off_y = 0.0
-    scenery_scroll = 0.0
-    car_active = False
-    car_type = None
-    car_world_x = 0.0
-    car_world_y = 0.0
-    car_speed = 0.0
-    car_color = (180, 30, 30)
-    car_spawn_cooldown = 0
-    CAR_MIN_COOLDOWN = 3500
-    CAR_MAX_COOLDOWN = 7000
-    CAR_ONCOMING_SPEED = MOVE_SPEED * 0.55
-    CAR_TRAILING_SPEED = MOVE_SPEED * 0.45
-
-    # Traffic light FSM
-    state_sequence = ["green", "yellow", "red", "yellow"]
-    state_index = 0
-    light_state = state_sequence[state_index]
-    light_timer_ms = 0
-    YELLOW_MS = 800
-    def next_interval_for(state: str) -> int:
-        if state == "yellow":
-            return YELLOW_MS
-        elif state == "green":
-            return random.randint(4000, 8000)  # Extended green: 4-8 seconds
-        else:  # red
-            return random.randint(1500, 3000)  # Keep red duration the same
-    light_interval_ms = next_interval_for(light_state)
+    font_mono = pygame.font.SysFont("monospace", 14)
+
+    # Start screen while sprites, EEG libraries and the board load in the background
+    loader = StartupLoader(serial_port=serial_port, use_eeg=use_eeg, eeg_options=eeg_options,
+                           synthetic_eeg=synthetic_eeg, seed=seed, spectral_bus=spectral_bus)
+    loader.start()
+    first_frame_ms = None
+    while loader.is_alive():
+        clock.tick(FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                sys.exit(0)  # the loader is a daemon thread; a half-open board is released by the OS
+        draw_start_screen(screen, font_big, font_small, loader.status, pygame.time.get_ticks())
+        pygame.display.flip()
+        if first_frame_ms is None:
+            first_frame_ms = (time.perf_counter() - _PROCESS_T0) * 1000.0
+    loader.finish()
+    ready_ms = (time.perf_counter() - _PROCESS_T0) * 1000.0
+    if first_frame_ms is None:
+        first_frame_ms = ready_ms
+
+    # World setup: everything that decides the match lives in the seeded simulation
+    num_players = max(2, min(MAX_PLAYERS, int(num_players)))
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    match_no = 0
+    if net is None:
+        sim = GameSimulation(num_players, seed=seed, width=WIDTH, height=HEIGHT, hazard=hazard)
+        print(f"Match seed: {sim.seed}")
+    else:
+        sim = net.view
+        num_players = sim.num_players
+        print(f"Joined {connect} ({net.status_text()}), match seed {sim.seed}")
+        if record_path:
+            print("--record is ignored when joining a server (record on the server side)")
+            record_path = None
+    players = sim.players
+    # Per-frame inputs: P1 (A/D) and P2 (Left/Right) steer from the keyboard, bots steer themselves
+    steer = np.zeros(num_players, dtype=np.int8)
+    ratios = np.ones(num_players)
+    input_log = InputLog.for_simulation(sim) if record_path else None
 
     running = True
-    game_over = False
-    win = False
-    winner_label = ""
-    elapsed_ms = 0
-
-    # Speed bars
-    current_p1_mult = 0.0
-    current_p2_mult = 0.0
 
-    # P1: Real EEG alpha/beta ratio
-    alpha_ratio_p1 = 1.0  # fallback value
+    # P1: Real EEG alpha/beta ratio (players.ratio[0])
     last_eeg_update_ms = 0
     eeg_refresh_ms = 200
     eeg_accum_ms = 0
-    samples_needed = 0
-
-    # P2: Test random values between 0.1 and 3.0
-    alpha_ratio_p2 = 0.0
-    alpha_ratio_p2_timer = 0
-    alpha_ratio_p2_interval = 1500  # Different interval for P2 to make them independent
-
-    # EEG integration (alpha controls P1)
-    eeg_ready = False
-    eeg_setup = None
-    sfreq = 0
-    eeg_chs = []
-
-    # BrainFlow setup for P1
-    if EEG_AVAILABLE:
-        try:
-            board_id = brainflow.BoardIds.CYTON_BOARD.value
-            eeg_setup = BrainFlowBoardSetup(board_id=board_id, serial_port=serial_port, name="Cyton")
-            eeg_setup.setup()
-            sfreq = eeg_setup.get_sampling_rate() or 0
-            if sfreq > 0:
-                eeg_chs = getattr(eeg_setup, "eeg_channels", []) or list(range(1, 9))
-                samples_needed = max(int(2.0 * sfreq), 64)
-                eeg_ready = True
-                print(f"EEG ready: {sfreq} Hz, channels: {eeg_chs}")
-                print("Alpha/Beta ratio monitoring started...")
-        except Exception as e:
-            print("EEG init failed:", e)
-            eeg_setup = None
-            eeg_ready = False
-    else:
-        print("BrainFlow not available - using fallback mode")
+    eeg_buf = None  # EEG rows only, in the manager's eeg_dtype; reused every refresh
+    eeg_window_ready = False  # a full window went through p1_features (its buffers exist)
+    # P1's speed follows p1_metric; alpha/beta and alpha power still gate the low-signal fallback
+    p1_features = _feature_extractor(tuple(dict.fromkeys(("alpha_beta", "alpha", "beta", p1_metric))))
+
+    # P2 and bots: Test random values between 0.1 and 3.0. P1 uses its own test value
+    # whenever the board is not streaming (connecting, stalled, reconnecting)
+    test_ratios = TestRatioSource(num_players, interval_ms=1500, seed=[sim.seed, 1])
+
+    # EEG integration (alpha controls P1); the connection manager owns the board
+    eeg = loader.eeg
+    eeg_stats_text = ""
+    eeg_update_t = None  # perf_counter() of the last P1 feature update
+    if eeg is not None:
+        eeg.mark("match_start", sim.seed)
+
+    # F3: performance overlay, F10: time-bounded profile of the loop
+    perf = FrameTimers(("input", "eeg", "sim", "scenery", "road", "players", "cars", "hud", "overlay", "flip"))
+    overlay = PerfOverlay(perf, font_mono, _SCALE_CACHE_STATS, budget_ms=1000.0 / FPS, visible=perf_overlay)
+    profiler = FrameProfiler(profile_dir, profile_seconds)
+    # Rendering quality: adapts to the machine unless a tier was picked
+    governor = QualityGovernor(budget_ms=1000.0 / FPS, tier=QUALITY_NAMES.index(quality) if quality != "auto" else 0,
+                               fixed=quality != "auto")
+    q = governor.settings
+    set_sprite_smoothing(q["smooth_sprites"])
+
+    def perf_info():
+        if eeg is None:
+            return {"Quality": governor.name, "EEG": "off"}
+        age = "--" if eeg_update_t is None else f"{(time.perf_counter() - eeg_update_t) * 1000.0:.0f} ms"
+        latency = eeg.stats().get("latency_ms")
+        return {"Quality": governor.name, "EEG": eeg.state, "EEG features age": age,
+                "EEG ingest latency": "--" if latency is None else f"{latency:.0f} ms"}
+
+    def save_input_log():
+        if input_log is None or len(input_log) == 0:
+            return
+        path = record_path if match_no == 0 else f"{os.path.splitext(record_path)[0]}-{match_no + 1}.npz"
+        input_log.save(path)
+        print(f"Recorded {len(input_log)} frames to {path} (seed {input_log.meta['seed']})")
 
     def reset_game():
-        nonlocal player1_world_y, player2_world_y, camera_y, game_over, win, winner_label, elapsed_ms
-        nonlocal state_index, light_state, light_timer_ms, light_interval_ms
-        nonlocal current_p1_mult, current_p2_mult
-        nonlocal camera_y_prev, road_scroll, cloud_off_x, cloud_off_y
-        nonlocal player1_vx, player2_vx
-        nonlocal car_active, car_spawn_cooldown
-        nonlocal alpha_ratio_p1, alpha_ratio_p2, alpha_ratio_p2_timer
-        player1_world_y = start_world_y
-        player2_world_y = start_world_y
-        player1_vx = 0.0
-        player2_vx = 0.0
-        camera_y = 0.0
-        camera_y_prev = camera_y
-        game_over = False
-        win = False
-        winner_label = ""
-        elapsed_ms = 0
-        state_index = 0
-        light_state = state_sequence[state_index]
-        light_timer_ms = 0
-        light_interval_ms = next_interval_for(light_state)
-        current_p1_mult = 0.0
-        current_p2_mult = 0.0
-        road_scroll = 0.0
-        scenery_scroll = 0.0
-        cloud_off_x = 0.0
-        cloud_off_y = 0.0
+        nonlocal match_no, input_log
+        if net is not None:
+            net.request_restart()  # the server restarts once the match is over
+            return
+        save_input_log()
+        match_no += 1
+        sim.reset(seed=seed + match_no)
+        if eeg is not None:
+            eeg.mark("match_start", sim.seed)
+        ratios[0] = 1.0  # P1 back on its fallback until the next EEG read
+        test_ratios.reset()
+        if input_log is not None:
+            input_log = InputLog.for_simulation(sim)
         _CAR_IMG_SCALE_CACHE.clear()
-        car_active = False
-        car_spawn_cooldown = 0
-        alpha_ratio_p1 = 1.0  # fallback
-        alpha_ratio_p2 = random.uniform(0.1, 3.0)  # Initialize with random value
-        alpha_ratio_p2_timer = 0
-
-    # Initialize alpha ratios for first time
-    alpha_ratio_p1 = 1.0  # fallback
-    alpha_ratio_p2 = random.uniform(0.1, 3.0)
+        # Between matches is the one moment a full collection cannot cause a visible hitch
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    # Everything allocated during setup (assets, board, fonts) is long-lived: move it out of
+    # the collector's view and collect by hand so GC pauses never land mid-frame
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+
+    frame_no = 0
+    alloc_peaks = np.zeros(max(0, alloc_check_frames))
+    alloc_start_bytes = 0
+    alloc_start_misses = 0
+    alloc_from = None  # first measured frame
+    exit_code = 0
 
     while running:
         dt = clock.tick(FPS)
+        perf.start_frame()
+        if alloc_check_frames:
+            if (alloc_from is None and frame_no >= ALLOC_WARMUP_FRAMES
+                    and (eeg is None or spectral_bus or eeg_window_ready
+                         or frame_no >= ALLOC_WARMUP_FRAMES + ALLOC_EEG_WAIT_FRAMES)):
+                alloc_from = frame_no
+                gc.collect()
+                tracemalloc.start()
+                alloc_start_bytes = tracemalloc.get_traced_memory()[0]
+                alloc_start_misses = sum(misses for _, misses in _SCALE_CACHE_STATS.values())
+            if alloc_from is not None:
+                frame_start_bytes = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -550,301 +888,83 @@ def main(serial_port: str = None):
                     running = False
                 elif event.key == pygame.K_x:
                     reset_game()
+                elif event.key == pygame.K_F3:
+                    overlay.toggle()
+                elif event.key == pygame.K_F10:
+                    profiler.toggle()
+        perf.lap("input")
 
-        if not game_over:
+        if not sim.game_over:
             keys = pygame.key.get_pressed()
-            dt_sec = dt / 1000.0
 
             # Update P1 EEG alpha/beta ratio
+            eeg_ready = eeg is not None and eeg.streaming
             if eeg_ready:
                 eeg_accum_ms += dt
                 if eeg_accum_ms >= eeg_refresh_ms:
                     eeg_accum_ms = 0
-                    data = eeg_setup.get_current_board_data(num_samples=samples_needed)
-                    if data is not None and data.size > 0:
-                        eeg = data[eeg_chs, :]
-                        eeg = _remove_dc_offset(eeg)
-                        ratio, alpha_power, beta_power = _band_power_ratio_fft(eeg, sfreq)  # alpha:beta ratio + individual powers
+                    features = None
+                    if spectral_bus:
+                        features = eeg.read_features()  # computed once by the bus publisher
+                    else:
+                        features, eeg_buf = _eeg_window_features(eeg, p1_features, eeg_buf)
+                        eeg_window_ready = eeg_window_ready or features is not None
+                    if features is not None:
+                        ratio, alpha_power, beta_power = features["alpha_beta"], features["alpha"], features["beta"]
                         
                         # Fallback for zero/very low alpha ratio - simulate reasonable values
                         if ratio <= 0.05 or alpha_power <= 0.01:  # Very low or zero ratio/alpha power
-                            alpha_ratio_p1 = random.uniform(0.5, 2.0)  # Simulate reasonable alpha/beta ratio
-                            print(f"P1 EEG | FALLBACK MODE - Original ratio too low ({ratio:.3f}), using simulated: {alpha_ratio_p1:.3f}")
+                            ratios[0] = random.uniform(0.5, 2.0)  # Simulate reasonable alpha/beta ratio
+                            print(f"P1 EEG | FALLBACK MODE - Original ratio too low ({ratio:.3f}), using simulated: {ratios[0]:.3f}")
                         else:
-                            alpha_ratio_p1 = ratio
+                            ratios[0] = features[p1_metric]
                             
-                        last_eeg_update_ms = elapsed_ms
+                        last_eeg_update_ms = sim.elapsed_ms
+                        eeg_update_t = time.perf_counter()
+                        st = eeg.stats()
+                        eeg_stats_text = (f"EEG loss {st['loss_rate'] * 100:.1f}% | jitter {st['jitter_ms']:.1f} ms | "
+                                          f"host gaps {st['host_gaps']:.0f} | latency {st['latency_ms']:.0f} ms | "
+                                          f"drain {st['drain_interval_ms']:.0f} ms")
                         
                         # Print alpha/beta ratio and individual band powers for debugging
-                        print(f"P1 EEG | Alpha Power: {alpha_power:.3f} | Beta Power: {beta_power:.3f} | Ratio (α/β): {alpha_ratio_p1:.3f} | Speed Mult: {max(0.0, min(1.6, alpha_ratio_p1 * 0.5)):.3f}")
-
-            # Update P2 test alpha ratio periodically
-            alpha_ratio_p2_timer += dt
-            if alpha_ratio_p2_timer >= alpha_ratio_p2_interval:
-                alpha_ratio_p2 = random.uniform(0.1, 3.0)
-                alpha_ratio_p2_timer = 0
-                
+                        metric_text = "" if p1_metric == "alpha_beta" else f" | {p1_metric}: {features[p1_metric]:.3f}"
+                        print(f"P1 EEG | Alpha Power: {alpha_power:.3f} | Beta Power: {beta_power:.3f} | Ratio (α/β): {ratio:.3f}{metric_text} | Speed Mult: {max(0.0, min(1.6, ratios[0] * 0.5)):.3f}")
+            perf.lap("eeg")
+
+            # Update P2 (and bot) test alpha ratios periodically
+            if test_ratios.update(dt):
                 # Print P2 test ratio for comparison
-                print(f"P2 Test Alpha Ratio: {alpha_ratio_p2:.3f} | Speed Mult: {max(0.0, min(1.6, alpha_ratio_p2 * 0.5)):.3f}")
-
-            # Direct translation of alpha ratios to player multipliers (clamped to reasonable range)
-            max_mult = 1.6
-            current_p1_mult = max(0.0, min(max_mult, alpha_ratio_p1 * 0.5))  # Scale by 0.5 to keep in reasonable range
-            current_p2_mult = max(0.0, min(max_mult, alpha_ratio_p2 * 0.5))  # Scale by 0.5 to keep in reasonable range
-
-            # Apply forward/back movement with traffic light for P1
-            if current_p1_mult > 0.0:
-                if light_state in ("green", "yellow"):
-                    player1_world_y -= (MOVE_SPEED * current_p1_mult) * dt_sec
-                elif light_state == "red":
-                    player1_world_y = min(player1_world_y + (MOVE_SPEED * current_p1_mult) * dt_sec, start_world_y)
-
-            # Apply forward/back movement with traffic light for P2 (using test alpha ratio)
-            if current_p2_mult > 0.0:
-                if light_state in ("green", "yellow"):
-                    player2_world_y -= (MOVE_SPEED * current_p2_mult) * dt_sec
-                elif light_state == "red":
-                    player2_world_y = min(player2_world_y + (MOVE_SPEED * current_p2_mult) * dt_sec, start_world_y)
-
-            # Lateral input: P1 (A/D) and P2 (Left/Right arrows); scaled with 10% baseline
-            p1_scale = max(0.1, current_p1_mult)
-            p1_accel = LATERAL_ACCEL_BASE * p1_scale
-            p1_max = LATERAL_MAX_BASE * p1_scale
-            p1_ax = 0.0
-            if keys[pygame.K_a]:
-                p1_ax -= p1_accel
-            if keys[pygame.K_d]:
-                p1_ax += p1_accel
-            player1_vx += p1_ax * dt_sec
-            player1_vx -= player1_vx * LATERAL_DRAG * dt_sec
-            player1_vx = max(-p1_max, min(p1_max, player1_vx))
-            player1_world_x += player1_vx * dt_sec
-
-            p2_scale = max(0.1, current_p2_mult)
-            p2_accel = LATERAL_ACCEL_BASE * p2_scale
-            p2_max = LATERAL_MAX_BASE * p2_scale
-            p2_ax = 0.0
-            if keys[pygame.K_LEFT]:
-                p2_ax -= p2_accel
-            if keys[pygame.K_RIGHT]:
-                p2_ax += p2_accel
-            player2_vx += p2_ax * dt_sec
-            player2_vx -= player2_vx * LATERAL_DRAG * dt_sec
-            player2_vx = max(-p2_max, min(p2_max, player2_vx))
-            player2_world_x += player2_vx * dt_sec
-
-            # Clamp to road and collisions (as in v2)
-            def compute_edges_and_scale(wx: float, wy: float):
-                v = 0.0 if HEIGHT == horizon_y else max(0.0001, min(1.0, (wy - camera_y) / (HEIGHT - horizon_y)))
-                center_top = (WIDTH * 0.5 + road_tilt * (1 - v))
-                halftop = road_top_width * 0.5
-                halfbot = road_bottom_width * 0.5
-                halfw = halftop * (1 - v) + halfbot * v
-                cx = center_top
-                sc = SCALE_FAR + (SCALE_NEAR - SCALE_FAR) * (v ** SCALE_GAMMA)
-                px_half = (player_size * sc * 0.35)
-                world_half_x = px_half / v
-                left_edge = ((cx - halfw) + px_half - cx) / v
-                right_edge = ((cx + halfw) - px_half - cx) / v
-                h_world = player_size * sc * 0.65
-                return v, sc, left_edge, right_edge, world_half_x, h_world
-
-            p1_v, p1_sc, p1_wxmin, p1_wxmax, p1_hbx, p1_hh = compute_edges_and_scale(player1_world_x, player1_world_y)
-            p2_v, p2_sc, p2_wxmin, p2_wxmax, p2_hbx, p2_hh = compute_edges_and_scale(player2_world_x, player2_world_y)
-
-            if player1_world_x < p1_wxmin:
-                player1_world_x = p1_wxmin
-                player1_vx = abs(player1_vx) * WALL_BOUNCE
-            elif player1_world_x > p1_wxmax:
-                player1_world_x = p1_wxmax
-                player1_vx = -abs(player1_vx) * WALL_BOUNCE
-            if player2_world_x < p2_wxmin:
-                player2_world_x = p2_wxmin
-                player2_vx = abs(player2_vx) * WALL_BOUNCE
-            elif player2_world_x > p2_wxmax:
-                player2_world_x = p2_wxmax
-                player2_vx = -abs(player2_vx) * WALL_BOUNCE
-
-            p1_left = player1_world_x - p1_hbx
-            p1_right = player1_world_x + p1_hbx
-            p1_top = player1_world_y - p1_hh
-            p1_bottom = player1_world_y
-            p2_left = player2_world_x - p2_hbx
-            p2_right = player2_world_x + p2_hbx
-            p2_top = player2_world_y - p2_hh
-            p2_bottom = player2_world_y
-            x_overlap = min(p1_right, p2_right) - max(p1_left, p2_left)
-            y_overlap = min(p1_bottom, p2_bottom) - max(p1_top, p2_top)
-            if x_overlap > 0 and y_overlap > 0:
-                push = x_overlap * 0.5
-                if player1_world_x <= player2_world_x:
-                    player1_world_x -= push
-                    player2_world_x += push
-                else:
-                    player1_world_x += push
-                    player2_world_x -= push
-                v1, v2 = player1_vx, player2_vx
-                player1_vx = v2 * 0.5
-                player2_vx = v1 * 0.5
-
-            p1_v, p1_sc, p1_wxmin, p1_wxmax, p1_hbx, p1_hh = compute_edges_and_scale(player1_world_x, player1_world_y)
-            p2_v, p2_sc, p2_wxmin, p2_wxmax, p2_hbx, p2_hh = compute_edges_and_scale(player2_world_x, player2_world_y)
-            player1_world_x = max(p1_wxmin, min(p1_wxmax, player1_world_x))
-            player2_world_x = max(p2_wxmin, min(p2_wxmax, player2_world_x))
-
-            # Camera and animations
-            leader_world_y = min(player1_world_y, player2_world_y)
-            camera_y = leader_world_y - (camera_anchor_screen_y - horizon_y)
-            cam_dy = camera_y - camera_y_prev
-            road_scroll = (road_scroll + (-cam_dy) * 0.004) % 1.0
-            scenery_scroll = (scenery_scroll + (-cam_dy) * 0.003) % 1.0
-            cloud_off_x += (-cam_dy) * 0.01
-            cloud_off_y += (-cam_dy) * 0.02
-            camera_y_prev = camera_y
-
-            # Cars spawn/update
-            if car_spawn_cooldown > 0:
-                car_spawn_cooldown = max(0, car_spawn_cooldown - dt)
-            if (not car_active) and car_spawn_cooldown == 0:
-                if random.random() < 0.01:
-                    car_type = 'oncoming' if random.random() < 0.6 else 'trailing'
-                    if car_type == 'oncoming':
-                        spawn_v = 0.08
-                        center_top = (WIDTH * 0.5 + road_tilt * (1 - spawn_v))
-                        halftop = road_top_width * 0.5
-                        halfbot = road_bottom_width * 0.5
-                        halfw = halftop * (1 - spawn_v) + halfbot * spawn_v
-                        lane_center_offset = -halfw * 0.33
-                        car_world_x = (center_top + lane_center_offset - center_top) / max(0.001, spawn_v)
-                        car_world_y = camera_y + ((horizon_y + (HEIGHT - horizon_y) * spawn_v) - horizon_y)
-                        car_speed = -CAR_ONCOMING_SPEED
-                        car_color = (40, 40, 160)
-                    else:
-                        spawn_v = 0.95
-                        center_top = (WIDTH * 0.5 + road_tilt * (1 - spawn_v))
-                        halftop = road_top_width * 0.5
-                        halfbot = road_bottom_width * 0.5
-                        halfw = halftop * (1 - spawn_v) + halfbot * spawn_v
-                        lane_center_offset = halfw * 0.33
-                        car_world_x = (center_top + lane_center_offset - center_top) / max(0.001, spawn_v)
-                        car_world_y = camera_y + ((horizon_y + (HEIGHT - horizon_y) * spawn_v) - horizon_y)
-                        car_speed = CAR_TRAILING_SPEED
-                        car_color = (160, 80, 40)
-                    car_active = True
-                    car_spawn_cooldown = random.randint(CAR_MIN_COOLDOWN, CAR_MAX_COOLDOWN)
-
-            if car_active:
-                car_world_y += (-car_speed) * dt_sec
-                car_sy = horizon_y + (car_world_y - camera_y)
-                v = 0.0 if HEIGHT == horizon_y else max(0.0001, min(1.0, (car_sy - horizon_y) / (HEIGHT - horizon_y)))
-                center_top = (WIDTH * 0.5 + road_tilt * (1 - v))
-                halftop = road_top_width * 0.5
-                halfbot = road_bottom_width * 0.5
-                halfw = halftop * (1 - v) + halfbot * v
-                lane_center_offset = (-halfw * 0.33) if car_type == 'oncoming' else (halfw * 0.33)
-                car_world_x = (center_top + lane_center_offset - center_top) / max(0.001, v)
-                if car_sy < horizon_y - 40 or car_sy > HEIGHT + 80:
-                    car_active = False
-                lane_w = halfw * 0.5
-                car_px_half = max(6, lane_w * 0.35)
-                car_world_half = car_px_half / v
-                car_left = car_world_x - car_world_half
-                car_right = car_world_x + car_world_half
-                car_top = car_world_y - (player_size * (SCALE_FAR + (SCALE_NEAR - SCALE_FAR) * (v ** SCALE_GAMMA)) * 0.9)
-                car_bottom = car_world_y
-                def player_hitbox(wx, wy):
-                    pv = 0.0 if HEIGHT == horizon_y else max(0.0001, min(1.0, ((horizon_y + (wy - camera_y)) - horizon_y) / (HEIGHT - horizon_y)))
-                    psc = SCALE_FAR + (SCALE_NEAR - SCALE_FAR) * (pv ** SCALE_GAMMA)
-                    p_half = (player_size * psc * 0.35) / pv
-                    p_hh = (player_size * psc * 0.65)
-                    return wx - p_half, wx + p_half, wy - p_hh, wy
-                p1_l, p1_r, p1_t, p1_b = player_hitbox(player1_world_x, player1_world_y)
-                p2_l, p2_r, p2_t, p2_b = player_hitbox(player2_world_x, player2_world_y)
-                def overlap(ax1, ax2, ay1, ay2, bx1, bx2, by1, by2):
-                    return (min(ax2, bx2) - max(ax1, bx1) > 0) and (min(ay2, by2) - max(ay1, by1) > 0)
-                if overlap(car_left, car_right, car_top, car_bottom, p1_l, p1_r, p1_t, p1_b):
-                    game_over = True
-                    win = True
-                    winner_label = "Player 2"
-                elif overlap(car_left, car_right, car_top, car_bottom, p2_l, p2_r, p2_t, p2_b):
-                    game_over = True
-                    win = True
-                    winner_label = "Player 1"
-
-            # Trailing off-screen win
-            sy1 = horizon_y + (player1_world_y - camera_y)
-            sy2 = horizon_y + (player2_world_y - camera_y)
-            off_margin = 40
-            if sy1 > HEIGHT + off_margin:
-                game_over = True
-                win = True
-                winner_label = "Player 2"
-            elif sy2 > HEIGHT + off_margin:
-                game_over = True
-                win = True
-                winner_label = "Player 1"
-
-        if not game_over:
-            elapsed_ms += dt
-            light_timer_ms += dt
-            if light_timer_ms >= light_interval_ms:
-                state_index = (state_index + 1) % len(state_sequence)
-                light_state = state_sequence[state_index]
-                light_timer_ms = 0
-                light_interval_ms = next_interval_for(light_state)
+                print(f"P2 Test Alpha Ratio: {test_ratios.ratios[1]:.3f} | Speed Mult: {max(0.0, min(1.6, test_ratios.ratios[1] * 0.5)):.3f}")
+            ratios[1:] = test_ratios.ratios[1:]
+            if not eeg_ready:
+                ratios[0] = test_ratios.ratios[0]
+
+            steer[0] = keys[pygame.K_d] - keys[pygame.K_a]
+            steer[1] = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+
+            if net is None:
+                sim.step(dt, steer, ratios)
+            if input_log is not None:
+                input_log.append(dt, steer, ratios, sim.digest())
+            if net is None:
+                _handle_match_events(sim.events, eeg)
+        if net is not None:
+            # Sent every frame, game over included: inputs double as acks and keep-alives
+            net.poll()
+            if net.slot >= 0:
+                keys = pygame.key.get_pressed()
+                net_keys = (KEY_LEFT if keys[pygame.K_a] or keys[pygame.K_LEFT] else 0) | \
+                    (KEY_RIGHT if keys[pygame.K_d] or keys[pygame.K_RIGHT] else 0)
+                net.send_input(net_keys, float(ratios[0]) if eeg is not None and eeg.streaming else None)
+            _handle_match_events(net.update_view().events, eeg)
+        if gc.get_count()[0] > GC_GEN0_LIMIT:
+            gc.collect(0)
+        perf.lap("sim")
 
         # Render
-        draw_background(screen)
-        cloud_dx = int(cloud_off_x)
-        cloud_dy = int(cloud_off_y)
-        draw_cloud(screen, int(WIDTH * 0.15) + cloud_dx, int(HEIGHT * 0.16) + int(cloud_dy * 0.6), 1.2)
-        draw_cloud(screen, int(WIDTH * 0.65) - int(cloud_dx * 0.5), int(HEIGHT * 0.12) + int(cloud_dy * 0.4), 1.4)
-        draw_cloud(screen, int(WIDTH * 0.42) + int(cloud_dx * 0.3), int(HEIGHT * 0.20) + int(cloud_dy * 0.8), 1.0)
-        draw_side_scenery(screen, horizon_y, road_tilt, scenery_scroll)
-        draw_road(screen, horizon_y, road_tilt, road_scroll)
-        if car_active:
-            car_sy = horizon_y + (car_world_y - camera_y)
-            v = 0.0 if HEIGHT == horizon_y else max(0.0001, min(1.0, (car_sy - horizon_y) / (HEIGHT - horizon_y)))
-            center_top = (WIDTH * 0.5 + road_tilt * (1 - v))
-            sx = int(center_top + car_world_x * v)
-            halftop = road_top_width * 0.5
-            halfbot = road_bottom_width * 0.5
-            halfw = halftop * (1 - v) + halfbot * v
-            lane_halfw = halfw * 0.5
-            img = None
-            if car_type == 'oncoming' and CAR_IMG_FRONT is not None:
-                img = CAR_IMG_FRONT
-            elif car_type == 'trailing' and CAR_IMG_BACK is not None:
-                img = CAR_IMG_BACK
-            elif CAR_IMG is not None:
-                img = CAR_IMG
-            draw_car(screen, sx, int(car_sy), v, lane_halfw, (180, 30, 30), img)
-        draw_horizon_fog(screen, horizon_y)
-        draw_traffic_light(screen, WIDTH // 2 - 30, int(HEIGHT * 0.02), light_state)
-
-        def world_to_screen(wx, wy):
-            sy = horizon_y + (wy - camera_y)
-            v = 0.0 if HEIGHT == horizon_y else max(0.0, min(1.0, (sy - horizon_y) / (HEIGHT - horizon_y)))
-            cx = int((WIDTH * 0.5 + road_tilt * (1 - v)))
-            scale = SCALE_FAR + (SCALE_NEAR - SCALE_FAR) * (v ** SCALE_GAMMA)
-            sx = int(cx + wx * v)
-            return sx, int(sy), scale, v
-
-        p1_sx, p1_sy, p1_scale, p1_v = world_to_screen(player1_world_x, player1_world_y)
-        p2_sx, p2_sy, p2_scale, p2_v = world_to_screen(player2_world_x, player2_world_y)
-        p1_sx += int(-WIDTH * 0.02 * p1_v)
-        p2_sx += int(WIDTH * 0.02 * p2_v)
-        screen.blit(font_small.render("P1", True, P1_ACCENT), (p1_sx - 10, p1_sy - int(player_size * p1_scale)))
-        screen.blit(font_small.render("P2", True, P2_ACCENT), (p2_sx - 10, p2_sy - int(player_size * p2_scale)))
-        p1_moving = (current_p1_mult > 0 and light_state in ("green", "yellow"))
-        p2_moving = (current_p2_mult > 0 and light_state in ("green", "yellow"))
-        players = [
-            (p1_v, p1_sx, p1_sy, p1_scale, P1_ACCENT, (elapsed_ms / 1000.0) * (2.0 + 2.0 * current_p1_mult), p1_moving),
-            (p2_v, p2_sx, p2_sy, p2_scale, P2_ACCENT, (elapsed_ms / 1000.0) * (2.0 + 2.0 * current_p2_mult), p2_moving),
-        ]
-        players.sort(key=lambda t: t[0])
-        for v, sx, sy, sc, accent, phase, moving in players:
-            draw_player(screen, sx - int(player_size * sc * 0.5), sy - int(player_size * sc * 0.8), int(player_size * sc), accent_color=accent, anim_phase=phase, moving=moving)
+        draw_world(screen, sim, font_small, q, perf)
+        light_state = sim.light_state
+        elapsed_ms = sim.elapsed_ms
 
         if light_state == "green":
             state_text = "GREEN - P1: Alpha/Beta EEG  |  P2: Alpha (TEST)"
@@ -855,63 +975,164 @@ def main(serial_port: str = None):
         else:
             state_text = "YELLOW - You may move"
             state_color = YELLOW
-        screen.blit(font_small.render(state_text, True, state_color), (10, HEIGHT - 34))
+        screen.blit(render_text(font_small, state_text, state_color), (10, HEIGHT - 34))
         controls_text = "X: Restart   ESC: Quit   P1 A/D, P2 Left/Right"
-        screen.blit(font_small.render(controls_text, True, BLACK), (WIDTH - 380, HEIGHT - 34))
+        screen.blit(render_text(font_small, controls_text, BLACK), (WIDTH - 380, HEIGHT - 34))
 
         mins = int(elapsed_ms // 60000)
         secs = int((elapsed_ms // 1000) % 60)
         tenths = int((elapsed_ms % 1000) // 100)
         time_text = f"Time: {mins:02}:{secs:02}.{tenths}"
-        screen.blit(font_small.render(time_text, True, BLACK), (10, 10))
+        screen.blit(render_text(font_small, time_text, BLACK, slot="time"), (10, 10))
 
         # Speed bars
         bar_w = int(WIDTH * 0.25)
         bar_h = 10
         bar_x = 10
-        p1_bar_y = 40
-        p2_bar_y = 60
-        max_mult = 1.6
-        pygame.draw.rect(screen, (220, 220, 220), (bar_x, p1_bar_y, bar_w, bar_h), border_radius=4)
-        pygame.draw.rect(screen, (220, 220, 220), (bar_x, p2_bar_y, bar_w, bar_h), border_radius=4)
-        p1_fill = int(bar_w * min(1.0, current_p1_mult / max_mult))
-        p2_fill = int(bar_w * min(1.0, current_p2_mult / max_mult))
-        pygame.draw.rect(screen, P1_ACCENT, (bar_x, p1_bar_y, p1_fill, bar_h), border_radius=4)
-        pygame.draw.rect(screen, P2_ACCENT, (bar_x, p2_bar_y, p2_fill, bar_h), border_radius=4)
-        
+        bar_y0 = 40
+        bar_step = 20
+        max_mult = MAX_MULT
         # Show EEG status and values
-        eeg_status = "EEG: Connected" if eeg_ready else "EEG: Fallback"
-        eeg_color = P1_ACCENT if eeg_ready else (255, 100, 100)
-        screen.blit(font_small.render(f"P1 Speed (α/β: {alpha_ratio_p1:.2f}) - {eeg_status}", True, eeg_color), (bar_x + bar_w + 10, p1_bar_y - 6))
-        screen.blit(font_small.render(f"P2 Speed (α: {alpha_ratio_p2:.2f}) - TEST", True, P2_ACCENT), (bar_x + bar_w + 10, p2_bar_y - 6))
+        eeg_state = eeg.state if eeg is not None else None
+        if eeg_state == STREAMING:
+            eeg_status, eeg_color = "EEG: Streaming", P1_ACCENT
+        elif eeg_state is None:
+            eeg_status, eeg_color = "EEG: Fallback", (255, 100, 100)
+        else:
+            eeg_status, eeg_color = f"EEG: {eeg.status_text().capitalize()} (test)", ORANGE
+        for pid in range(num_players):
+            bar_y = bar_y0 + bar_step * pid
+            accent = PLAYER_ACCENTS[pid % len(PLAYER_ACCENTS)]
+            fill = int(bar_w * min(1.0, players.mult[pid] / max_mult))
+            pygame.draw.rect(screen, (220, 220, 220), (bar_x, bar_y, bar_w, bar_h), border_radius=4)
+            pygame.draw.rect(screen, accent, (bar_x, bar_y, fill, bar_h), border_radius=4)
+            if pid == 0:
+                label, label_color = f"P1 Speed (α/β: {players.ratio[0]:.2f}) - {eeg_status}", eeg_color
+            elif pid == 1:
+                label, label_color = f"P2 Speed (α: {players.ratio[1]:.2f}) - TEST", accent
+            else:
+                label, label_color = f"P{pid + 1} Speed (α: {players.ratio[pid]:.2f}) - BOT", accent
+            if not players.alive[pid]:
+                label += " - OUT"
+            screen.blit(render_text(font_small, label, label_color, slot=PLAYER_LABELS[pid]), (bar_x + bar_w + 10, bar_y - 6))
 
         # Mode indicator
-        mode_text = "REAL EEG P1 + TEST P2" if eeg_ready else "FALLBACK MODE - Both Test"
-        mode_color = (100, 255, 100) if eeg_ready else (255, 100, 100)
-        screen.blit(font_small.render(mode_text, True, mode_color), (10, 80))
-
-        if game_over:
-            if win:
-                show_center_text(screen, f"{winner_label} Wins!", GREEN, font_big)
-                screen.blit(font_small.render("Press X to restart", True, BLACK), (10, 40))
+        mode_text = "REAL EEG P1 + TEST P2" if eeg_state == STREAMING else "FALLBACK MODE - Both Test"
+        mode_color = (100, 255, 100) if eeg_state == STREAMING else (255, 100, 100)
+        if net is not None:
+            mode_text = net.status_text()
+        screen.blit(render_text(font_small, mode_text, mode_color, slot="mode"), (10, bar_y0 + bar_step * num_players))
+        if eeg_stats_text:
+            screen.blit(render_text(font_small, eeg_stats_text, BLACK, slot="eeg_stats"), (10, bar_y0 + bar_step * (num_players + 1)))
+
+        if sim.game_over:
+            if sim.winner_id >= 0:
+                show_center_text(screen, f"{sim.winner_label} Wins!", GREEN, font_big)
+                screen.blit(render_text(font_small, "Press X to restart", BLACK), (10, 40))
+        perf.lap("hud")
+        overlay.draw(screen, perf_info)
+        perf.lap("overlay")
 
         pygame.display.flip()
+        perf.lap("flip")
+        profiler.poll()
+        if governor.update(dt, perf.work_ms()):
+            q = governor.settings
+            set_sprite_smoothing(q["smooth_sprites"])
+            print(f"Quality -> {governor.name} (frame {governor.frame_ms.mean():.1f} ms avg)", flush=True)
+
+        if startup_benchmark:
+            play_ms = (time.perf_counter() - _PROCESS_T0) * 1000.0
+            print(f"STARTUP first_frame_ms={first_frame_ms:.1f} ready_ms={ready_ms:.1f} first_play_frame_ms={play_ms:.1f} "
+                  f"eeg={eeg.state if eeg is not None else 'off'}", flush=True)
+            running = False
+
+        if alloc_check_frames and alloc_from is not None:
+            alloc_peaks[frame_no - alloc_from] = tracemalloc.get_traced_memory()[1] - frame_start_bytes
+            if frame_no + 1 >= alloc_from + alloc_check_frames:
+                gc.collect()
+                growth = tracemalloc.get_traced_memory()[0] - alloc_start_bytes
+                tracemalloc.stop()
+                cache_entries = sum(misses for _, misses in _SCALE_CACHE_STATS.values()) - alloc_start_misses
+                growth_budget = ALLOC_GROWTH_BUDGET + cache_entries * ALLOC_CACHE_ENTRY_BYTES
+                worst = int(alloc_peaks.max())
+                print(f"Alloc check | {alloc_check_frames} frames | per-frame peak: median {int(np.median(alloc_peaks))} B, "
+                      f"max {worst} B (budget {ALLOC_FRAME_PEAK_BUDGET}) | net growth {growth} B (budget "
+                      f"{growth_budget} = {ALLOC_GROWTH_BUDGET} + {cache_entries} new cache entries)")
+                if worst > ALLOC_FRAME_PEAK_BUDGET or growth > growth_budget:
+                    print("Alloc check FAILED")
+                    exit_code = 1
+                running = False
+        frame_no += 1
+
+    save_input_log()
+    if profiler.active:
+        profiler.toggle()  # write out a capture that was still running
+
+    if net is not None:
+        net.close()
 
     # EEG cleanup
-    if EEG_AVAILABLE and eeg_setup is not None:
+    if eeg is not None:
         try:
-            eeg_setup.stop()
+            eeg.stop()
         except Exception:
             pass
+    gc.enable()
+    gc.unfreeze()
     pygame.quit()
-    sys.exit(0)
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Red Light Green Light with real EEG alpha/beta control for P1")
     parser.add_argument("--port", type=str, default=None, help="Serial port like \\\\.\\COM3 (Windows) or /dev/ttyUSB0 (Linux)")
+    parser.add_argument("--players", type=int, default=2, help=f"Number of players (2-{MAX_PLAYERS}); players beyond P2 are bots")
+    parser.add_argument("--hazard", type=float, default=1.0, help="Car traffic density (1.0 = classic pacing, 3.0 = rush hour)")
+    parser.add_argument("--alloc-check", type=int, default=0, metavar="FRAMES",
+                        help="Play FRAMES frames under tracemalloc after warm-up and exit non-zero if per-frame allocations exceed budget")
+    parser.add_argument("--no-eeg", action="store_true", help="Skip EEG board setup (P1 runs on its fallback ratio)")
+    parser.add_argument("--synthetic-eeg", action="store_true",
+                        help="Drive P1 from generated EEG through the full board/ingest/DSP path (no hardware needed)")
+    parser.add_argument("--spectral-bus", type=str, default=None, metavar="NAME",
+                        help="Read P1's features from a 'spectral_bus.py publish' process instead of opening the board")
+    parser.add_argument("--p1-metric", choices=sorted(FEATURES), default="alpha_beta",
+                        help="EEG feature that sets P1's speed (see eeg_features.py)")
+    parser.add_argument("--eeg-dtype", choices=("float64", "float32"), default="float64",
+                        help="Precision of P1's EEG window (float32 halves the memory kept and copied per tick)")
+    parser.add_argument("--board-buffer", type=int, default=450000, help="BrainFlow ring buffer size in samples")
+    parser.add_argument("--spill-dir", type=str, default=None,
+                        help="Record all raw EEG to rotating compressed files in this directory (for long sessions)")
+    parser.add_argument("--spill-rotate-mb", type=float, default=64.0, help="Start a new spill file after this many MB")
+    parser.add_argument("--spill-rotate-min", type=float, default=60.0, help="Start a new spill file after this many minutes")
+    parser.add_argument("--spill-keep", type=int, default=None, help="Keep only the newest N spill files")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="Print time to first frame / first gameplay frame and exit (see startup_benchmark.py)")
+    parser.add_argument("--quality", choices=("auto",) + QUALITY_NAMES, default="auto",
+                        help="Rendering quality; 'auto' steps down on slow machines to hold the frame rate")
+    parser.add_argument("--perf-overlay", action="store_true",
+                        help="Start with the performance overlay shown (F3 toggles it; F10 profiles the loop)")
+    parser.add_argument("--profile-seconds", type=float, default=10.0, help="Length of an F10 profile capture")
+    parser.add_argument("--profile-dir", type=str, default=".", help="Directory F10 profile captures are written to")
+    parser.add_argument("--connect", type=str, default=None, metavar="HOST[:PORT]",
+                        help="Join a 'net_game.py serve' match instead of playing locally (A/D or arrows steer your player)")
+    parser.add_argument("--spectate", action="store_true", help="With --connect: watch the match read-only")
+    parser.add_argument("--seed", type=int, default=None, help="Match seed (random by default); restarts use seed+1, seed+2, ...")
+    parser.add_argument("--record", type=str, default=None, metavar="PATH",
+                        help="Save each match's inputs to PATH (.npz) for 'python game_sim.py replay PATH'")
     args = parser.parse_args()
     
     # Try environment variable if no CLI arg
     serial_port = args.port or os.environ.get("BRAIN_PORT")
-    main(serial_port=serial_port)
\ No newline at end of file
+    main(serial_port=serial_port, num_players=args.players, hazard=args.hazard, alloc_check_frames=args.alloc_check,
+         seed=args.seed, record_path=args.record, use_eeg=not args.no_eeg, startup_benchmark=args.startup_benchmark,
+         synthetic_eeg=args.synthetic_eeg, p1_metric=args.p1_metric, spectral_bus=args.spectral_bus,
+         perf_overlay=args.perf_overlay, profile_seconds=args.profile_seconds, profile_dir=args.profile_dir,
+         quality=args.quality, connect=args.connect, spectate=args.spectate,
+         eeg_options={
+             "buffer_size": args.board_buffer,
+             "eeg_dtype": args.eeg_dtype,
+             "spill_dir": args.spill_dir,
+             "spill_options": {"max_bytes": int(args.spill_rotate_mb * 1024 * 1024),
+                               "max_seconds": args.spill_rotate_min * 60.0, "keep_files": args.spill_keep},
+         })
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+Faster-than-real-time export of recorded or seeded matches to video.
+
+The match is re-simulated headless once in the parent process, which pickles the
+simulation at the start of every chunk of the output timeline. Worker processes restore
+their checkpoint, step through their chunk and draw each output frame off-screen with the
+game's own draw_world(), so footage looks exactly like the game without a display or
+screen capture. Chunks are written to separate files and stitched in order at the end.
+
+Output formats:
+    png   numbered PNG images in a directory (frame_000000.png, ...)
+    y4m   YUV4MPEG2 (4:4:4, full range) - plays in mpv/VLC, encodes with
+          `ffmpeg -i match.y4m -c:v libx264 -pix_fmt yuv420p match.mp4`
+    rgb   raw rgb24 frames - `ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -r FPS -i match.rgb match.mp4`
+
+Usage:
+    python replay_export.py match.npz --out match.y4m
+    python replay_export.py --seed 7 --players 6 --duration 300 --out frames/ --format png --workers 8
+"""
+import argparse
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from balance_sweep import SyntheticRatios
+from game_sim import GameSimulation, InputLog
+
+EXPORT_FORMATS = ("png", "y4m", "rgb")
+# BT.601 full-range RGB -> YCbCr in 1/256 steps: (offset, r, g, b) per plane. Every
+# partial sum stays within 0..65535 (chroma starts from the 128 * 256 offset and its
+# positive weight is 128), so the whole conversion runs in uint16 without widening.
+_YUV_COEFFS = ((0, 77, 150, 29), (32768, -43, -85, 128), (32768, 128, -107, -21))
+
+
+def seeded_match_log(seed, num_players=4, hazard=1.0, duration_s=300.0, width=None, height=None, dt_ms=16):
+    """
+    Plays a bot-only match (like balance_sweep.py) and records its inputs.
+
+    The screen size is part of the match (it sets the road geometry and speeds), so it
+    is chosen here rather than at render time.
+
+    Returns:
+        InputLog: Ticks until the match ends or duration_s of play has passed.
+    """
+    sim = GameSimulation(num_players, seed=seed, hazard=hazard, width=width, height=height, num_humans=0)
+    ratios = SyntheticRatios(num_players, np.random.default_rng([seed, 2]))
+    log = InputLog.for_simulation(sim)
+    steer = np.zeros(num_players, dtype=np.int8)
+    while not sim.game_over and sim.elapsed_ms < duration_s * 1000.0:
+        r = ratios.update(dt_ms)
+        sim.step(dt_ms, steer, r)
+        log.append(dt_ms, steer, r, sim.digest())
+    return log
+
+
+def frame_schedule(log, fps, tail_s=2.0):
+    """
+    Ticks to apply before each output frame.
+
+    Output frame k shows the state after the last tick that ends at or before k / fps
+    seconds of play; tail_s of frames holding the final state follow the last tick.
+
+    Returns:
+        numpy.ndarray: Non-decreasing tick counts, one per output frame.
+    """
+    ends_ms = np.cumsum(log.dt_ms[:log.length], dtype=np.int64)
+    total_ms = int(ends_ms[-1]) if ends_ms.size else 0
+    frame_ms = np.arange(int((total_ms / 1000.0 + tail_s) * fps) + 1) * (1000.0 / fps)
+    return np.searchsorted(ends_ms, frame_ms, side="right")
+
+
+_RENDERER = None
+
+
+class _FrameRenderer:
+    """Per-worker pygame state: an off-screen surface at the match resolution, sprites, fonts."""
+
+    def __init__(self, width, height, quality):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        import pygame
+        import redlight_greenlight as game
+        from quality_governor import QUALITY_NAMES, QUALITY_TIERS
+
+        pygame.init()
+        pygame.display.set_mode((1, 1))  # convert_alpha() needs a display, even a dummy one
+        game.WIDTH, game.HEIGHT = width, height
+        loader = game.StartupLoader(use_eeg=False)
+        loader.run()  # sprites only, synchronously
+        loader.finish()
+        self.pygame = pygame
+        self.game = game
+        self.quality = QUALITY_TIERS[QUALITY_NAMES.index(quality)]
+        game.set_sprite_smoothing(self.quality["smooth_sprites"])
+        self.surface = pygame.Surface((width, height))
+        self.yuv = np.empty((3, height, width), dtype=np.uint8)
+        self.yuv_scratch = np.empty((2, height, width), dtype=np.uint16)
+        self.font_big = pygame.font.SysFont(None, 56)
+        self.font_small = pygame.font.SysFont(None, 28)
+
+    def draw(self, sim):
+        """Draws sim into the surface: the world, the match clock, the light and the winner."""
+        game = self.game
+        screen = self.surface
+        game.draw_world(screen, sim, self.font_small, self.quality)
+        elapsed_ms = sim.elapsed_ms
+        time_text = f"Time: {elapsed_ms // 60000:02}:{(elapsed_ms // 1000) % 60:02}.{(elapsed_ms % 1000) // 100}"
+        screen.blit(game.render_text(self.font_small, time_text, game.BLACK, slot="time"), (10, 10))
+        color = {"green": game.GREEN, "red": game.RED}.get(sim.light_state, game.YELLOW)
+        screen.blit(game.render_text(self.font_small, sim.light_state.upper(), color), (10, game.HEIGHT - 34))
+        if sim.game_over and sim.winner_id >= 0:
+            game.show_center_text(screen, f"{sim.winner_label} Wins!", game.GREEN, self.font_big)
+        return screen
+
+    def rgb(self):
+        """The surface as a (height, width, 3) uint8 array."""
+        data = self.pygame.image.tobytes(self.surface, "RGB")
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.surface.get_height(), self.surface.get_width(), 3)
+
+
+def _init_renderer(width, height, quality):
+    """Pool initializer: each worker sets up pygame and loads sprites once."""
+    global _RENDERER
+    _RENDERER = _FrameRenderer(width, height, quality)
+
+
+def rgb_to_yuv444(rgb, out=None, scratch=None):
+    """
+    (h, w, 3) uint8 RGB -> (3, h, w) uint8 Y, Cb, Cr planes (BT.601 full range).
+
+    Args:
+        rgb (numpy.ndarray): Frame pixels.
+        out (numpy.ndarray, optional): (3, h, w) uint8 destination.
+        scratch (numpy.ndarray, optional): (2, h, w) uint16 work space.
+    """
+    h, w = rgb.shape[:2]
+    out = np.empty((3, h, w), dtype=np.uint8) if out is None else out
+    scratch = np.empty((2, h, w), dtype=np.uint16) if scratch is None else scratch
+    acc, term = scratch
+    channels = (rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    for plane, (offset, *weights) in zip(out, _YUV_COEFFS):
+        acc.fill(offset)
+        # Positive terms first, so the unsigned running sum never dips below zero
+        for weight, channel in sorted(zip(weights, channels), key=lambda wc: -wc[0]):
+            np.multiply(channel, abs(weight), out=term, dtype=np.uint16)
+            if weight > 0:
+                acc += term
+            else:
+                acc -= term
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(plane, acc, casting="unsafe")
+    return out
+
+
+def _render_chunk(job):
+    """
+    Worker: restores a checkpoint and renders a run of output frames.
+
+    Returns:
+        tuple: (chunk index, frames rendered, seconds spent).
+    """
+    index, checkpoint, first_tick, ticks, first_frame, dt_ms, steer, ratios, fmt, target = job
+    t0 = time.perf_counter()
+    renderer = _RENDERER
+    sim = pickle.loads(checkpoint)
+    applied = first_tick
+    out = None if fmt == "png" else open(target, "wb")
+    try:
+        for k, tick in enumerate(ticks):
+            while applied < tick:
+                i = applied - first_tick
+                sim.step(int(dt_ms[i]), steer[i], ratios[i])
+                applied += 1
+            surface = renderer.draw(sim)
+            if fmt == "png":
+                renderer.pygame.image.save(surface, os.path.join(target, f"frame_{first_frame + k:06d}.png"))
+            elif fmt == "y4m":
+                out.write(b"FRAME\n")
+                out.write(rgb_to_yuv444(renderer.rgb(), renderer.yuv, renderer.yuv_scratch).data)
+            else:
+                out.write(renderer.rgb().tobytes())
+    finally:
+        if out is not None:
+            out.close()
+    return index, len(ticks), time.perf_counter() - t0
+
+
+def export_match(log, out_path, fmt=None, fps=30.0, workers=None, chunks=None, quality="high", tail_s=2.0):
+    """
+    Renders a match to out_path on a process pool.
+
+    Args:
+        log (InputLog): Match to export.
+        out_path (str): Output file (y4m, rgb) or directory (png).
+        fmt (str, optional): One of EXPORT_FORMATS; guessed from out_path by default.
+        fps (float): Output frame rate.
+        workers (int, optional): Worker processes (default: all cores).
+        chunks (int, optional): Timeline chunks (default: 4 per worker, for load balance).
+        quality (str): Rendering quality tier (see quality_governor.py).
+        tail_s (float): Seconds of the final frame after the match ends.
+
+    Returns:
+        dict: frames, match_s, wall_s, speedup (match seconds per wall second), fmt, path.
+    """
+    fmt = fmt or {".y4m": "y4m", ".rgb": "rgb", ".raw": "rgb"}.get(os.path.splitext(out_path)[1].lower(), "png")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    t0 = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    schedule = frame_schedule(log, fps, tail_s)
+    bounds = np.linspace(0, schedule.size, min(schedule.size, chunks or workers * 4) + 1).astype(int)
+    width, height = log.meta["width"], log.meta["height"]
+    if fmt == "png":
+        os.makedirs(out_path, exist_ok=True)
+        parts = [out_path] * (bounds.size - 1)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        parts = [f"{out_path}.part{i:04d}" for i in range(bounds.size - 1)]
+
+    # One pass over the inputs in the parent; each chunk starts from a pickled snapshot
+    sim = log.new_simulation()
+    jobs = []
+    applied = 0
+    for index, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        first_tick, last_tick = int(schedule[lo]), int(schedule[hi - 1])
+        while applied < first_tick:
+            sim.step(int(log.dt_ms[applied]), log.steer[applied], log.ratios[applied])
+            applied += 1
+        jobs.append((index, pickle.dumps(sim), first_tick, schedule[lo:hi], int(lo),
+                     log.dt_ms[first_tick:last_tick], log.steer[first_tick:last_tick],
+                     log.ratios[first_tick:last_tick], fmt, parts[index]))
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                             initargs=(width, height, quality)) as pool:
+        for future in as_completed([pool.submit(_render_chunk, job) for job in jobs]):
+            index, frames, seconds = future.result()
+            done += frames
+            print(f"  chunk {index + 1}/{len(jobs)}: {frames} frames in {seconds:.1f} s "
+                  f"({done}/{schedule.size} frames done)", flush=True)
+
+    if fmt != "png":
+        with open(out_path, "wb") as out:
+            if fmt == "y4m":
+                out.write(f"YUV4MPEG2 W{width} H{height} F{int(round(fps * 1000))}:1000 Ip A1:1 C444 "
+                          f"XCOLORRANGE=FULL\n".encode())
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+                os.remove(part)
+    wall_s = time.perf_counter() - t0
+    match_s = schedule.size / fps
+    return {"frames": int(schedule.size), "match_s": match_s, "wall_s": wall_s, "speedup": match_s / wall_s,
+            "fmt": fmt, "path": out_path, "size": (width, height)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a recorded or seeded match to images or raw video")
+    parser.add_argument("log", nargs="?", default=None,
+                        help="Input log (.npz) from redlight_greenlight.py --record; omit to export a seeded bot match")
+    parser.add_argument("--out", type=str, required=True, help="Output .y4m / .rgb file or PNG directory")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="Output format (default: from --out)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Output frame rate")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunks", type=int, default=None, help="Timeline chunks (default: 4 per worker)")
+    parser.add_argument("--quality", choices=("high", "medium", "low", "minimal"), default="high",
+                        help="Rendering quality tier")
+    parser.add_argument("--tail", type=float, default=2.0, help="Seconds to hold the final frame")
+    parser.add_argument("--seed", type=int, default=0, help="Seeded match: match seed")
+    parser.add_argument("--players", type=int, default=4, help="Seeded match: bot players")
+    parser.add_argument("--hazard", type=float, default=1.0, help="Seeded match: car traffic density")
+    parser.add_argument("--duration", type=float, default=300.0, help="Seeded match: stop after this much play (s)")
+    parser.add_argument("--size", type=str, default="1280x720", metavar="WxH", help="Seeded match: render resolution")
+    parser.add_argument("--save-log", type=str, default=None, help="Seeded match: also save its input log here")
+    args = parser.parse_args()
+
+    if args.log:
+        log = InputLog.load(args.log)
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        t0 = time.perf_counter()
+        log = seeded_match_log(args.seed, args.players, args.hazard, args.duration, width, height)
+        print(f"Simulated seeded match: {len(log)} ticks in {time.perf_counter() - t0:.1f} s")
+        if args.save_log:
+            log.save(args.save_log)
+    result = export_match(log, args.out, fmt=args.format, fps=args.fps, workers=args.workers, chunks=args.chunks,
+                          quality=args.quality, tail_s=args.tail)
+    w, h = result["size"]
+    print(f"Exported {result['frames']} frames ({result['match_s']:.1f} s at {args.fps:g} fps, {w}x{h}) "
+          f"to {result['path']} in {result['wall_s']:.1f} s -> {result['speedup']:.2f}x real time "
+          f"on {args.workers or os.cpu_count()} workers")
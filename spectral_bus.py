@@ -0,0 +1,413 @@
+"""
+Shared-memory spectral bus: one acquisition + DSP process, any number of readers.
+
+The publisher owns the board (through BoardConnectionManager), runs the feature extractor
+once per tick and writes the latest raw EEG window, PSD, band powers, feature values and
+stream counters into one multiprocessing.shared_memory block. The game, the band-power
+plot and any recorder attach to the block by name and read it without copies and without
+talking to the board, so the Cyton is opened once and the DSP runs once.
+
+Consistency uses a sequence lock: the writer bumps `seq` to an odd value, writes, then
+bumps it to the next even value. Readers take `seq`, read, and retry if `seq` was odd or
+changed meanwhile; nothing ever blocks the writer.
+
+Game events travel the other way through a small single-producer ring in the same block,
+so markers still reach the board's marker channel and the event index.
+
+Usage:
+    python spectral_bus.py publish --synthetic             # or --port /dev/ttyUSB0
+    python redlight_greenlight.py --spectral-bus rlgl_spectral
+    python realtime_bandpower_plot.py --bus rlgl_spectral
+    python spectral_bus.py monitor                         # print the live features
+"""
+import json
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from board_connection import CONNECTING, STALLED, STREAMING
+from eeg_markers import MARKER_CODES, MARKER_NAMES
+
+DEFAULT_BUS_NAME = "rlgl_spectral"
+STATS_KEYS = ("loss_rate", "jitter_ms", "host_gaps", "latency_ms", "drain_interval_ms", "samples_received")
+_MAGIC = 0x53504543  # "SPEC"
+_VERSION = 1
+_NAMES_BYTES = 4096
+_MARKER_CAPACITY = 256
+# Header int64 slots
+_SEQ, _TICK, _N_CH, _N_BANDS, _N_FEAT, _WINDOW, _VALID, _N_FREQ, _M_HEAD, _M_TAIL, _PID = range(2, 13)
+# Header float64 slots
+_FS, _PUBLISHED = 0, 1
+
+
+def _layout(n_ch, n_bands, n_feat, n_freq, window_len):
+    """Byte offsets of every array in the block; both sides derive it from the header counts."""
+    fields = [
+        ("ints", (16,), np.int64),
+        ("floats", (8,), np.float64),
+        ("names", (_NAMES_BYTES,), np.uint8),
+        ("stats", (len(STATS_KEYS),), np.float64),
+        ("features", (n_feat,), np.float64),
+        ("band_power", (n_ch, n_bands), np.float64),
+        ("freqs", (n_freq,), np.float64),
+        ("psd", (n_ch, n_freq), np.float32),
+        ("window", (n_ch, window_len), np.float32),
+        ("markers", (_MARKER_CAPACITY, 3), np.float64),
+    ]
+    layout, offset = {}, 0
+    for name, shape, dtype in fields:
+        offset = (offset + 63) // 64 * 64  # cache-line aligned
+        layout[name] = (offset, shape, dtype)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def _views(buf, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            for name, (offset, shape, dtype) in layout.items()}
+
+
+class SpectralBusPublisher:
+    """
+    Writer side of the bus.
+
+    Attributes:
+        name (str): Shared memory name.
+        band_names (list): Band order of band_power's last axis.
+        feature_names (list): Order of the features array.
+        arrays (dict): Writable views of every field.
+    """
+
+    def __init__(self, name, num_channels, window_len, n_freq, sampling_rate, band_names, feature_names,
+                 eeg_channels=None, board_name=""):
+        self.name = name
+        self.band_names = list(band_names)
+        self.feature_names = list(feature_names)
+        layout, size = _layout(num_channels, len(self.band_names), len(self.feature_names), n_freq, window_len)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a publisher that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.arrays = _views(self.shm.buf, layout)
+        ints = self.arrays["ints"]
+        ints[:] = 0
+        ints[_N_CH], ints[_N_BANDS], ints[_N_FEAT] = num_channels, len(self.band_names), len(self.feature_names)
+        ints[_WINDOW], ints[_N_FREQ], ints[_PID] = window_len, n_freq, os.getpid()
+        self.arrays["floats"][:] = 0.0
+        self.arrays["floats"][_FS] = sampling_rate
+        names = json.dumps({"bands": self.band_names, "features": self.feature_names, "stats": list(STATS_KEYS),
+                            "eeg_channels": list(eeg_channels or []), "board": board_name}).encode()
+        if len(names) > _NAMES_BYTES:
+            raise ValueError("Too many band/feature names for the bus header")
+        self.arrays["names"][:len(names)] = np.frombuffer(names, dtype=np.uint8)
+        ints[1] = _VERSION
+        ints[0] = _MAGIC  # last: readers treat the block as ready once the magic is set
+
+    def publish(self, window, band_power, features, freqs, psd, stats=None):
+        """
+        Writes one tick under the sequence lock.
+
+        Args:
+            window (numpy.ndarray): (channels, k) raw EEG window, k <= window length.
+            band_power (numpy.ndarray): (channels, bands) band powers.
+            features (dict): Feature name -> value.
+            freqs (numpy.ndarray): PSD frequencies.
+            psd (numpy.ndarray): (channels, n_freq) PSD.
+            stats (dict, optional): Stream counters (STATS_KEYS).
+        """
+        a = self.arrays
+        ints = a["ints"]
+        seq = int(ints[_SEQ])
+        ints[_SEQ] = seq + 1  # odd: write in progress
+        k = min(window.shape[1], a["window"].shape[1])
+        a["window"][:, :k] = window[:, -k:]
+        a["band_power"][:] = band_power
+        a["features"][:] = [features.get(n, np.nan) for n in self.feature_names]
+        n = min(freqs.size, a["freqs"].size)
+        a["freqs"][:n] = freqs[:n]
+        a["psd"][:, :n] = psd[:, :n]
+        if stats:
+            a["stats"][:] = [float(stats.get(key, np.nan)) for key in STATS_KEYS]
+        ints[_VALID] = k
+        ints[_TICK] += 1
+        a["floats"][_PUBLISHED] = time.time()
+        ints[_SEQ] = seq + 2
+
+    def take_markers(self):
+        """Game events queued by readers since the last call, as (host_time, name, value)."""
+        ints, ring = self.arrays["ints"], self.arrays["markers"]
+        events = []
+        while ints[_M_TAIL] < ints[_M_HEAD]:
+            host_time, code, value = ring[int(ints[_M_TAIL]) % _MARKER_CAPACITY]
+            name = MARKER_NAMES.get(int(code))
+            if name:
+                events.append((float(host_time), name, None if np.isnan(value) else int(value)))
+            ints[_M_TAIL] += 1
+        return events
+
+    def close(self):
+        self.arrays = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SpectralBusClient:
+    """
+    Reader side of the bus, with the parts of BoardConnectionManager's interface the game
+    uses (state, streaming, status_text(), stats(), mark(), stop()), so it can stand in for
+    a local board.
+
+    Attributes:
+        name (str): Shared memory name.
+        state (str): CONNECTING until a publisher is found, then STREAMING or STALLED.
+        sampling_rate (float): Publisher's sampling rate.
+        eeg_channels (list): Board rows the publisher reads EEG from.
+        band_names (list): Band order of band_power's last axis.
+        feature_names (list): Order of the features array.
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, stale_s=1.0):
+        self.name = name
+        self.stale_s = stale_s
+        self._state = CONNECTING
+        self.sampling_rate = 0.0
+        self.eeg_channels = []
+        self.band_names = []
+        self.feature_names = []
+        self.shm = None
+        self.arrays = None
+        self._next_attach = 0.0
+
+    def _attach(self):
+        now = time.monotonic()
+        if now < self._next_attach:
+            return False
+        self._next_attach = now + 0.5
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False
+        ints = np.ndarray((16,), dtype=np.int64, buffer=shm.buf)
+        if ints[_PID] != os.getpid():
+            # Readers must not unlink the block when they exit (Python < 3.13 registers attaches too)
+            try:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        if ints[0] != _MAGIC or ints[1] != _VERSION:
+            del ints
+            shm.close()
+            return False
+        layout, _ = _layout(*(int(ints[i]) for i in (_N_CH, _N_BANDS, _N_FEAT, _N_FREQ, _WINDOW)))
+        del ints
+        self._detach()
+        self.shm = shm
+        self.arrays = _views(shm.buf, layout)
+        names = json.loads(bytes(self.arrays["names"]).rstrip(b"\0"))
+        self.band_names, self.feature_names = names["bands"], names["features"]
+        self.eeg_channels = names["eeg_channels"]
+        self.sampling_rate = float(self.arrays["floats"][_FS])
+        return True
+
+    def _detach(self):
+        if self.shm is not None:
+            self.arrays = None
+            try:
+                self.shm.close()
+            except BufferError:
+                pass  # a caller still holds a view; the mapping goes away with it
+            self.shm = None
+
+    @property
+    def state(self):
+        """Refreshed on every read; re-attaches when the publisher restarted."""
+        if self.arrays is None and not self._attach():
+            self._state = CONNECTING
+            return self._state
+        age = time.time() - float(self.arrays["floats"][_PUBLISHED])
+        if age <= self.stale_s:
+            self._state = STREAMING
+        else:
+            self._state = STALLED
+            self._attach()  # a restarted publisher creates a fresh block under the same name
+        return self._state
+
+    @property
+    def streaming(self):
+        return self.state == STREAMING
+
+    def status_text(self):
+        return f"{self.state} (bus {self.name})"
+
+    def view(self):
+        """
+        Zero-copy views of the current tick: (seq, dict of arrays). The data is consistent
+        if still_valid(seq) is True after it has been used.
+        """
+        if self.arrays is None:
+            return None, None
+        seq = int(self.arrays["ints"][_SEQ])
+        return seq, self.arrays
+
+    def still_valid(self, seq):
+        return seq is not None and seq % 2 == 0 and int(self.arrays["ints"][_SEQ]) == seq
+
+    def read(self, fields=("features",), max_tries=1000):
+        """
+        Consistent copies of the given fields (retrying while the publisher writes).
+
+        Returns:
+            dict: Field name -> array copy, plus "tick" and "valid" (samples in the window);
+            None before a publisher is attached.
+        """
+        for _ in range(max_tries):
+            seq, arrays = self.view()
+            if arrays is None:
+                return None
+            if seq % 2:
+                time.sleep(0)
+                continue
+            out = {f: arrays[f].copy() for f in fields}
+            out["tick"] = int(arrays["ints"][_TICK])
+            out["valid"] = int(arrays["ints"][_VALID])
+            if self.still_valid(seq):
+                return out
+        return None
+
+    def read_features(self):
+        """Latest feature values as a dict, or None without a live publisher."""
+        if not self.streaming:
+            return None
+        frame = self.read(("features",))
+        if frame is None or frame["tick"] == 0:
+            return None
+        return dict(zip(self.feature_names, frame["features"].tolist()))
+
+    def stats(self):
+        if self.arrays is None:
+            return {}
+        frame = self.read(("stats",))
+        return dict(zip(STATS_KEYS, frame["stats"].tolist())) if frame else {}
+
+    def mark(self, name, value=None):
+        """Queues a game event for the publisher's marker channel and event index."""
+        code = MARKER_CODES.get(name)
+        if self.arrays is None or not code:
+            return
+        ints, ring = self.arrays["ints"], self.arrays["markers"]
+        head = int(ints[_M_HEAD])
+        if head - int(ints[_M_TAIL]) >= _MARKER_CAPACITY:
+            return  # publisher is not draining; drop rather than block the game
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = np.nan  # None, or a light color that the marker name already carries
+        ring[head % _MARKER_CAPACITY] = (time.time(), code, number)
+        ints[_M_HEAD] = head + 1
+
+    def stop(self):
+        self._detach()
+
+
+def run_publisher(manager, bus_name=DEFAULT_BUS_NAME, features=None, window_s=2.0, refresh_hz=5.0, nperseg=1024,
+                  stop_event=None):
+    """
+    Publishes the manager's EEG through the bus until stop_event is set (or Ctrl+C).
+
+    The block is (re)created once the board streams, sized for its channel count and rate.
+    """
+    from eeg_features import FeatureExtractor
+
+    extractor = FeatureExtractor(features, nperseg=nperseg)
+    bus = None
+    buf = None
+    period = 1.0 / refresh_hz
+    next_tick = time.monotonic()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            next_tick += period
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            if bus is not None:
+                for host_time, name, value in bus.take_markers():
+                    manager.mark(name, value, host_time)
+            if not manager.streaming:
+                continue
+            fs = manager.sampling_rate
+            window_len = max(int(window_s * fs), 64)
+            n_ch = len(manager.eeg_channels)
+            if buf is None or buf.shape != (n_ch, window_len):
+                buf = np.empty((n_ch, window_len), dtype=manager.eeg_dtype)
+            eeg = manager.get_current_eeg(window_len, out=buf)
+            if eeg is None or eeg.shape[1] < 64:
+                continue
+            freqs, psd, powers, values = extractor.analyze(eeg, fs)
+            if bus is None or bus.arrays["window"].shape != (n_ch, window_len):
+                if bus is not None:
+                    bus.close()
+                n_freq = min(nperseg, window_len) // 2 + 1
+                bus = SpectralBusPublisher(bus_name, n_ch, window_len, n_freq, fs, extractor.band_names,
+                                           [f.name for f in extractor.features], manager.eeg_channels, manager.name)
+                print(f"[bus {bus_name}] publishing {n_ch} ch @ {fs:g} Hz, {refresh_hz:g} ticks/s")
+            bus.publish(eeg, powers.array, values, freqs, psd, manager.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bus is not None:
+            bus.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import functools
+    import signal
+
+    parser = argparse.ArgumentParser(description="Shared-memory spectral bus publisher and monitor")
+    parser.add_argument("mode", choices=("publish", "monitor"), help="Run the publisher, or print what is on the bus")
+    parser.add_argument("--name", type=str, default=DEFAULT_BUS_NAME, help="Shared memory name of the bus")
+    parser.add_argument("--port", type=str, default=None, help="Serial port of the Cyton (auto-detected if omitted)")
+    parser.add_argument("--synthetic", action="store_true", help="Publish synthetic EEG instead of a board")
+    parser.add_argument("--window", type=float, default=2.0, help="Analysis window in seconds")
+    parser.add_argument("--refresh-hz", type=float, default=5.0, help="Ticks per second")
+    parser.add_argument("--nperseg", type=int, default=1024, help="Welch segment length")
+    parser.add_argument("--eeg-dtype", choices=("float64", "float32"), default="float32", help="DSP precision")
+    parser.add_argument("--spill-dir", type=str, default=None, help="Also record all raw EEG here (see eeg_spill.py)")
+    args = parser.parse_args()
+
+    if args.mode == "monitor":
+        client = SpectralBusClient(args.name)
+        try:
+            while True:
+                values = client.read_features()
+                if values is None:
+                    print(client.status_text())
+                else:
+                    print(" | ".join(f"{k} {v:.3f}" for k, v in values.items()))
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            client.stop()
+    else:
+        from board_connection import BoardConnectionManager
+
+        options = {"eeg_dtype": args.eeg_dtype, "spill_dir": args.spill_dir}
+        if args.synthetic:
+            from synthetic_eeg import SYNTHETIC_BOARD_ID, SyntheticBoardSetup
+            manager = BoardConnectionManager(SYNTHETIC_BOARD_ID, name="Synthetic",
+                                             setup_factory=functools.partial(SyntheticBoardSetup, seed=0), **options)
+        else:
+            from brainflow.board_shim import BoardIds
+            manager = BoardConnectionManager(BoardIds.CYTON_BOARD.value, serial_port=args.port, name="Cyton", **options)
+        signal.signal(signal.SIGTERM, signal.default_int_handler)  # unlink the block on kill too
+        manager.start()
+        try:
+            run_publisher(manager, args.name, window_s=args.window, refresh_hz=args.refresh_hz, nperseg=args.nperseg)
+        finally:
+            manager.stop()
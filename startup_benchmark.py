@@ -0,0 +1,100 @@
+"""
+Cold-start benchmark for Red Light, Green Light.
+
+Launches the game repeatedly in fresh interpreters with --startup-benchmark and reports
+the median time from process launch to the first start-screen frame and to the first
+gameplay frame, with and without EEG board setup. It also times bare imports of the
+project modules, which should stay cheap now that scipy, matplotlib, BrainFlow and
+pyserial load on first use.
+
+Usage:
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --headless --port /dev/ttyUSB0
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPORT_MODULES = ("game_sim", "redlight_greenlight", "realtime_bandpower_plot", "brainflow_stream")
+
+
+def time_import(module, env):
+    """Seconds a fresh interpreter spends importing module (interpreter start excluded)."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return float("nan")
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_game_start(extra_args, env, timeout_s=120.0):
+    """
+    Launches the game once and waits for its STARTUP line.
+
+    Returns:
+        dict: launch_to_first_frame_ms, launch_to_play_ms and the in-process figures
+        (first_frame_ms, ready_ms, first_play_frame_ms), or None if the game failed.
+    """
+    cmd = [sys.executable, os.path.join(HERE, "redlight_greenlight.py"), "--startup-benchmark"] + extra_args
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=HERE, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    result = None
+    try:
+        for line in proc.stdout:
+            if line.startswith("STARTUP "):
+                wall_ms = (time.perf_counter() - t0) * 1000.0
+                fields = dict(item.split("=") for item in line.split()[1:])
+                result = {k: float(v) for k, v in fields.items() if k.endswith("_ms")}
+                # The in-process clock starts at module import; add the interpreter start-up it misses
+                launch_offset = wall_ms - result["first_play_frame_ms"]
+                result["launch_to_first_frame_ms"] = result["first_frame_ms"] + launch_offset
+                result["launch_to_play_ms"] = wall_ms
+                break
+        proc.wait(timeout=timeout_s)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return result
+
+
+def summarize(label, runs):
+    runs = [r for r in runs if r is not None]
+    if not runs:
+        print(f"{label:<12} failed to start")
+        return
+    first = np.median([r["launch_to_first_frame_ms"] for r in runs])
+    play = np.median([r["launch_to_play_ms"] for r in runs])
+    loading = np.median([r["ready_ms"] - r["first_frame_ms"] for r in runs])
+    print(f"{label:<12} first frame {first:8.1f} ms | first gameplay frame {play:8.1f} ms | "
+          f"background loading {loading:8.1f} ms  ({len(runs)} runs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time-to-first-frame benchmark for the game")
+    parser.add_argument("--runs", type=int, default=5, help="Launches per configuration (median is reported)")
+    parser.add_argument("--port", type=str, default=None, help="Serial port for the with-board runs")
+    parser.add_argument("--headless", action="store_true", help="Use SDL's dummy video driver (CI, no display)")
+    parser.add_argument("--skip-board", action="store_true", help="Skip the real-board configuration (no-board and synthetic runs only)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.headless:
+        env["SDL_VIDEODRIVER"] = "dummy"
+        env["SDL_AUDIODRIVER"] = "dummy"
+
+    print("Cold import times (fresh interpreter each):")
+    for module in IMPORT_MODULES:
+        samples = [time_import(module, env) for _ in range(args.runs)]
+        print(f"  {module:<26} {np.median(samples) * 1000.0:8.1f} ms")
+
+    print("Game start:")
+    summarize("no board", [time_game_start(["--no-eeg"], env) for _ in range(args.runs)])
+    summarize("synthetic", [time_game_start(["--synthetic-eeg"], env) for _ in range(args.runs)])
+    if not args.skip_board:
+        board_args = ["--port", args.port] if args.port else []
+        summarize("with board", [time_game_start(board_args, env) for _ in range(args.runs)])
@@ -0,0 +1,485 @@
+"""
+Synthetic EEG for load testing without hardware.
+
+SyntheticEEG generates multi-channel EEG-like signals block by block: a 1/f background,
+alpha (8-12 Hz) and beta (12-30 Hz) rhythms whose amplitudes follow a target alpha/beta
+power ratio, eye blinks on the frontal channels and mains line noise. Every component is
+read from precomputed periodic noise tables (built once by FFT shaping) at per-channel
+offsets, so a block costs a few array operations whatever its length, and the same seed
+gives the same signal.
+
+SyntheticBoardSetup wraps the generator in the BrainFlowBoardSetup interface, producing
+samples in real time as they are polled, so the connection manager, ingest, spill and DSP
+paths run exactly as they do with a Cyton:
+
+    python redlight_greenlight.py --synthetic-eeg
+
+Board rows: package counter, EEG channels, ground-truth ratio, timestamp, marker (and a
+sync row when sync_hz is set). A board can be given a clock that runs off its nominal rate
+and host timestamps that arrive late by a random delay, the two things board_pool.py has
+to correct for when several boards record together.
+
+Usage:
+    python synthetic_eeg.py --channels 16 --fs 500   # accuracy and throughput self-check
+
+The self-check plays targets 0.5-3 and compares each target with the mean ratio the game's
+estimator measures; over 2.5 minutes per target the means land within about 5% (the
+sampling error of ~150 windows), and it fails above --tolerance (8%).
+"""
+import collections
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from offline_bandpower import DEFAULT_BANDS, band_weights, welch_windows
+
+SYNTHETIC_BOARD_ID = -100  # not a BrainFlow board id; keeps BoardShim lookups from matching
+# Highest target ratio the alpha amplitude is calibrated for (the game uses up to ~3)
+MAX_RATIO = 10.0
+_ALPHA_BAND = tuple(map(float, DEFAULT_BANDS["alpha"]))
+_BETA_BAND = tuple(map(float, DEFAULT_BANDS["beta"]))
+
+
+def _shaped_noise(length, fs, amplitude, rng):
+    """
+    Periodic unit-variance noise with the given amplitude spectrum.
+
+    Returns:
+        tuple: (signal of `length` samples, per-bin power share, bin frequencies).
+    """
+    freqs = np.fft.rfftfreq(length, 1.0 / fs)
+    mag = amplitude(freqs)
+    spec = mag * np.exp(2j * np.pi * rng.random(freqs.size))
+    spec[0] = 0.0
+    signal = np.fft.irfft(spec, n=length)
+    signal /= signal.std()
+    power = mag ** 2
+    power[1:-1] *= 2.0  # one-sided: interior bins stand for both signs of frequency
+    power[0] = 0.0
+    return signal, power / power.sum(), freqs
+
+
+def _band_share(share, freqs, band):
+    low, high = band
+    return float(share[(freqs >= low) & (freqs <= high)].sum())
+
+
+def _ratio_curve(background, alpha, fs, window_s, nperseg, powers):
+    """
+    Mean alpha/beta ratio the game's estimator reads from background + sqrt(p) * alpha, for
+    every alpha power p in powers.
+
+    Each half-overlapping window_s window of the tables gets a Welch PSD (nperseg-sample Hann
+    segments), band powers over the game's band edges (offline_bandpower.band_weights) and
+    one ratio; the mean over all windows is what a long run of game ticks averages to. It
+    includes leakage across the 12 Hz edge and the upward bias of a ratio of noisy powers.
+
+    Returns:
+        numpy.ndarray: Non-decreasing mean ratio per entry of powers.
+    """
+    win = int(window_s * fs)
+    hop = max(1, win // 2)
+    bg = sliding_window_view(background, win)[::hop]
+    al = sliding_window_view(alpha, win)[::hop]
+    bands = {"alpha": _ALPHA_BAND, "beta": _BETA_BAND}
+    mixed = np.empty(bg.shape)
+    ratios = np.empty(len(powers))
+    for i, power in enumerate(powers):
+        np.multiply(al, np.sqrt(power), out=mixed)
+        mixed += bg
+        freqs, psd = welch_windows(mixed, fs, min(nperseg, win))
+        band = psd @ band_weights(freqs, bands)
+        ratios[i] = np.mean(band[:, 0] / (band[:, 1] + 1e-12))
+    return np.maximum.accumulate(ratios)
+
+
+class SyntheticEEG:
+    """
+    Block-wise generator of EEG-like signals with a known alpha/beta ratio.
+
+    The ground-truth ratio is the mean alpha/beta ratio the game's estimator (2 s windows,
+    Welch, the game's band edges) reads at the current alpha amplitude. The amplitude
+    mapping is calibrated once on the generator's own noise tables, so spectral leakage
+    across the 12 Hz edge and the upward bias of a ratio of noisy powers are accounted for.
+    Single windows still scatter around it (IQR about a quarter of the ratio at 250 Hz).
+    Targets below what the background alone produces are clamped to that floor and targets
+    above MAX_RATIO to that. Blinks and line noise are not counted.
+
+    Attributes:
+        num_channels (int): EEG channels.
+        sampling_rate (float): Samples per second.
+        ratio (float): Ground-truth alpha/beta ratio of the most recent sample.
+        min_ratio (float): Lowest ratio the model can produce (background only).
+        samples (int): Samples generated so far.
+    """
+
+    def __init__(self, num_channels=8, sampling_rate=250, seed=None, background_uv=10.0, beta_uv=3.0,
+                 blink_rate_hz=0.3, blink_uv=150.0, line_hz=60.0, line_uv=2.0, table_s=256.0, welch_window_s=2.0,
+                 welch_nperseg=1024):
+        """
+        Args:
+            num_channels (int): EEG channels.
+            sampling_rate (float): Samples per second.
+            seed (int, optional): Seed of all randomness (tables, offsets, blink times).
+            background_uv (float): RMS of the 1/f background.
+            beta_uv (float): RMS of the beta rhythm.
+            blink_rate_hz (float): Mean blinks per second (0 disables blinks).
+            blink_uv (float): Blink peak on the most frontal channel.
+            line_hz (float): Mains frequency (50 or 60); 0 disables line noise.
+            line_uv (float): Line noise amplitude.
+            table_s (float): Length of the periodic noise tables (the background repeats after this).
+            welch_window_s (float): Analysis window the ratio is calibrated for (the game's P1 tick).
+            welch_nperseg (int): Welch segment length, capped at the window (the game's default).
+        """
+        self.num_channels = int(num_channels)
+        self.sampling_rate = float(sampling_rate)
+        self.rng = np.random.default_rng(seed)
+        fs = self.sampling_rate
+        length = 1 << int(np.ceil(np.log2(max(table_s * fs, 1024))))
+        self._length = length
+
+        pink, pink_share, freqs = _shaped_noise(
+            length, fs, lambda f: np.where(f >= 1.0, 1.0 / np.sqrt(np.maximum(f, 1.0)), 0.0), self.rng)
+        alpha, _, _ = _shaped_noise(
+            length, fs, lambda f: ((f >= _ALPHA_BAND[0]) & (f < _ALPHA_BAND[1])).astype(float), self.rng)
+        beta, _, _ = _shaped_noise(
+            length, fs, lambda f: ((f > _BETA_BAND[0]) & (f <= _BETA_BAND[1])).astype(float), self.rng)
+        self._pink = pink * background_uv
+        self._alpha = alpha
+        self._beta = beta * beta_uv
+        # Alpha power (uV^2) -> mean measured ratio, on a grid spaced evenly in the ratio the
+        # bin-exact band powers would give; generate() interpolates it both ways
+        bg_alpha = background_uv ** 2 * _band_share(pink_share, freqs, _ALPHA_BAND)
+        bg_beta = background_uv ** 2 * _band_share(pink_share, freqs, _BETA_BAND) + beta_uv ** 2
+        ideal = np.geomspace(bg_alpha / bg_beta, MAX_RATIO * 2.0, 32)
+        self._ratio_powers = ideal * bg_beta - bg_alpha
+        self._ratio_powers[0] = 0.0
+        self._ratio_means = _ratio_curve(self._pink + self._beta, alpha, fs, welch_window_s, welch_nperseg,
+                                         self._ratio_powers)
+        self.min_ratio = float(self._ratio_means[0])
+
+        # Every channel reads the tables at its own offsets, i.e. its own realization
+        self._offsets = self.rng.integers(0, length, size=(3, self.num_channels, 1))
+
+        width = int(0.4 * fs)
+        t = np.arange(width) / fs
+        self._blink = blink_uv * np.sin(np.pi * t / t[-1]) ** 2 if width > 1 else np.zeros(1)
+        self._blink_gain = np.exp(-np.arange(self.num_channels) / 1.5)[:, None]
+        self._blink_tail = np.zeros(self._blink.size)
+        self.blink_rate_hz = blink_rate_hz
+
+        self.line_hz = line_hz
+        self._line = line_uv * self.rng.uniform(0.5, 1.0, size=(self.num_channels, 1))
+        self._line_phase = self.rng.uniform(0.0, 2.0 * np.pi, size=(self.num_channels, 1))
+
+        self.samples = 0
+        self._alpha_amp = 0.0
+        self.ratio = self.min_ratio
+
+    def alpha_amplitude(self, ratio):
+        """Alpha rhythm RMS that gives the requested ground-truth ratio."""
+        return float(np.sqrt(np.interp(min(ratio, MAX_RATIO), self._ratio_means, self._ratio_powers)))
+
+    def true_ratio(self, alpha_amp):
+        return np.interp(np.square(alpha_amp), self._ratio_powers, self._ratio_means)
+
+    def generate(self, n, ratio=None):
+        """
+        Next n samples.
+
+        Args:
+            n (int): Samples to generate.
+            ratio (float, optional): Target alpha/beta ratio at the end of the block; the alpha
+                amplitude ramps linearly from the previous target so the rhythm never jumps.
+
+        Returns:
+            tuple: ((num_channels x n) EEG in uV, ground-truth ratio per sample).
+        """
+        n = int(n)
+        if n <= 0:
+            return np.empty((self.num_channels, 0)), np.empty(0)
+        fs = self.sampling_rate
+        idx = self.samples + np.arange(n)
+        wrap = self._length
+        pink = self._pink[(self._offsets[0] + idx) % wrap]
+        alpha = self._alpha[(self._offsets[1] + idx) % wrap]
+        eeg = self._beta[(self._offsets[2] + idx) % wrap]
+        eeg += pink
+
+        start_amp = self._alpha_amp
+        end_amp = start_amp if ratio is None else self.alpha_amplitude(ratio)
+        amp = start_amp + (end_amp - start_amp) * (np.arange(1, n + 1) / n)
+        alpha *= amp
+        eeg += alpha
+        self._alpha_amp = end_amp
+        truth = self.true_ratio(amp)
+        self.ratio = float(truth[-1])
+
+        if self.line_hz:
+            eeg += self._line * np.sin(2.0 * np.pi * self.line_hz * idx / fs + self._line_phase)
+
+        if self.blink_rate_hz > 0:
+            width = self._blink.size
+            # Blinks starting near the end of a block spill into the next one through the tail
+            trace = np.zeros(n + width)
+            trace[:width] = self._blink_tail
+            onsets = np.flatnonzero(self.rng.random(n) < self.blink_rate_hz / fs)
+            for onset in onsets.tolist():
+                trace[onset:onset + width] += self._blink
+            self._blink_tail = trace[n:]
+            eeg += self._blink_gain * trace[:n]
+
+        self.samples += n
+        return eeg, truth
+
+
+class SyntheticBoardSetup:
+    """
+    Drop-in stand-in for BrainFlowBoardSetup that streams SyntheticEEG in real time.
+
+    Samples are generated lazily: every data request first produces the samples that
+    should have arrived since the last one, so there is no generator thread. The object is
+    its own `board`, answering the BoardShim calls the connection manager makes.
+
+    Attributes:
+        name (str): Board name for logs.
+        board_id (int): SYNTHETIC_BOARD_ID unless overridden.
+        eeg_channels (list): EEG rows.
+        truth_row (int): Row carrying the ground-truth alpha/beta ratio.
+        sampling_rate (int): Samples per second.
+        board (SyntheticBoardSetup): self while set up, else None.
+        streaming (bool): True while samples are being produced.
+    """
+
+    def __init__(self, board_id=SYNTHETIC_BOARD_ID, serial_port=None, name=None, buffer_size=450000,
+                 num_channels=8, sampling_rate=250, seed=None, ratio=1.2, ratio_source=None, clock_drift_ppm=0.0,
+                 timestamp_jitter_ms=0.0, sync_hz=None, **generator_options):
+        """
+        Args:
+            board_id (int): Id reported to callers.
+            serial_port (str, optional): Ignored; kept for interface compatibility.
+            name (str, optional): Board name for logs.
+            buffer_size (int): Samples buffered before the oldest are dropped.
+            num_channels (int): EEG channels.
+            sampling_rate (int): Samples per second.
+            seed (int, optional): Generator seed.
+            ratio (float): Constant target alpha/beta ratio (without ratio_source).
+            ratio_source (optional): Object with update(dt_ms) returning the target ratio
+                (or an array whose first entry is), e.g. balance_sweep.SyntheticRatios.
+            clock_drift_ppm (float): The board's sample clock runs this many parts per million
+                fast (positive) or slow of sampling_rate.
+            timestamp_jitter_ms (float): Mean of the random (exponential) delay between a sample
+                being taken and its host timestamp; timestamps stay non-decreasing.
+            sync_hz (float, optional): Add a row with sin(2 pi sync_hz t) of each sample's true
+                host time, a shared reference for checking multi-board alignment.
+            **generator_options: Extra SyntheticEEG arguments.
+        """
+        self.board_id = board_id
+        self.serial_port = serial_port
+        self.name = name or "Synthetic"
+        self.buffer_size = int(buffer_size)
+        self.sampling_rate = int(sampling_rate)
+        self.generator = SyntheticEEG(num_channels, sampling_rate, seed=seed, **generator_options)
+        self.target_ratio = ratio
+        self.ratio_source = ratio_source
+        self.package_row = 0
+        self.eeg_channels = list(range(1, num_channels + 1))
+        self.truth_row = num_channels + 1
+        self.timestamp_row = num_channels + 2
+        self.marker_row = num_channels + 3
+        self.sync_row = num_channels + 4 if sync_hz else None
+        self.num_rows = num_channels + 4 + (1 if sync_hz else 0)
+        self.sync_hz = sync_hz
+        self.clock_rate = self.sampling_rate * (1.0 + clock_drift_ppm * 1e-6)
+        self.timestamp_jitter_ms = timestamp_jitter_ms
+        self._clock_rng = np.random.default_rng(seed)
+        self._last_stamp = -np.inf
+        self.board = None
+        self.session_prepared = False
+        self.streaming = False
+        self._chunks = collections.deque()
+        self._buffered = 0
+        self._markers = collections.deque()
+
+    # ---- BrainFlowBoardSetup interface ----
+
+    def setup(self):
+        self.board = self
+        self.session_prepared = True
+        self.start_stream(self.buffer_size)
+        print(f"[{self.name}] Synthetic EEG streaming ({len(self.eeg_channels)} ch @ {self.sampling_rate} Hz)")
+
+    def get_sampling_rate(self):
+        return self.sampling_rate
+
+    def is_streaming(self):
+        return self.streaming
+
+    def get_board_name(self):
+        return self.name
+
+    def show_params(self):
+        print(f"[{self.name}] synthetic board: {len(self.eeg_channels)} channels, {self.sampling_rate} Hz")
+
+    def get_board_data(self, num_samples=None):
+        """Takes up to num_samples of the oldest buffered samples (all if None)."""
+        if self.board is None:
+            return None
+        self._produce()
+        want = self._buffered if num_samples is None else min(int(num_samples), self._buffered)
+        taken = []
+        while want > 0:
+            chunk = self._chunks[0]
+            if chunk.shape[1] <= want:
+                taken.append(self._chunks.popleft())
+            else:
+                taken.append(chunk[:, :want])
+                self._chunks[0] = chunk[:, want:]
+            want -= taken[-1].shape[1]
+            self._buffered -= taken[-1].shape[1]
+        if not taken:
+            return np.empty((self.num_rows, 0))
+        return taken[0] if len(taken) == 1 else np.concatenate(taken, axis=1)
+
+    def get_current_board_data(self, num_samples):
+        """Newest num_samples without removing them."""
+        if self.board is None:
+            return None
+        self._produce()
+        if not self._chunks:
+            return np.empty((self.num_rows, 0))
+        return np.concatenate(self._chunks, axis=1)[:, -int(num_samples):]
+
+    def insert_marker(self, marker, verbose=False):
+        if self.streaming:
+            self._markers.append(float(marker))
+            if verbose:
+                print(f"[{self.name}] Marker {marker} inserted successfully.")
+
+    def stop(self):
+        self.streaming = False
+        self.session_prepared = False
+        self.board = None
+        self._chunks.clear()
+        self._buffered = 0
+
+    # ---- the BoardShim calls the connection manager makes on `board` ----
+
+    def get_num_rows(self, board_id=None):
+        return self.num_rows
+
+    def get_package_num_channel(self, board_id=None):
+        return self.package_row
+
+    def get_timestamp_channel(self, board_id=None):
+        return self.timestamp_row
+
+    def get_marker_channel(self, board_id=None):
+        return self.marker_row
+
+    def start_stream(self, buffer_size=None):
+        self._t0 = time.monotonic()
+        self._wall_t0 = time.time()
+        self._produced = 0
+        self.streaming = True
+
+    def stop_stream(self):
+        """Pauses sample production (handy for exercising stall/reconnect handling)."""
+        self._produce()
+        self.streaming = False
+
+    def _produce(self):
+        if not self.streaming:
+            return
+        now = time.monotonic()
+        due = int((now - self._t0) * self.clock_rate) - self._produced
+        if due <= 0:
+            return
+        if due > self.buffer_size:  # nobody drained for a long time: skip ahead like a full ring would
+            self._produced += due - self.buffer_size
+            due = self.buffer_size
+        if self.ratio_source is not None:
+            ratio = float(np.ravel(self.ratio_source.update(due * 1000.0 / self.sampling_rate))[0])
+        else:
+            ratio = self.target_ratio
+        eeg, truth = self.generator.generate(due, ratio)
+        idx = self._produced + np.arange(due)
+        chunk = np.zeros((self.num_rows, due))
+        chunk[self.package_row] = idx % 256
+        chunk[1:1 + len(self.eeg_channels)] = eeg
+        chunk[self.truth_row] = truth
+        taken_at = self._wall_t0 + idx / self.clock_rate
+        stamps = chunk[self.timestamp_row]
+        stamps[:] = taken_at
+        if self.timestamp_jitter_ms:
+            stamps += self._clock_rng.exponential(self.timestamp_jitter_ms / 1000.0, size=due)
+            stamps[0] = max(stamps[0], self._last_stamp)
+            np.maximum.accumulate(stamps, out=stamps)
+        self._last_stamp = stamps[-1]
+        if self.sync_row is not None:
+            chunk[self.sync_row] = np.sin(2.0 * np.pi * self.sync_hz * taken_at)
+        for i in range(min(len(self._markers), due)):
+            chunk[self.marker_row, i] = self._markers.popleft()
+        self._produced += due
+        self._chunks.append(chunk)
+        self._buffered += due
+        while self._buffered > self.buffer_size:
+            excess = self._buffered - self.buffer_size
+            head = self._chunks[0]
+            if head.shape[1] <= excess:
+                self._chunks.popleft()
+                self._buffered -= head.shape[1]
+            else:
+                self._chunks[0] = head[:, excess:]
+                self._buffered -= excess
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from offline_bandpower import band_power_timeline
+
+    parser = argparse.ArgumentParser(description="Self-check of the synthetic EEG generator")
+    parser.add_argument("--channels", type=int, default=8, help="EEG channels")
+    parser.add_argument("--fs", type=float, default=250.0, help="Sampling rate")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Minutes of signal to generate")
+    parser.add_argument("--block-ms", type=float, default=50.0, help="Block size, as the board would be polled")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("--tolerance", type=float, default=0.08,
+                        help="Largest relative error of a target's mean measured ratio (exit status 1 above)")
+    args = parser.parse_args()
+
+    gen = SyntheticEEG(args.channels, args.fs, seed=args.seed, blink_rate_hz=0.0, line_uv=0.0)
+    block = max(1, int(args.block_ms / 1000.0 * args.fs))
+    total = int(args.minutes * 60.0 * args.fs)
+    targets = np.array([0.5, 1.0, 2.0, 3.0])
+    segment = total // targets.size
+    parts, truths = [], []
+    t0 = time.perf_counter()
+    for i in range(0, total, block):
+        eeg, truth = gen.generate(min(block, total - i), targets[min(i // segment, targets.size - 1)])
+        parts.append(eeg)
+        truths.append(truth)
+    gen_s = time.perf_counter() - t0
+    eeg, truth = np.concatenate(parts, axis=1), np.concatenate(truths)
+    print(f"generated {args.channels} ch x {total} samples in {gen_s * 1000.0:.0f} ms "
+          f"({total / args.fs / max(gen_s, 1e-9):.0f}x real time, {block}-sample blocks)")
+
+    timeline = band_power_timeline(eeg, args.fs, window_s=2.0, hop_s=1.0, workers=1)
+    ends = np.rint(timeline["times"] * args.fs).astype(int) - 1
+    measured, expected = timeline["ratio_mean"], truth[ends]
+    print(f"ratio floor {gen.min_ratio:.2f}")
+    worst = 0.0
+    for target in targets:
+        sel = np.isclose(expected, max(target, gen.min_ratio))
+        if sel.any():
+            error = measured[sel].mean() / max(target, gen.min_ratio) - 1.0
+            worst = max(worst, abs(error))
+            print(f"target {target:4.2f}: measured mean {measured[sel].mean():.3f} ({error * 100:+.1f}%), "
+                  f"median {np.median(measured[sel]):.3f} "
+                  f"(IQR {np.subtract(*np.percentile(measured[sel], [75, 25])):.3f}) over {sel.sum()} windows")
+    ok = worst <= args.tolerance
+    print(f"largest mean ratio error {worst * 100:.1f}% (tolerance {args.tolerance * 100:.0f}%): "
+          f"{'ok' if ok else 'FAILED'}")
+    raise SystemExit(0 if ok else 1)
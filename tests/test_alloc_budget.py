@@ -0,0 +1,83 @@
+"""Per-frame allocation budget of the simulation plus P1's EEG ticks (what --alloc-check measures)."""
+import functools
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pygame")
+
+from board_connection import BoardConnectionManager
+from game_sim import GameSimulation
+from redlight_greenlight import (ALLOC_FRAME_PEAK_BUDGET, ALLOC_GROWTH_BUDGET, _eeg_window_features,
+                                 _feature_extractor)
+from synthetic_eeg import SYNTHETIC_BOARD_ID, SyntheticBoardSetup
+
+FRAME_MS = 16
+EEG_EVERY = 12  # ~200 ms, the game's eeg_refresh_ms
+
+
+@pytest.fixture(params=["float64", "float32"])
+def board(request):
+    factory = functools.partial(SyntheticBoardSetup, seed=2, ratio=1.5)
+    manager = BoardConnectionManager(SYNTHETIC_BOARD_ID, name="Synthetic", setup_factory=factory,
+                                     eeg_dtype=request.param).start()
+    yield manager
+    manager.stop()
+
+
+def _first_full_window(manager, extractor, timeout_s=10.0):
+    deadline = time.monotonic() + timeout_s
+    buf = None
+    while time.monotonic() < deadline:
+        if manager.streaming:
+            features, buf = _eeg_window_features(manager, extractor, buf)
+            if features is not None:
+                return features, buf
+        time.sleep(0.05)
+    pytest.fail(f"no full EEG window within {timeout_s} s ({manager.status_text()}: {manager.last_error})")
+
+
+def test_frames_with_eeg_ticks_stay_within_budget(board):
+    extractor = _feature_extractor(("alpha_beta", "alpha", "beta"))
+    # The first full window builds the extractor's Welch buffers; that is the setup the
+    # game budgets separately, so measuring starts after it
+    features, buf = _first_full_window(board, extractor)
+    assert features["alpha_beta"] > 0
+
+    sim = GameSimulation(num_players=2, seed=2)
+    steer = np.zeros(2, dtype=np.int8)
+    ratios = np.ones(2)
+    for _ in range(30):  # warm-up, as the game's ALLOC_WARMUP_FRAMES
+        sim.step(FRAME_MS, steer, ratios)
+    gc.collect()
+
+    frames = 240
+    peaks = np.zeros(frames)
+    ticks = 0
+    tracemalloc.start()
+    try:
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        for frame in range(frames):
+            frame_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            if frame % EEG_EVERY == 0:
+                features, buf = _eeg_window_features(board, extractor, buf)
+                assert features is not None
+                ratios[0] = features["alpha_beta"]
+                ticks += 1
+            sim.step(FRAME_MS, steer, ratios)
+            peaks[frame] = tracemalloc.get_traced_memory()[1] - frame_start
+            time.sleep(0.002)  # let the drain thread keep the window moving
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - start_bytes
+    finally:
+        tracemalloc.stop()
+
+    assert ticks == frames // EEG_EVERY
+    tick_peaks = peaks[::EEG_EVERY]
+    assert tick_peaks.max() <= ALLOC_FRAME_PEAK_BUDGET, f"EEG tick frames peaked at {tick_peaks.max():.0f} B"
+    assert peaks.max() <= ALLOC_FRAME_PEAK_BUDGET, f"frames peaked at {peaks.max():.0f} B"
+    assert growth <= ALLOC_GROWTH_BUDGET
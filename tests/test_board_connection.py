@@ -0,0 +1,48 @@
+"""Connection manager drain: what runs under the reader lock."""
+import time
+
+from board_connection import BoardConnectionManager
+from synthetic_eeg import SYNTHETIC_BOARD_ID, SyntheticBoardSetup
+
+
+class _LockProbeBoard(SyntheticBoardSetup):
+    """Records whether the manager's lock was held during each board call."""
+
+    manager = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.locked_during = []
+
+    def get_board_data(self, num_samples=None):
+        self.locked_during.append(self.manager._lock.locked())
+        return super().get_board_data(num_samples)
+
+    def insert_marker(self, value, verbose=False):
+        self.locked_during.append(self.manager._lock.locked())
+        return super().insert_marker(value, verbose)
+
+
+def test_drain_reads_board_outside_the_lock(tmp_path):
+    boards = []
+
+    def factory(board_id, serial_port, name):
+        boards.append(_LockProbeBoard(board_id, serial_port, name, seed=0))
+        return boards[-1]
+
+    manager = BoardConnectionManager(SYNTHETIC_BOARD_ID, name="Synthetic", setup_factory=factory,
+                                     spill_dir=str(tmp_path))
+    _LockProbeBoard.manager = manager
+    try:
+        assert manager._connect()
+        last_count = manager._drain()
+        manager.mark("light_red")
+        time.sleep(0.1)
+        count = manager._drain()
+        assert count > last_count
+        assert manager.ingest.samples_received == count
+        assert [row[3] for row in manager.events.events] == ["light_red"]
+        assert boards[0].locked_during and not any(boards[0].locked_during)
+    finally:
+        manager.stop()
+    assert manager.spill.samples_written == count  # handed to disk once stop() closed the spill
@@ -0,0 +1,35 @@
+"""Board pool drain: what runs under the reader lock."""
+import time
+
+from board_pool import BoardPool
+from synthetic_eeg import SyntheticBoardSetup
+
+
+class _LockProbeBoard(SyntheticBoardSetup):
+    """Records whether the pool's lock was held during each board read."""
+
+    pool = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.locked_during = []
+
+    def get_board_data(self, num_samples=None):
+        self.locked_during.append(self.pool._lock.locked())
+        return super().get_board_data(num_samples)
+
+
+def test_poll_reads_boards_outside_the_lock():
+    boards = [_LockProbeBoard(name=f"Synthetic-{i}", num_channels=4, seed=i) for i in range(2)]
+    pool = BoardPool(boards)
+    _LockProbeBoard.pool = pool
+    try:
+        pool.start(thread=False)
+        pool.poll()
+        time.sleep(0.1)
+        assert pool.poll() > 0
+        assert all(stream.next_index > 0 for stream in pool.streams)
+        for board in boards:
+            assert board.locked_during and not any(board.locked_during)
+    finally:
+        pool.stop()
@@ -0,0 +1,37 @@
+"""Recording checks that must happen before the sweep's process pool starts."""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from dsp_sweep import recording_rates, run_sweep
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "rec.npy"
+    np.save(path, np.random.default_rng(0).normal(size=(9, 250 * 10)))
+    return str(path)
+
+
+def test_unknown_rate_fails_before_the_pool(recording):
+    with pytest.raises(ValueError, match="sampling rate unknown"):
+        run_sweep([recording], {"WINDOW": [2.0]}, workers=1)
+    assert recording_rates([recording], fs=250) == [250.0]
+
+
+def test_cli_reports_unknown_rate_as_usage_error(recording):
+    result = subprocess.run([sys.executable, "dsp_sweep.py", recording, "--workers", "1"],
+                            capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 2
+    assert "sampling rate unknown; pass --fs or --board-id" in result.stderr
+    assert "BrokenProcessPool" not in result.stderr
+
+
+def test_sweep_runs_with_rate(recording):
+    rows = run_sweep([recording], {"WINDOW": [1.0, 2.0]}, fs=250, workers=1, timing_ticks=5)
+    assert [setting["WINDOW"] for setting, _ in rows] == [1.0, 2.0]
+    assert all(summary["ticks"] > 0 for _, summary in rows)
@@ -0,0 +1,45 @@
+"""Event index and marker queue bounds."""
+import numpy as np
+
+from board_connection import BoardConnectionManager
+from eeg_markers import MARKER_CODES, EventIndex
+from synthetic_eeg import SYNTHETIC_BOARD_ID
+
+
+def test_resolve_by_timestamp():
+    index = EventIndex()
+    index.add(5.5, "light_red")
+    index.add(60.0, "collision", 1)
+    index.resolve(np.arange(50.0), base_index=100)  # first sample stamped at or after the event
+    assert [(row[0], row[3]) for row in index.events] == [(106, "light_red")]
+    assert [ev[2] for ev in index.pending] == ["collision"]
+
+
+def test_resolve_by_count_without_timestamps():
+    index = EventIndex()
+    index.add(99.0, "light_green")
+    index.add(100.0, "game_over", 0)
+    index.add(101.0, "collision", 1)  # after the newest sample: stays pending
+    index.resolve_by_count(end_index=1000, end_time=100.0, sampling_rate=250)
+    assert [(row[0], row[2]) for row in index.events] == [(750, MARKER_CODES["light_green"]),
+                                                          (999, MARKER_CODES["game_over"])]
+    assert len(index.pending) == 1
+    index.resolve_by_count(end_index=1250, end_time=101.0, sampling_rate=250)
+    assert index.events[-1][0] == 1249 and not index.pending
+
+
+def test_pending_events_are_capped():
+    index = EventIndex(max_pending=5)
+    for i in range(12):
+        index.add(float(i), "car_spawn", i)
+    assert len(index.pending) == 5
+    assert index.dropped == 7
+    assert [ev[3] for ev in index.pending] == [7, 8, 9, 10, 11]
+
+
+def test_markers_are_bounded_while_disconnected():
+    manager = BoardConnectionManager(SYNTHETIC_BOARD_ID, name="Synthetic", max_queued_markers=8)
+    for i in range(100):
+        manager.mark("car_spawn", i)
+    assert len(manager._markers) == 8
+    assert manager._markers[-1][2] == 99
@@ -0,0 +1,55 @@
+"""float32 EEG windows (--eeg-dtype float32) must give the float64 band powers and features."""
+import numpy as np
+import pytest
+
+from eeg_features import FeatureExtractor
+from offline_bandpower import WelchScratch, welch_windows
+from synthetic_eeg import SyntheticEEG
+
+# float32 keeps ~7 significant digits of each sample; Welch averages that rounding out
+BAND_RTOL = 1e-5
+RATIO_RTOL = 1e-5
+RATIOS = ("alpha_beta", "theta_beta", "engagement", "relative_alpha")
+
+
+def _window(channels, fs, window_s=2.0, ratio=1.2, seed=0):
+    gen = SyntheticEEG(channels, fs, seed=seed, table_s=window_s * 2)
+    signal, _ = gen.generate(int(window_s * fs), ratio=ratio)
+    return signal
+
+
+@pytest.mark.parametrize("fs", [250, 500, 1000])
+@pytest.mark.parametrize("nperseg", [256, 512, 1024])
+@pytest.mark.parametrize("channels", [1, 8, 32])
+def test_float32_band_powers_and_ratios_match_float64(fs, nperseg, channels):
+    window = _window(channels, fs)
+    _, _, powers64, values64 = FeatureExtractor(nperseg=nperseg).analyze(window, fs)
+    _, _, powers32, values32 = FeatureExtractor(nperseg=nperseg).analyze(window.astype(np.float32), fs)
+
+    assert powers32.array.shape == powers64.array.shape
+    np.testing.assert_allclose(powers32.array, powers64.array, rtol=BAND_RTOL)
+    for name in RATIOS:
+        assert values32[name] == pytest.approx(values64[name], rel=RATIO_RTOL), name
+    # log-ratio, near 0 for symmetric channels: compare absolutely
+    assert values32["alpha_asymmetry"] == pytest.approx(values64["alpha_asymmetry"], abs=1e-5)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("fs,nperseg", [(250, 512), (250, 256), (500, 1000), (1000, 333)])
+def test_welch_scratch_matches_welch_windows(fs, nperseg, dtype):
+    window = _window(8, fs).astype(dtype)
+    freqs, psd = welch_windows(np.asarray(window, dtype=np.float64), fs, nperseg)
+    scratch = WelchScratch(window.shape, fs, nperseg)
+    got_freqs, got_psd = scratch.compute(window)
+
+    np.testing.assert_allclose(got_freqs, freqs)
+    np.testing.assert_allclose(got_psd, psd, rtol=1e-9, atol=1e-12 * psd.max())
+
+
+def test_extractor_rebuilds_buffers_when_window_changes():
+    extractor = FeatureExtractor(("alpha_beta",), nperseg=256)
+    short, full = _window(4, 250, window_s=1.0), _window(4, 250, window_s=2.0)
+    first = extractor.compute(full, 250)["alpha_beta"]
+    extractor.compute(short, 250)
+    assert extractor.compute(full, 250)["alpha_beta"] == first
+    assert FeatureExtractor(("alpha_beta",), nperseg=256).compute(short, 250) == extractor.compute(short, 250)
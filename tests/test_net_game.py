@@ -0,0 +1,78 @@
+"""Snapshot client robustness and the game events a MatchView derives from snapshots."""
+import socket
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from game_sim import GameSimulation
+from net_game import FULL_SNAPSHOT, GameClient, MatchView, SnapshotCodec
+
+
+def _view_config(sim, capacity):
+    return {"seed": sim.seed, "num_players": sim.num_players, "width": sim.road.width, "height": sim.road.height,
+            "capacity": capacity}
+
+
+def test_view_events_follow_the_simulation():
+    sim = GameSimulation(4, seed=7, hazard=3.0, num_humans=0)
+    capacity = sim.traffic.capacity
+    codec = SnapshotCodec(sim.num_players, capacity)
+    view = MatchView(_view_config(sim, capacity))
+    rng = np.random.default_rng(7)
+    steer = np.zeros(sim.num_players, dtype=np.int8)
+    want, got = [], []
+    for tick in range(60 * 600):
+        events = sim.step(16, steer, rng.uniform(0.5, 2.5, sim.num_players))
+        want += [e for e in events if e[1] != "car_spawn"]
+        view.apply(codec, codec.dequantize(codec.quantize(sim, 0)), tick=tick)
+        got += view.events
+        if sim.game_over:
+            break
+    assert sim.game_over
+    names = {name for _, name, _ in want}
+    assert {"light", "eliminated", "game_over"} <= names
+    assert got == want
+
+
+def test_view_ignores_old_ticks_and_restarts():
+    sim = GameSimulation(2, seed=1, num_humans=0)
+    codec = SnapshotCodec(sim.num_players, sim.traffic.capacity)
+    view = MatchView(_view_config(sim, sim.traffic.capacity))
+    steer, ratios = np.zeros(2, dtype=np.int8), np.ones(2)
+    before = codec.dequantize(codec.quantize(sim, 0))
+    view.apply(codec, before, tick=0)
+    assert view.events == []
+    while not any(name == "light" for _, name, _ in sim.step(16, steer, ratios)):
+        pass
+    after = codec.dequantize(codec.quantize(sim, 0))
+    view.apply(codec, after, tick=5)
+    assert [name for _, name, _ in view.events] == ["light"]
+    view.apply(codec, before, tick=3)  # render clock stepped back
+    view.apply(codec, after, tick=5)
+    assert view.events == []
+    view.apply(codec, codec.dequantize(codec.quantize(sim, 1)), tick=6)  # new match
+    assert view.events == []
+
+
+def test_poll_counts_malformed_snapshots():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    client = GameClient(server.getsockname())
+    try:
+        client.codec = SnapshotCodec(2, 8)
+        server.sendto(b"S\x01", client.sock.getsockname())  # shorter than the header
+        server.sendto(struct.pack("<cII", b"S", 1, FULL_SNAPSHOT) + b"not zlib", client.sock.getsockname())
+        # A delta against a known baseline whose body stops after its type byte
+        client.history[0] = np.zeros(client.codec.size, dtype=np.int32)
+        server.sendto(struct.pack("<cII", b"S", 2, 0) + zlib.compress(b"\x01"), client.sock.getsockname())
+        deadline = time.monotonic() + 2.0
+        while client.decode_errors < 3 and time.monotonic() < deadline:
+            assert client.poll() == 0
+            time.sleep(0.01)
+        assert client.decode_errors == 3
+        assert client.snapshots == 0
+    finally:
+        client.sock.close()
+        server.close()
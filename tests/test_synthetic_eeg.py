@@ -0,0 +1,29 @@
+"""The synthetic generator's ground-truth ratio against what the game's estimator measures."""
+import numpy as np
+import pytest
+
+from offline_bandpower import band_power_timeline
+from synthetic_eeg import SyntheticEEG
+
+# Mean over ~90 two-second windows; its sampling error alone is a few percent
+TOLERANCE = 0.08
+
+
+@pytest.mark.parametrize("fs", [250, 500])
+@pytest.mark.parametrize("target", [0.5, 1.0, 2.0, 3.0])
+def test_mean_measured_ratio_follows_target(fs, target):
+    gen = SyntheticEEG(8, fs, seed=1, blink_rate_hz=0.0, line_uv=0.0)
+    gen.generate(int(2 * fs), ratio=target)  # ramp to the target
+    eeg, truth = gen.generate(int(90 * fs), ratio=target)
+    assert np.allclose(truth, gen.ratio)
+    assert gen.ratio == pytest.approx(max(target, gen.min_ratio))
+
+    measured = band_power_timeline(eeg, fs, window_s=2.0, hop_s=1.0, workers=1)["ratio_mean"]
+    assert measured.mean() == pytest.approx(gen.ratio, rel=TOLERANCE)
+
+
+def test_ratio_mapping_round_trips():
+    gen = SyntheticEEG(4, 250, seed=0)
+    for ratio in (gen.min_ratio, 0.8, 1.5, 3.0, 6.0):
+        assert gen.true_ratio(gen.alpha_amplitude(ratio)) == pytest.approx(ratio, rel=1e-9)
+    assert gen.alpha_amplitude(0.01) == 0.0
@@ -0,0 +1,218 @@
+"""
+Pooled, array-backed car traffic for Red Light, Green Light.
+
+Cars live in fixed-size arrays that are reused as cars leave the screen, so busier hazard
+levels only grow the arrays once. Spawning runs on a millisecond clock rather than a
+per-frame dice roll, movement is a single vectorized step, and car/player collision goes
+through a lane + y sorted broadphase before the exact box test.
+"""
+import numpy as np
+
+from game_physics import expand_candidate_pairs
+
+ONCOMING = 0
+TRAILING = 1
+
+
+class TrafficPool:
+    """
+    Fixed-capacity pool of cars in both lanes.
+
+    Attributes:
+        road (RoadGeometry): Road projection shared with the players.
+        capacity (int): Maximum number of simultaneous cars.
+        hazard (float): Spawn-rate multiplier; 1.0 matches the classic single-car pacing.
+        active (numpy.ndarray): Boolean mask of pool slots currently in use.
+        lane (numpy.ndarray): ONCOMING or TRAILING per slot.
+        y, speed (numpy.ndarray): World y and speed (positive = moving away from the viewer).
+        x, v, half_x, height (numpy.ndarray): Derived world x, depth and hitbox per slot,
+            refreshed by update().
+    """
+
+    def __init__(self, road, oncoming_speed, trailing_speed, capacity=32, min_cooldown_ms=3500,
+                 max_cooldown_ms=7000, spawn_rate_hz=0.6, oncoming_share=0.6, hazard=1.0, rng=None):
+        """
+        Args:
+            road (RoadGeometry): Road projection shared with the players.
+            oncoming_speed (float): World units per second of cars driving towards the viewer.
+            trailing_speed (float): World units per second of cars coming up from behind.
+            capacity (int): Size of the car pool.
+            min_cooldown_ms (int): Shortest quiet period after a spawn at hazard 1.0.
+            max_cooldown_ms (int): Longest quiet period after a spawn at hazard 1.0.
+            spawn_rate_hz (float): Rate of the random arrival after the cooldown has elapsed.
+                0.6 Hz is the old 1%-per-frame roll at 60 FPS, expressed in time.
+            oncoming_share (float): Probability that a new car uses the oncoming lane.
+            hazard (float): Multiplier on the overall spawn rate.
+            rng (numpy.random.Generator, optional): Random source for spawn timing and lanes.
+        """
+        self.road = road
+        self.capacity = int(capacity)
+        self.oncoming_speed = float(oncoming_speed)
+        self.trailing_speed = float(trailing_speed)
+        self.min_cooldown_ms = min_cooldown_ms
+        self.max_cooldown_ms = max_cooldown_ms
+        self.spawn_rate_hz = spawn_rate_hz
+        self.oncoming_share = oncoming_share
+        self.hazard = max(1e-3, float(hazard))
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.active = np.zeros(self.capacity, dtype=bool)
+        self.lane = np.zeros(self.capacity, dtype=np.int8)
+        self.side = np.zeros(self.capacity)  # lane center as a fraction of the road half width
+        self.y = np.zeros(self.capacity)
+        self.speed = np.zeros(self.capacity)
+        self.x = np.zeros(self.capacity)
+        self.v = np.ones(self.capacity)
+        self.half_x = np.zeros(self.capacity)
+        self.height = np.zeros(self.capacity)
+        self._tmp = np.empty((2, self.capacity))
+        self._mask = np.empty(self.capacity, dtype=bool)
+        self._hit = np.zeros(0, dtype=bool)
+        self.spawn_timer_ms = 0.0
+        self.reset()
+
+    def reset(self):
+        """Clears the road and restarts the spawn clock."""
+        self.active.fill(False)
+        self.spawn_timer_ms = self._arrival_ms()
+
+    def _arrival_ms(self):
+        return self.rng.exponential(1000.0 / self.spawn_rate_hz) / self.hazard
+
+    def _next_spawn_ms(self):
+        cooldown = self.rng.uniform(self.min_cooldown_ms, self.max_cooldown_ms) / self.hazard
+        return cooldown + self._arrival_ms()
+
+    def count(self):
+        return int(np.count_nonzero(self.active))
+
+    def spawn(self, lane, camera_y):
+        """
+        Places a car at the far end of its lane (horizon for oncoming, bottom for trailing).
+
+        Returns:
+            int: Pool slot used, or -1 if the pool is full.
+        """
+        slot = int(np.argmin(self.active))  # first free slot
+        if self.active[slot]:
+            return -1
+        spawn_v = 0.08 if lane == ONCOMING else 0.95
+        self.lane[slot] = lane
+        self.side[slot] = -0.33 if lane == ONCOMING else 0.33
+        self.y[slot] = camera_y + self.road.depth_span * spawn_v
+        self.speed[slot] = -self.oncoming_speed if lane == ONCOMING else self.trailing_speed
+        self.active[slot] = True
+        return slot
+
+    def update(self, dt_ms, camera_y):
+        """
+        Advances the spawn clock, moves every car and refreshes derived geometry.
+
+        Args:
+            dt_ms (float): Frame time in milliseconds.
+            camera_y (float): Current camera world y.
+
+        Returns:
+            int: Number of cars spawned this frame.
+        """
+        spawned = 0
+        self.spawn_timer_ms -= dt_ms
+        while self.spawn_timer_ms <= 0:
+            lane = ONCOMING if self.rng.random() < self.oncoming_share else TRAILING
+            if self.spawn(lane, camera_y) >= 0:
+                spawned += 1
+            self.spawn_timer_ms += self._next_spawn_ms()
+
+        tmp = self._tmp[1]
+        np.multiply(self.speed, dt_ms / 1000.0, out=tmp)
+        np.subtract(self.y, tmp, out=self.y, where=self.active)
+        self.refresh(camera_y)
+
+        # Retire cars that left the screen (screen y = horizon + world y - camera)
+        np.subtract(self.y, camera_y, out=tmp)
+        self.active &= np.greater_equal(tmp, -40, out=self._mask)
+        self.active &= np.less_equal(tmp, self.road.height + 80 - self.road.horizon_y, out=self._mask)
+        return spawned
+
+    def refresh(self, camera_y):
+        """
+        Recomputes the derived x, v, half_x and height of every slot from lane side and world y
+        (network clients receive only those and rebuild the rest).
+        """
+        road = self.road
+        halfw, tmp = self._tmp
+        v = road.depth(self.y, camera_y, out=self.v)
+        road.half_width(v, out=halfw)
+        np.multiply(self.side, halfw, out=self.x)
+        self.x /= np.maximum(v, 0.001, out=tmp)
+        np.multiply(halfw, 0.5 * 0.35, out=self.half_x)
+        np.maximum(self.half_x, 6, out=self.half_x)
+        self.half_x /= v
+        road.scale(v, out=self.height)
+        self.height *= road.player_size * 0.9
+
+    def collide(self, players, camera_y):
+        """
+        Finds every alive player touched by any car.
+
+        Cars are sorted by lane and then by world y. For each lane a player can only touch
+        cars whose bottom edge lies between the player's top edge and the player's bottom
+        edge plus the tallest car, so two searchsorted calls per lane give each player's
+        candidate range before the exact box test.
+
+        Args:
+            players (PlayerArrays): Player state.
+            camera_y (float): Current camera world y.
+
+        Returns:
+            numpy.ndarray: Boolean mask over all players that were hit.
+        """
+        if self._hit.size != players.count:
+            self._hit = np.zeros(players.count, dtype=bool)
+        hit = self._hit
+        hit.fill(False)
+        if not self.active.any() or not players.alive.any():
+            return hit
+        cars = np.flatnonzero(self.active)
+        pids = np.flatnonzero(players.alive)
+        cars = cars[np.lexsort((self.y[cars], self.lane[cars]))]
+        car_y = self.y[cars]
+        lane_bounds = np.searchsorted(self.lane[cars], [ONCOMING, TRAILING, TRAILING + 1])
+        max_height = float(self.height[cars].max())
+
+        _, _, _, _, p_half, p_height = players.update_extents(self.road, camera_y)
+        px = players.x[pids]
+        py = players.y[pids]
+        p_half = p_half[pids]
+        p_top = py - p_height[pids]
+
+        for lo, hi in ((lane_bounds[0], lane_bounds[1]), (lane_bounds[1], lane_bounds[2])):
+            if lo == hi:
+                continue
+            starts = np.searchsorted(car_y[lo:hi], p_top, side="right") + lo
+            ends = np.searchsorted(car_y[lo:hi], py + max_height, side="left") + lo
+            owner, candidate = expand_candidate_pairs(starts, ends)
+            if owner.size == 0:
+                continue
+            c = cars[candidate]
+            x_overlap = np.minimum(self.x[c] + self.half_x[c], px[owner] + p_half[owner]) - \
+                np.maximum(self.x[c] - self.half_x[c], px[owner] - p_half[owner])
+            y_overlap = np.minimum(self.y[c], py[owner]) - np.maximum(self.y[c] - self.height[c], p_top[owner])
+            touched = owner[(x_overlap > 0) & (y_overlap > 0)]
+            hit[pids[touched]] = True
+        return hit
+
+    def screen_positions(self, camera_y):
+        """
+        Screen placement of the active cars for rendering.
+
+        Returns:
+            tuple: (ids, sx, sy, v, lane_halfw) arrays for the active cars.
+        """
+        road = self.road
+        ids = np.flatnonzero(self.active)
+        v = self.v[ids]
+        center_top = road.width * 0.5 + road.road_tilt * (1 - v)
+        sx = (center_top + self.x[ids] * v).astype(int)
+        sy = (road.horizon_y + (self.y[ids] - camera_y)).astype(int)
+        return ids, sx, sy, v, road.half_width(v) * 0.5